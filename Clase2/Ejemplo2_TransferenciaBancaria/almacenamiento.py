@@ -0,0 +1,333 @@
+"""
+Almacenamiento de cuentas intercambiable para la API de transferencias
+Implementaciones: en memoria (por defecto) y SQLite (durable, multi-proceso)
+"""
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from bloqueos import GestorBloqueos
+from conexiones_sqlite import PoolConexionesSQLite
+from dinero import Centavos
+from motor_transferencias import (
+    SIN_DESTINO, SIN_ORIGEN, Cuenta, Limites, MotorTransferencias, Operacion, Periodos, ResultadoTransferencia,
+    evaluar_limites, periodos_actuales, resultados_lote_abortado
+)
+
+
+class AlmacenCuentas(ABC):
+    """
+    Interfaz común de los almacenes de cuentas.
+
+    `bloqueante` indica si las operaciones hacen I/O (y deben ejecutarse
+    fuera del event loop); sin él, solo pueden esperar locks, y
+    `intentar_transferir` permite evitar esa espera.
+    """
+
+    bloqueante = False
+
+    @abstractmethod
+    def obtener(self, numero: str) -> Optional[Cuenta]:
+        """Cuenta con ese número, o None si no existe"""
+
+    def obtener_varias(self, numeros: Iterable[str]) -> Dict[str, Cuenta]:
+        """Cuentas existentes entre `numeros`, por número"""
+        cuentas = {}
+        for numero in numeros:
+            cuenta = self.obtener(numero)
+            if cuenta is not None:
+                cuentas[numero] = cuenta
+        return cuentas
+
+    @abstractmethod
+    def guardar(self, cuenta: Cuenta):
+        """Crea o reemplaza una cuenta"""
+
+    @abstractmethod
+    def transferir(self, origen: Cuenta, destino: Cuenta, monto: Centavos) -> ResultadoTransferencia:
+        """Valida saldo/límites y aplica débito/crédito de forma atómica"""
+
+    def intentar_transferir(self, origen: Cuenta, destino: Cuenta, monto: Centavos,
+                            desde: Optional[float] = None) -> Optional[ResultadoTransferencia]:
+        """
+        Como `transferir` pero sin esperar: None si tendría que bloquearse
+        (locks ocupados o I/O). `desde` es el `time.perf_counter()` del primer
+        intento, para medir la espera de los locks a través de los reintentos.
+        """
+        return None
+
+    @abstractmethod
+    def transferir_lote(self, operaciones: Sequence[Operacion], atomico: bool = False) -> List[ResultadoTransferencia]:
+        """
+        Aplica varias transferencias en orden. Con `atomico` se aplican todas o
+        ninguna (las no aplicadas quedan como Rechazo.LOTE_ABORTADO); sin él,
+        cada una se aplica o rechaza de forma independiente.
+        """
+
+    @abstractmethod
+    def resetear(self, numero: str, saldo: Centavos) -> Optional[Cuenta]:
+        """Reinicia saldo y acumulados; None si la cuenta no existe"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Cantidad de cuentas"""
+
+    def sembrar(self, cuentas: Iterable[Cuenta]):
+        """Crea las cuentas que aún no existan (datos iniciales)"""
+        for cuenta in cuentas:
+            if self.obtener(cuenta.numero) is None:
+                self.guardar(cuenta)
+
+    @abstractmethod
+    def exportar(self) -> List[Cuenta]:
+        """Copia de todas las cuentas, consistente entre sí (sin transferencias a medias)"""
+
+    @abstractmethod
+    def reemplazar(self, cuentas: Iterable[Cuenta], durante: Optional[Callable[[], None]] = None):
+        """
+        Deja exactamente `cuentas` en el almacén, de forma atómica respecto de
+        las transferencias. `durante`, si se indica, se ejecuta en la misma
+        sección exclusiva (para restaurar otros componentes a la vez); si
+        lanza una excepción, el almacén no cambia. Las versiones no
+        retroceden, así los ETag ya entregados no se confunden con el estado
+        restaurado.
+        """
+
+    def cerrar(self):
+        """Libera recursos (conexiones, archivos)"""
+
+
+class AlmacenMemoria(AlmacenCuentas):
+    """
+    Cuentas en un dict del proceso. Las cuentas retornadas por `obtener` son
+    los registros vivos; `transferir` los vuelve a buscar bajo los locks, así
+    una cuenta eliminada por `reemplazar` no se modifica después.
+    """
+
+    def __init__(self, bloqueos: GestorBloqueos, limite_diario: Centavos, limite_mensual: Centavos,
+                 periodos=periodos_actuales, limites: Optional[Limites] = None):
+        self.cuentas = {}
+        self.bloqueos = bloqueos
+        self.motor = MotorTransferencias(bloqueos, limite_diario, limite_mensual, periodos, limites,
+                                         vigente=self.cuentas.get)
+
+    def obtener(self, numero: str) -> Optional[Cuenta]:
+        return self.cuentas.get(numero)
+
+    def guardar(self, cuenta: Cuenta):
+        anterior = self.cuentas.get(cuenta.numero)
+        if anterior is not None:
+            cuenta.version = max(cuenta.version, anterior.version + 1)
+        self.cuentas[cuenta.numero] = cuenta
+
+    def transferir(self, origen: Cuenta, destino: Cuenta, monto: Centavos) -> ResultadoTransferencia:
+        return self.motor.validar_y_aplicar(origen, destino, monto)
+
+    def intentar_transferir(self, origen: Cuenta, destino: Cuenta, monto: Centavos,
+                            desde: Optional[float] = None) -> Optional[ResultadoTransferencia]:
+        return self.motor.intentar_aplicar(origen, destino, monto, desde)
+
+    def transferir_lote(self, operaciones: Sequence[Operacion], atomico: bool = False) -> List[ResultadoTransferencia]:
+        return self.motor.validar_y_aplicar_lote(operaciones, atomico)
+
+    def resetear(self, numero: str, saldo: Centavos) -> Optional[Cuenta]:
+        cuenta = self.cuentas.get(numero)
+        if cuenta is None:
+            return None
+        with self.bloqueos.adquirir(numero):
+            cuenta.transferido_hoy = 0
+            cuenta.transferido_mes = 0
+            cuenta.saldo = saldo
+            cuenta.version += 1
+        return cuenta
+
+    def exportar(self) -> List[Cuenta]:
+        with self.bloqueos.adquirir_todas():
+            return [Cuenta(c.numero, c.saldo, c.estado, c.transferido_hoy, c.transferido_mes,
+                           c.periodo_dia, c.periodo_mes, c.version) for c in self.cuentas.values()]
+
+    def reemplazar(self, cuentas: Iterable[Cuenta], durante: Optional[Callable[[], None]] = None):
+        nuevas = {cuenta.numero: cuenta for cuenta in cuentas}
+        with self.bloqueos.adquirir_todas():
+            if durante is not None:
+                durante()
+            # Las cuentas vivas se actualizan en su lugar: una transferencia ya
+            # validada que espera los locks opera sobre el estado restaurado
+            for numero in [numero for numero in self.cuentas if numero not in nuevas]:
+                del self.cuentas[numero]
+            for numero, nueva in nuevas.items():
+                cuenta = self.cuentas.get(numero)
+                if cuenta is None:
+                    self.cuentas[numero] = nueva
+                    continue
+                cuenta.saldo = nueva.saldo
+                cuenta.estado = nueva.estado
+                cuenta.transferido_hoy = nueva.transferido_hoy
+                cuenta.transferido_mes = nueva.transferido_mes
+                cuenta.periodo_dia = nueva.periodo_dia
+                cuenta.periodo_mes = nueva.periodo_mes
+                cuenta.version = max(nueva.version, cuenta.version + 1)
+
+    def __len__(self) -> int:
+        return len(self.cuentas)
+
+
+class AlmacenSQLite(AlmacenCuentas):
+    """
+    Cuentas en un archivo SQLite compartible entre procesos (workers de uvicorn).
+
+    - Modo WAL: lectores no bloquean al escritor y viceversa.
+    - Una conexión por thread (PoolConexionesSQLite); cada conexión cachea
+      las sentencias compiladas, así las consultas de texto constante se
+      preparan una sola vez.
+    - Cada transferencia es una única transacción BEGIN IMMEDIATE: el lock
+      de escritura se toma al inicio, de modo que la lectura de saldo y
+      límites y los dos UPDATE son atómicos también entre procesos.
+    - Los acumulados se renuevan al cambiar de día/mes igual que en memoria:
+      cada fila guarda el período al que corresponden.
+    - Montos en columnas INTEGER (centavos): SQLite suma enteros de 64 bits
+      sin error de redondeo.
+    - Toda operación es I/O (`bloqueante`): la API la ejecuta en el threadpool.
+    """
+
+    bloqueante = True
+
+    _SQL_ESQUEMA = """
+        CREATE TABLE IF NOT EXISTS cuentas (
+            numero TEXT PRIMARY KEY,
+            saldo INTEGER NOT NULL,
+            estado TEXT NOT NULL,
+            transferido_hoy INTEGER NOT NULL DEFAULT 0,
+            transferido_mes INTEGER NOT NULL DEFAULT 0,
+            periodo_dia INTEGER NOT NULL DEFAULT 0,
+            periodo_mes INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """
+    _SQL_OBTENER = "SELECT * FROM cuentas WHERE numero = ?"
+    _SQL_GUARDAR = """
+        INSERT INTO cuentas VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (numero) DO UPDATE SET
+            saldo = excluded.saldo, estado = excluded.estado,
+            transferido_hoy = excluded.transferido_hoy, transferido_mes = excluded.transferido_mes,
+            periodo_dia = excluded.periodo_dia, periodo_mes = excluded.periodo_mes,
+            version = MAX(excluded.version, version + 1)
+    """
+    _SQL_SEMBRAR = "INSERT OR IGNORE INTO cuentas VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    _SQL_OBTENER_VARIAS = "SELECT * FROM cuentas WHERE numero IN ({marcadores})"
+    _MAX_PARAMETROS = 500
+    _SQL_LIMITES = ("SELECT saldo, transferido_hoy, transferido_mes, periodo_dia, periodo_mes "
+                    "FROM cuentas WHERE numero = ?")
+    _SQL_DEBITAR = ("UPDATE cuentas SET saldo = saldo - ?1, transferido_hoy = ?2, transferido_mes = ?3, "
+                    "periodo_dia = ?4, periodo_mes = ?5, version = version + 1 WHERE numero = ?6")
+    _SQL_ACREDITAR = "UPDATE cuentas SET saldo = saldo + ?1, version = version + 1 WHERE numero = ?2"
+    _SQL_RESETEAR = ("UPDATE cuentas SET saldo = ?, transferido_hoy = 0, transferido_mes = 0, "
+                     "version = version + 1 WHERE numero = ?")
+    _SQL_CONTAR = "SELECT COUNT(*) FROM cuentas"
+    _SQL_EXPORTAR = "SELECT * FROM cuentas"
+    _SQL_NUMEROS = "SELECT numero FROM cuentas"
+    _SQL_ELIMINAR = "DELETE FROM cuentas WHERE numero = ?"
+
+    def __init__(self, ruta: str, limite_diario: Centavos, limite_mensual: Centavos, timeout: float = 30,
+                 periodos=periodos_actuales, observar_espera=None, limites: Optional[Limites] = None):
+        self.ruta = ruta
+        self.limite_diario = limite_diario
+        self.limite_mensual = limite_mensual
+        self.periodos = periodos
+        self.limites = limites
+        self.pool = PoolConexionesSQLite(ruta, timeout, observar_espera)
+        with self.pool.transaccion() as conexion:
+            conexion.execute(self._SQL_ESQUEMA)
+
+    @staticmethod
+    def _fila(cuenta: Cuenta) -> tuple:
+        return (cuenta.numero, cuenta.saldo, cuenta.estado, cuenta.transferido_hoy, cuenta.transferido_mes,
+                cuenta.periodo_dia, cuenta.periodo_mes, cuenta.version)
+
+    def obtener(self, numero: str) -> Optional[Cuenta]:
+        fila = self.pool.conexion().execute(self._SQL_OBTENER, (numero,)).fetchone()
+        return Cuenta(*fila) if fila is not None else None
+
+    def obtener_varias(self, numeros: Iterable[str]) -> Dict[str, Cuenta]:
+        # Un SELECT ... IN por bloque (SQLite limita los parámetros por sentencia)
+        numeros = list(dict.fromkeys(numeros))
+        conexion = self.pool.conexion()
+        cuentas = {}
+        for i in range(0, len(numeros), self._MAX_PARAMETROS):
+            bloque = numeros[i:i + self._MAX_PARAMETROS]
+            sql = self._SQL_OBTENER_VARIAS.format(marcadores=", ".join("?" * len(bloque)))
+            for fila in conexion.execute(sql, bloque):
+                cuentas[fila[0]] = Cuenta(*fila)
+        return cuentas
+
+    def guardar(self, cuenta: Cuenta):
+        self.pool.conexion().execute(self._SQL_GUARDAR, self._fila(cuenta))
+
+    def sembrar(self, cuentas: Iterable[Cuenta]):
+        with self.pool.transaccion() as conexion:
+            conexion.executemany(self._SQL_SEMBRAR, [self._fila(c) for c in cuentas])
+
+    def transferir(self, origen: Cuenta, destino: Cuenta, monto: Centavos) -> ResultadoTransferencia:
+        periodos = self.periodos()
+        with self.pool.transaccion() as conexion:
+            return self._aplicar(conexion, origen, destino, monto, periodos)
+
+    def transferir_lote(self, operaciones: Sequence[Operacion], atomico: bool = False) -> List[ResultadoTransferencia]:
+        periodos = self.periodos()
+        # Todo el lote en una sola transacción: un único fsync/commit
+        with self.pool.transaccion() as conexion:
+            resultados = []
+            for origen, destino, monto in operaciones:
+                resultado = self._aplicar(conexion, origen, destino, monto, periodos)
+                resultados.append(resultado)
+                if atomico and not resultado.aprobada:
+                    conexion.execute("ROLLBACK")
+                    return resultados_lote_abortado(resultados, len(operaciones))
+            return resultados
+
+    def _aplicar(self, conexion, origen: Cuenta, destino: Cuenta, monto: Centavos,
+                 periodos: Periodos) -> ResultadoTransferencia:
+        # Releer dentro de la transacción: `origen` puede estar desactualizada o eliminada
+        fila = conexion.execute(self._SQL_LIMITES, (origen.numero,)).fetchone()
+        if fila is None:
+            return SIN_ORIGEN
+        saldo, hoy, mes, periodo_dia, periodo_mes = fila
+        dia_actual, mes_actual = periodos
+        if periodo_dia != dia_actual:
+            hoy = 0
+        if periodo_mes != mes_actual:
+            mes = 0
+        limite_diario, limite_mensual = (self.limites(origen.numero) if self.limites is not None
+                                         else (self.limite_diario, self.limite_mensual))
+        rechazo = evaluar_limites(saldo, hoy, mes, monto, limite_diario, limite_mensual)
+        if rechazo is not None:
+            return rechazo
+        # Crédito primero: si el destino ya no existe no se modificó nada
+        if conexion.execute(self._SQL_ACREDITAR, (monto, destino.numero)).rowcount != 1:
+            return SIN_DESTINO
+        conexion.execute(self._SQL_DEBITAR, (monto, hoy + monto, mes + monto, dia_actual, mes_actual, origen.numero))
+        return ResultadoTransferencia(None, saldo - monto)
+
+    def resetear(self, numero: str, saldo: Centavos) -> Optional[Cuenta]:
+        cursor = self.pool.conexion().execute(self._SQL_RESETEAR, (saldo, numero))
+        return self.obtener(numero) if cursor.rowcount else None
+
+    def exportar(self) -> List[Cuenta]:
+        # Un único SELECT lee una instantánea consistente del archivo
+        return [Cuenta(*fila) for fila in self.pool.conexion().execute(self._SQL_EXPORTAR)]
+
+    def reemplazar(self, cuentas: Iterable[Cuenta], durante: Optional[Callable[[], None]] = None):
+        filas = [self._fila(cuenta) for cuenta in cuentas]
+        nuevas = {fila[0] for fila in filas}
+        with self.pool.transaccion() as conexion:
+            sobrantes = [fila for fila in conexion.execute(self._SQL_NUMEROS) if fila[0] not in nuevas]
+            conexion.executemany(self._SQL_ELIMINAR, sobrantes)
+            # Upsert: las versiones existentes no retroceden
+            conexion.executemany(self._SQL_GUARDAR, filas)
+            if durante is not None:
+                durante()
+
+    def __len__(self) -> int:
+        return self.pool.conexion().execute(self._SQL_CONTAR).fetchone()[0]
+
+    def cerrar(self):
+        self.pool.cerrar()
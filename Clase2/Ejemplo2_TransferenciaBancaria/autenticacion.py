@@ -0,0 +1,158 @@
+"""
+Verificación local de tokens firmados (JWT HS256) del header Authorization
+La firma se verifica sin llamar a otro servicio y el resultado se cachea por
+hash del token, así el costo por solicitud no crece con la carga
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+
+class TokenInvalido(Exception):
+    """Token mal formado, con firma inválida o fuera de vigencia"""
+
+    def __init__(self, motivo: str, cacheable: bool = True):
+        super().__init__(motivo)
+        # False si el token puede volverse válido (nbf futuro): no se cachea el rechazo
+        self.cacheable = cacheable
+
+
+def _b64(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode()
+
+
+def _b64_decodificar(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+_ENCABEZADO = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+
+def firmar(claims: dict, secreto: str) -> str:
+    """JWT HS256 con `claims` (para emitir tokens de prueba; la API solo verifica)"""
+    cuerpo = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    firma = hmac.new(secreto.encode(), f"{_ENCABEZADO}.{cuerpo}".encode(), hashlib.sha256).digest()
+    return f"{_ENCABEZADO}.{cuerpo}.{_b64(firma)}"
+
+
+def verificar_firma(token: str, secreto: bytes, ahora: float) -> dict:
+    """Claims de un JWT HS256 con firma válida y vigente (`exp`/`nbf`); lanza TokenInvalido si no"""
+    partes = token.split(".")
+    if len(partes) != 3:
+        raise TokenInvalido("formato")
+    encabezado, cuerpo, firma = partes
+    try:
+        firma = _b64_decodificar(firma)
+    except (binascii.Error, ValueError):
+        raise TokenInvalido("formato")
+    esperada = hmac.new(secreto, f"{encabezado}.{cuerpo}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(esperada, firma):
+        raise TokenInvalido("firma")
+    # La firma cubre encabezado y cuerpo: recién ahora se interpretan
+    try:
+        algoritmo = json.loads(_b64_decodificar(encabezado)).get("alg")
+        claims = json.loads(_b64_decodificar(cuerpo))
+    except (binascii.Error, ValueError, AttributeError):
+        raise TokenInvalido("formato")
+    if algoritmo != "HS256" or not isinstance(claims, dict):
+        raise TokenInvalido("formato")
+    for campo in ("exp", "nbf"):
+        if campo in claims and not isinstance(claims[campo], (int, float)):
+            raise TokenInvalido("formato")
+    if "exp" in claims and claims["exp"] <= ahora:
+        raise TokenInvalido("vencido")
+    if "nbf" in claims and claims["nbf"] > ahora:
+        raise TokenInvalido("aun_no_valido", cacheable=False)
+    return claims
+
+
+class VerificadorTokens:
+    """
+    Verifica tokens con `verificar_firma` y cachea el resultado por SHA-256
+    del token (el token en sí no se guarda).
+
+    - Los válidos se cachean hasta su `exp`, con un máximo de `ttl_maximo`
+      segundos; los inválidos, `ttl_negativo` segundos, así un token inválido
+      repetido tampoco paga la verificación.
+    - Válidos e inválidos van en LRU separadas de `max_entradas` cada una:
+      una ráfaga de tokens inválidos no desplaza a los válidos.
+    - `observar(resultado, token)` recibe ("acierto" | "fallo", "valido" |
+      "invalido") por cada verificación, para las métricas de tasa de aciertos.
+    """
+
+    def __init__(self, secreto: str, max_entradas: int = 100_000, ttl_maximo: float = 300,
+                 ttl_negativo: float = 60, observar: Optional[Callable[[str, str], None]] = None,
+                 reloj=time.time):
+        if not secreto:
+            raise ValueError("El secreto de los tokens no puede ser vacío")
+        self._secreto = secreto.encode()
+        self.max_entradas = max_entradas
+        self.ttl_maximo = ttl_maximo
+        self.ttl_negativo = ttl_negativo
+        self._observar = observar or (lambda resultado, token: None)
+        self._reloj = reloj
+        # hash del token -> (claims, vence)
+        self._validos: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        # hash del token -> (motivo, vence)
+        self._invalidos: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._validos) + len(self._invalidos)
+
+    def verificar(self, token: str) -> dict:
+        """Claims del token; lanza TokenInvalido si no es válido"""
+        clave = hashlib.sha256(token.encode()).digest()
+        ahora = self._reloj()
+        with self._lock:
+            resultado = self._buscar(self._validos, clave, ahora)
+            if resultado is None:
+                rechazo = self._buscar(self._invalidos, clave, ahora)
+        if resultado is not None:
+            self._observar("acierto", "valido")
+            return resultado
+        if rechazo is not None:
+            self._observar("acierto", "invalido")
+            raise TokenInvalido(rechazo)
+
+        # Fuera del lock: la verificación (HMAC) es la parte costosa
+        try:
+            claims = verificar_firma(token, self._secreto, ahora)
+        except TokenInvalido as e:
+            self._observar("fallo", "invalido")
+            if e.cacheable:
+                self._guardar(self._invalidos, clave, str(e), ahora + self.ttl_negativo)
+            raise
+        self._observar("fallo", "valido")
+        self._guardar(self._validos, clave, claims, min(claims.get("exp", float("inf")), ahora + self.ttl_maximo))
+        return claims
+
+    def limpiar(self):
+        with self._lock:
+            self._validos.clear()
+            self._invalidos.clear()
+
+    @staticmethod
+    def _buscar(cache: OrderedDict, clave: bytes, ahora: float):
+        # Requiere self._lock
+        entrada = cache.get(clave)
+        if entrada is None:
+            return None
+        if entrada[1] <= ahora:
+            del cache[clave]
+            return None
+        cache.move_to_end(clave)
+        return entrada[0]
+
+    def _guardar(self, cache: OrderedDict, clave: bytes, valor, vence: float):
+        with self._lock:
+            cache[clave] = (valor, vence)
+            cache.move_to_end(clave)
+            if len(cache) > self.max_entradas:
+                cache.popitem(last=False)
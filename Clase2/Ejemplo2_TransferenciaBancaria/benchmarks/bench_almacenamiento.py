@@ -0,0 +1,63 @@
+"""
+Benchmark de almacenes de cuentas: memoria vs SQLite (WAL)
+Mide transferencias/seg con N threads sobre pares de cuentas disjuntos
+
+Uso:
+    python benchmarks/bench_almacenamiento.py --threads 1 4 8 --ops 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import AlmacenMemoria, AlmacenSQLite  # noqa: E402
+from bloqueos import GestorBloqueos  # noqa: E402
+from motor_transferencias import Cuenta  # noqa: E402
+
+INFINITO = float("inf")
+
+
+def ejecutar(almacen, threads: int, ops_por_thread: int) -> float:
+    almacen.sembrar(Cuenta(f"{i:08d}", saldo=10**12) for i in range(threads * 2))
+    barrera = threading.Barrier(threads + 1)
+
+    def worker(n: int):
+        origen = almacen.obtener(f"{2 * n:08d}")
+        destino = almacen.obtener(f"{2 * n + 1:08d}")
+        barrera.wait()
+        for _ in range(ops_por_thread):
+            almacen.transferir(origen, destino, 100)
+
+    hilos = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for h in hilos:
+        h.start()
+    barrera.wait()
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.join()
+    return threads * ops_por_thread / (time.perf_counter() - inicio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--ops", type=int, default=2000, help="Transferencias por thread")
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} | {'memoria (tx/s)':>16} | {'sqlite (tx/s)':>16}")
+    print("-" * 46)
+    for n in args.threads:
+        memoria = ejecutar(AlmacenMemoria(GestorBloqueos(), INFINITO, INFINITO), n, args.ops)
+        with tempfile.TemporaryDirectory() as directorio:
+            sqlite = AlmacenSQLite(os.path.join(directorio, "bench.db"), INFINITO, INFINITO)
+            tps_sqlite = ejecutar(sqlite, n, args.ops)
+            sqlite.cerrar()
+        print(f"{n:>8} | {memoria:>16,.0f} | {tps_sqlite:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
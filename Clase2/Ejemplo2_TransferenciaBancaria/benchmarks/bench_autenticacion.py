@@ -0,0 +1,70 @@
+"""
+Benchmark de la verificación de tokens: costo por solicitud con y sin cache
+Cada solicitud presenta el token de uno de C clientes al azar (un token por
+cliente, reutilizado como haría una sesión); una fracción de las solicitudes
+trae un token inválido. Se compara verificar la firma siempre contra
+VerificadorTokens, y se reporta la tasa de aciertos de la cache.
+
+Uso:
+    python benchmarks/bench_autenticacion.py --clientes 1000 100000 --invalidos 0.05
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autenticacion import TokenInvalido, VerificadorTokens, firmar, verificar_firma  # noqa: E402
+
+SECRETO = "secreto-bench"
+
+
+def generar(clientes: int, solicitudes: int, invalidos: float, semilla: int):
+    aleatorio = random.Random(semilla)
+    exp = time.time() + 3600
+    tokens = [firmar({"sub": f"cliente-{i}", "exp": exp}, SECRETO) for i in range(clientes)]
+    # Los inválidos también se repiten (un cliente con un token viejo reintenta)
+    falsos = [firmar({"sub": f"intruso-{i}", "exp": exp}, "otro") for i in range(max(1, clientes // 100))]
+    return [aleatorio.choice(falsos) if aleatorio.random() < invalidos else aleatorio.choice(tokens)
+            for _ in range(solicitudes)]
+
+
+def medir(verificar, solicitudes) -> float:
+    """Nanosegundos por verificación"""
+    inicio = time.perf_counter()
+    for token in solicitudes:
+        try:
+            verificar(token)
+        except TokenInvalido:
+            pass
+    return (time.perf_counter() - inicio) / len(solicitudes) * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--solicitudes", type=int, default=200_000)
+    parser.add_argument("--invalidos", type=float, default=0.05, help="Fracción de solicitudes con token inválido")
+    parser.add_argument("--cache", type=int, default=100_000, help="Entradas de la cache (AUTH_CACHE_MAX)")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    secreto = SECRETO.encode()
+    print(f"{'clientes':>9} | {'sin cache ns':>12} | {'con cache ns':>12} | {'aciertos':>8}")
+    print("-" * 52)
+    for clientes in args.clientes:
+        solicitudes = generar(clientes, args.solicitudes, args.invalidos, args.semilla)
+        sin_cache = medir(lambda token: verificar_firma(token, secreto, time.time()), solicitudes)
+        resultados = Counter()
+        verificador = VerificadorTokens(SECRETO, args.cache, ttl_maximo=3600,
+                                        observar=lambda resultado, token: resultados.update((resultado,)))
+        con_cache = medir(verificador.verificar, solicitudes)
+        aciertos = resultados["acierto"] / sum(resultados.values())
+        print(f"{clientes:>9,} | {sin_cache:>12,.0f} | {con_cache:>12,.0f} | {aciertos:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark de carga: transferencias/seg vs número de threads
+Compara el lock global (1 partición) contra los locks particionados por cuenta
+
+Con el motor en memoria tal cual (--latencia-ms 0, por defecto) no hay ganancia:
+la sección crítica es código Python que retiene el GIL y los threads se
+serializan igual con un lock global que con locks por cuenta. La ventaja solo
+aparece cuando la sección crítica espera I/O (--latencia-ms simula el commit
+durante el cual se suelta el GIL).
+
+Uso:
+    python benchmarks/bench_bloqueos.py --threads 1 2 4 8 16 --ops 5000
+    python benchmarks/bench_bloqueos.py --threads 1 2 4 8 16 --latencia-ms 1
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from almacenamiento import AlmacenMemoria  # noqa: E402
+from bloqueos import GestorBloqueos  # noqa: E402
+from motor_transferencias import Cuenta  # noqa: E402
+
+
+class GestorConLatencia(GestorBloqueos):
+    """Simula el costo de persistir el commit (I/O) mientras se retienen los locks"""
+
+    def __init__(self, particiones: int, latencia_s: float):
+        super().__init__(particiones)
+        self.latencia_s = latencia_s
+
+    @contextmanager
+    def adquirir(self, *cuentas: str):
+        with super().adquirir(*cuentas):
+            if self.latencia_s:
+                time.sleep(self.latencia_s)
+            yield
+
+
+def preparar_cuentas(bloqueos: GestorBloqueos, num_cuentas: int):
+    main.almacen = AlmacenMemoria(bloqueos, float("inf"), float("inf"))
+    main.transferencias_historial.limpiar()
+    for i in range(num_cuentas):
+        main.almacen.guardar(Cuenta(f"{i:08d}", saldo=10**12))
+
+
+def ejecutar(threads: int, particiones: int, ops_por_thread: int, latencia_s: float) -> float:
+    """Cada thread transfiere dentro de su propio par de cuentas (pares disjuntos)"""
+    preparar_cuentas(GestorConLatencia(particiones, latencia_s), threads * 2)
+    barrera = threading.Barrier(threads + 1)
+
+    def worker(n: int):
+        origen = main.almacen.obtener(f"{2 * n:08d}")
+        destino = main.almacen.obtener(f"{2 * n + 1:08d}")
+        barrera.wait()
+        for _ in range(ops_por_thread):
+            main.procesar_transferencia(origen, destino, 100)
+
+    hilos = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for h in hilos:
+        h.start()
+    barrera.wait()
+    inicio = time.perf_counter()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+    return threads * ops_por_thread / duracion
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--ops", type=int, default=200, help="Transferencias por thread")
+    parser.add_argument("--latencia-ms", type=float, default=0.0,
+                        help="Latencia simulada de commit (I/O) dentro de la sección crítica")
+    parser.add_argument("--particiones", type=int, default=256)
+    args = parser.parse_args()
+
+    latencia_s = args.latencia_ms / 1000
+    print(f"{'threads':>8} | {'lock global (tx/s)':>20} | {'por cuenta (tx/s)':>20} | {'speedup':>8}")
+    print("-" * 66)
+    for n in args.threads:
+        global_tps = ejecutar(n, 1, args.ops, latencia_s)
+        sharded_tps = ejecutar(n, args.particiones, args.ops, latencia_s)
+        print(f"{n:>8} | {global_tps:>20,.0f} | {sharded_tps:>20,.0f} | {sharded_tps / global_tps:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
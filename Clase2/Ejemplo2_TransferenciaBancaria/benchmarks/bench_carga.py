@@ -0,0 +1,270 @@
+"""
+Generador de carga para POST /api/transferencias
+Ejecuta la API en proceso (transporte ASGI de httpx, sin red) o sobre un socket
+real (uvicorn en un subproceso, o un servidor ya levantado con --url) y
+reporta latencias p50/p95/p99 y transferencias/seg en JSON, para comparar
+resultados entre commits.
+
+Uso:
+    python benchmarks/bench_carga.py --modo asgi --concurrencia 32 --solicitudes 20000
+    python benchmarks/bench_carga.py --modo socket --distribucion caliente --salida carga.json
+    python benchmarks/bench_carga.py --modo socket --url http://localhost:8000 --cuentas-existentes
+
+El rate limit del proceso bajo prueba se eleva con RATE_LIMIT_MAX_OPS y las
+transferencias "otp" usan el código estático OTP_ESTATICO (o se respetan los
+del entorno si ya están definidos). Con --url, el servidor debe haberse
+iniciado con esas variables y las cuentas deben existir.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+DIRECTORIO_API = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, DIRECTORIO_API)
+
+# Montos en unidades por tipo; "otp" supera MONTO_REQUIERE_OTP y envía X-OTP
+RANGOS_MONTO = {
+    "pequeno": (1.00, 100.00),
+    "mediano": (100.00, 5000.00),
+    "otp": (1_000_000.01, 2_000_000.00),
+}
+CUENTAS_EXISTENTES = ["12345678", "87654321", "87654322"]
+OTP = "123456"  # OTP_ESTATICO del proceso bajo prueba: evita emitir un desafío por transferencia
+
+
+def entorno_servidor() -> Dict[str, str]:
+    """Variables para el proceso bajo prueba: rate limit alto y OTP estático salvo que ya vengan definidos"""
+    entorno = dict(os.environ)
+    entorno.setdefault("RATE_LIMIT_MAX_OPS", str(10**9))
+    entorno.setdefault("OTP_ESTATICO", OTP)
+    return entorno
+
+
+def numeros_cuenta(cantidad: int) -> List[str]:
+    return [f"{70_000_000 + i:08d}" for i in range(cantidad)]
+
+
+def sembrar_cuentas(cantidad: int):
+    """Crea cuentas con saldo amplio en el almacén de `main` (solo en proceso)"""
+    import main
+    from dinero import a_centavos
+    from motor_transferencias import Cuenta
+    main.almacen.sembrar(Cuenta(numero, saldo=a_centavos(10**9)) for numero in numeros_cuenta(cantidad))
+
+
+def parsear_mezcla(texto: str) -> List[Tuple[str, float]]:
+    mezcla = []
+    for parte in texto.split(","):
+        tipo, _, peso = parte.partition("=")
+        if tipo not in RANGOS_MONTO:
+            raise argparse.ArgumentTypeError(f"Tipo de monto desconocido: {tipo}")
+        mezcla.append((tipo, float(peso)))
+    return mezcla
+
+
+class Escenario:
+    """Genera (origen, destino, monto, usa_otp) según la distribución de cuentas y la mezcla de montos"""
+
+    def __init__(self, cuentas: List[str], distribucion: str, fraccion_caliente: float,
+                 peso_caliente: float, mezcla: List[Tuple[str, float]], semilla: int):
+        self.cuentas = cuentas
+        self.distribucion = distribucion
+        self.calientes = cuentas[:max(2, int(len(cuentas) * fraccion_caliente))]
+        self.peso_caliente = peso_caliente
+        self.tipos = [tipo for tipo, _ in mezcla]
+        self.pesos = [peso for _, peso in mezcla]
+        self.rng = random.Random(semilla)
+
+    def _cuenta(self) -> str:
+        if self.distribucion == "caliente" and self.rng.random() < self.peso_caliente:
+            return self.rng.choice(self.calientes)
+        return self.rng.choice(self.cuentas)
+
+    def siguiente(self) -> Tuple[str, str, float, bool]:
+        origen = self._cuenta()
+        destino = self._cuenta()
+        while destino == origen:
+            destino = self._cuenta()
+        tipo = self.rng.choices(self.tipos, self.pesos)[0]
+        minimo, maximo = RANGOS_MONTO[tipo]
+        monto = round(self.rng.uniform(minimo, maximo), 2)
+        return origen, destino, monto, tipo == "otp"
+
+
+async def generar_carga(cliente: httpx.AsyncClient, escenario: Escenario, solicitudes: int,
+                        concurrencia: int, calentamiento: int) -> Tuple[List[float], Counter, float]:
+    """Lanza `concurrencia` clientes hasta completar las solicitudes; retorna (latencias, códigos, duración)"""
+    pendientes = iter(range(calentamiento + solicitudes))
+    latencias: List[float] = []
+    codigos: Counter = Counter()
+    inicio_medicion = [0.0]
+
+    async def cliente_virtual():
+        encabezados = {"Authorization": "Bearer carga"}
+        for n in pendientes:
+            origen, destino, monto, usa_otp = escenario.siguiente()
+            if n == calentamiento:
+                inicio_medicion[0] = time.perf_counter()
+            inicio = time.perf_counter()
+            try:
+                respuesta = await cliente.post(
+                    "/api/transferencias",
+                    json={"origen": origen, "destino": destino, "monto": monto},
+                    headers={**encabezados, "X-OTP": OTP} if usa_otp else encabezados
+                )
+                codigo = respuesta.status_code
+            except httpx.HTTPError as e:
+                codigo = type(e).__name__  # conexión cortada, timeout, ...
+            if n >= calentamiento:
+                latencias.append(time.perf_counter() - inicio)
+                codigos[codigo] += 1
+
+    await asyncio.gather(*(cliente_virtual() for _ in range(concurrencia)))
+    return latencias, codigos, time.perf_counter() - inicio_medicion[0]
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not ordenados:
+        return 0.0
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+def commit_actual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORIO_API,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def iniciar_servidor(puerto: int, cuentas: int) -> subprocess.Popen:
+    proceso = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--servidor", "--puerto", str(puerto), "--cuentas", str(cuentas)],
+        env=entorno_servidor()
+    )
+    url = f"http://127.0.0.1:{puerto}/health"
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return proceso
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("El servidor no respondió en 30 segundos")
+
+
+def servir(puerto: int, cuentas: int):
+    """Rol de servidor del modo socket: siembra cuentas y atiende con uvicorn"""
+    import uvicorn
+    import main
+    sembrar_cuentas(cuentas)
+    uvicorn.run(main.app, host="127.0.0.1", port=puerto, log_level="warning")
+
+
+async def ejecutar(args) -> dict:
+    cuentas = CUENTAS_EXISTENTES if args.cuentas_existentes else numeros_cuenta(args.cuentas)
+    escenario = Escenario(cuentas, args.distribucion, args.fraccion_caliente, args.peso_caliente,
+                          args.mezcla, args.semilla)
+    limites = httpx.Limits(max_connections=args.concurrencia, max_keepalive_connections=args.concurrencia)
+    proceso = None
+
+    if args.modo == "asgi":
+        os.environ.update(entorno_servidor())
+        import main
+        if not args.cuentas_existentes:
+            sembrar_cuentas(args.cuentas)
+        cliente = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://asgi")
+    else:
+        url = args.url
+        if url is None:
+            proceso = iniciar_servidor(args.puerto, args.cuentas)
+            url = f"http://127.0.0.1:{args.puerto}"
+        cliente = httpx.AsyncClient(base_url=url, limits=limites, timeout=30)
+
+    try:
+        async with cliente:
+            latencias, codigos, duracion = await generar_carga(
+                cliente, escenario, args.solicitudes, args.concurrencia, args.calentamiento
+            )
+    finally:
+        if proceso is not None:
+            proceso.terminate()
+            proceso.wait(timeout=10)
+
+    latencias.sort()
+    exitosas = codigos.get(200, 0)
+    return {
+        "commit": commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "configuracion": {
+            "modo": args.modo,
+            "concurrencia": args.concurrencia,
+            "solicitudes": args.solicitudes,
+            "distribucion": args.distribucion,
+            "cuentas": len(cuentas),
+            "mezcla": dict(args.mezcla),
+            "almacen": os.getenv("ALMACEN_CUENTAS", "memoria"),
+            "libro_mayor": os.getenv("LIBRO_MAYOR", "0") == "1",
+        },
+        "duracion_s": round(duracion, 3),
+        "solicitudes_por_seg": round(len(latencias) / duracion, 1),
+        "transferencias_por_seg": round(exitosas / duracion, 1),
+        "latencia_ms": {
+            "p50": round(percentil(latencias, 50) * 1000, 3),
+            "p95": round(percentil(latencias, 95) * 1000, 3),
+            "p99": round(percentil(latencias, 99) * 1000, 3),
+            "max": round(latencias[-1] * 1000, 3) if latencias else 0.0,
+        },
+        "codigos": {str(codigo): cantidad for codigo, cantidad in sorted(codigos.items(), key=lambda c: str(c[0]))},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modo", choices=("asgi", "socket"), default="asgi")
+    parser.add_argument("--url", help="Servidor ya levantado (modo socket); por defecto se inicia uno")
+    parser.add_argument("--puerto", type=int, default=8799, help="Puerto del servidor que se inicia")
+    parser.add_argument("--concurrencia", type=int, default=32, help="Clientes simultáneos")
+    parser.add_argument("--solicitudes", type=int, default=10_000)
+    parser.add_argument("--calentamiento", type=int, default=200, help="Solicitudes iniciales sin medir")
+    parser.add_argument("--cuentas", type=int, default=1000, help="Cuentas sembradas para la carga")
+    parser.add_argument("--cuentas-existentes", action="store_true",
+                        help="Usar solo las cuentas de prueba de main.py (no siembra)")
+    parser.add_argument("--distribucion", choices=("uniforme", "caliente"), default="uniforme")
+    parser.add_argument("--fraccion-caliente", type=float, default=0.01,
+                        help="Fracción de cuentas calientes (distribución caliente)")
+    parser.add_argument("--peso-caliente", type=float, default=0.8,
+                        help="Probabilidad de elegir una cuenta caliente")
+    parser.add_argument("--mezcla", type=parsear_mezcla, default=parsear_mezcla("pequeno=0.9,mediano=0.09,otp=0.01"),
+                        help="Pesos por tipo de monto: pequeno, mediano, otp")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON de resultados (además de imprimirlos)")
+    parser.add_argument("--servidor", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servidor:
+        servir(args.puerto, args.cuentas)
+        return
+
+    resultado = asyncio.run(ejecutar(args))
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
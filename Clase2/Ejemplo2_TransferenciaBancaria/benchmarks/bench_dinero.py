@@ -0,0 +1,94 @@
+"""
+Benchmark de la representación de montos: float (versión anterior) vs centavos int
+Mide el costo por transferencia de cada etapa (parseo del monto, débito/crédito
+en el motor, conversión para la respuesta) y la deriva acumulada de los saldos
+
+Uso:
+    python benchmarks/bench_dinero.py --transferencias 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bloqueos import GestorBloqueos  # noqa: E402
+from dinero import a_centavos, a_unidades  # noqa: E402
+from motor_transferencias import Cuenta, MotorTransferencias  # noqa: E402
+
+CUENTAS = 16
+SALDO_INICIAL = "1000000.00"
+
+
+def parsear_float(valor: float) -> float:
+    """Réplica del validador anterior de TransferenciaRequest.monto"""
+    if round(valor, 2) != valor:
+        raise ValueError("El monto solo puede tener máximo 2 decimales")
+    return valor
+
+
+def por_operacion(funcion, valores) -> float:
+    inicio = time.perf_counter()
+    for valor in valores:
+        funcion(valor)
+    return (time.perf_counter() - inicio) / len(valores) * 1e6
+
+
+def ejecutar_motor(saldo_inicial, montos, pares):
+    """Aplica las transferencias; retorna (µs por transferencia, saldos finales)"""
+    cuentas = [Cuenta(f"{i:08d}", saldo=saldo_inicial) for i in range(CUENTAS)]
+    motor = MotorTransferencias(GestorBloqueos(), float("inf"), float("inf"), periodos=lambda: (1, 1))
+    inicio = time.perf_counter()
+    for (o, d), monto in zip(pares, montos):
+        motor.validar_y_aplicar(cuentas[o], cuentas[d], monto)
+    duracion = time.perf_counter() - inicio
+    return duracion / len(montos) * 1e6, [c.saldo for c in cuentas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transferencias", type=int, default=200_000)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semilla)
+    textos = [f"{rng.randrange(1, 100_000) / 100:.2f}" for _ in range(args.transferencias)]
+    floats = [float(t) for t in textos]
+    centavos = [a_centavos(t) for t in textos]
+    pares = []
+    for _ in range(args.transferencias):
+        o = rng.randrange(CUENTAS)
+        pares.append((o, (o + rng.randrange(1, CUENTAS)) % CUENTAS))
+
+    parseo_float = por_operacion(parsear_float, floats)
+    parseo_centavos = por_operacion(a_centavos, floats)
+    motor_float, saldos_float = ejecutar_motor(float(SALDO_INICIAL), floats, pares)
+    motor_centavos, saldos_centavos = ejecutar_motor(a_centavos(SALDO_INICIAL), centavos, pares)
+    respuesta_centavos = por_operacion(a_unidades, centavos)
+
+    print(f"{'etapa (µs/transferencia)':<28} | {'float':>10} | {'centavos':>10}")
+    print("-" * 54)
+    print(f"{'parseo del monto':<28} | {parseo_float:>10.3f} | {parseo_centavos:>10.3f}")
+    print(f"{'motor (débito/crédito)':<28} | {motor_float:>10.3f} | {motor_centavos:>10.3f}")
+    print(f"{'conversión para respuesta':<28} | {0:>10.3f} | {respuesta_centavos:>10.3f}")
+    total_float = parseo_float + motor_float
+    total_centavos = parseo_centavos + motor_centavos + respuesta_centavos
+    print(f"{'total':<28} | {total_float:>10.3f} | {total_centavos:>10.3f}")
+
+    # Deriva: saldos finales contra el cálculo exacto en Decimal
+    exactos = [Decimal(SALDO_INICIAL)] * CUENTAS
+    for (o, d), texto in zip(pares, textos):
+        exactos[o] -= Decimal(texto)
+        exactos[d] += Decimal(texto)
+    deriva_float = max(abs(Decimal(s) - e) for s, e in zip(saldos_float, exactos))
+    deriva_centavos = max(abs(Decimal(s).scaleb(-2) - e) for s, e in zip(saldos_centavos, exactos))
+    print(f"\nDeriva máxima por cuenta tras {args.transferencias:,} transferencias:")
+    print(f"  float:    {deriva_float:.3E}")
+    print(f"  centavos: {deriva_centavos}")
+
+
+if __name__ == "__main__":
+    main()
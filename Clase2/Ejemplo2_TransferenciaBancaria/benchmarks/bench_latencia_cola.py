@@ -0,0 +1,249 @@
+"""
+Latencia de cola de POST /api/transferencias con locks de cuentas ocupados
+Levanta la API con uvicorn en un subproceso en el que un thread retiene
+periódicamente los locks de las cuentas calientes (como un lote o un reset en
+el threadpool). N conexiones keep-alive envían transferencias y una sonda
+consulta /health, que no toca cuentas: su latencia muestra cuánto se detiene
+el event loop.
+
+Sin --tasa cada conexión envía la siguiente solicitud al recibir la respuesta
+(servidor saturado: la latencia es sobre todo cola). Con --tasa las
+solicitudes se envían a ritmo fijo y la latencia se mide desde el instante
+programado, así las esperas del servidor no reducen la carga que se mide.
+
+Con --modo-anterior el motor espera los locks dentro del event loop (como
+antes de procesar_transferencia_async), para comparar en la misma máquina.
+
+Uso:
+    python benchmarks/bench_latencia_cola.py --concurrencia 500 --solicitudes 20000
+    python benchmarks/bench_latencia_cola.py --concurrencia 500 --solicitudes 20000 --modo-anterior
+    python benchmarks/bench_latencia_cola.py --concurrencia 500 --solicitudes 10000 --tasa 400
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Tuple
+
+from bench_carga import Escenario, commit_actual, entorno_servidor, numeros_cuenta, percentil
+
+
+def retener_locks(bloqueos, cuentas: List[str], periodo: float, retencion: float):
+    """Toma los locks de `cuentas` durante `retencion` segundos cada `periodo`"""
+    while True:
+        time.sleep(periodo)
+        with bloqueos.adquirir(*cuentas):
+            time.sleep(retencion)
+
+
+def servir(args):
+    """Rol de servidor: siembra cuentas, inicia el thread que retiene locks y atiende con uvicorn"""
+    import uvicorn
+    import main
+    from bench_carga import sembrar_cuentas
+    sembrar_cuentas(args.cuentas)
+    if args.modo_anterior:
+        # El intento sin espera pasa a esperar: el loop se bloquea con los locks ocupados
+        main.almacen.intentar_transferir = lambda origen, destino, monto, desde=None: main.almacen.transferir(
+            origen, destino, monto)
+    calientes = escenario(args).calientes
+    threading.Thread(
+        target=retener_locks, args=(main.almacen.bloqueos, calientes, args.periodo_ms / 1000, args.retencion_ms / 1000),
+        daemon=True
+    ).start()
+    uvicorn.run(main.app, host="127.0.0.1", port=args.puerto, log_level="warning", backlog=4096)
+
+
+def escenario(args) -> Escenario:
+    return Escenario(numeros_cuenta(args.cuentas), "caliente", args.fraccion_caliente,
+                     args.peso_caliente, [("pequeno", 1.0)], args.semilla)
+
+
+class ConexionHTTP:
+    """
+    Cliente HTTP/1.1 keep-alive mínimo sobre asyncio: mucho más liviano que
+    un cliente completo, para que con cientos de conexiones el costo medido
+    sea el del servidor y no el del generador de carga.
+    """
+
+    def __init__(self, puerto: int):
+        self.puerto = puerto
+        self.lector = self.escritor = None
+
+    async def solicitar(self, metodo: str, ruta: str, cuerpo: bytes = b"") -> int:
+        if self.escritor is None:
+            self.lector, self.escritor = await asyncio.open_connection("127.0.0.1", self.puerto)
+        self.escritor.write(
+            f"{metodo} {ruta} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer carga\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(cuerpo)}\r\n\r\n".encode() + cuerpo
+        )
+        encabezados = await self.lector.readuntil(b"\r\n\r\n")
+        codigo = int(encabezados[9:12])
+        largo = 0
+        for linea in encabezados.split(b"\r\n"):
+            if linea[:15].lower() == b"content-length:":
+                largo = int(linea[15:])
+        await self.lector.readexactly(largo)
+        return codigo
+
+    def cerrar(self):
+        if self.escritor is not None:
+            self.escritor.close()
+
+
+async def generar_carga(args) -> Tuple[List[float], List[float], List[float], Counter, float]:
+    generador = escenario(args)
+    calientes = set(generador.calientes)
+    pendientes = iter(range(args.solicitudes))
+    latencias: List[float] = []
+    latencias_frias: List[float] = []
+    latencias_health: List[float] = []
+    codigos: Counter = Counter()
+    terminado = asyncio.Event()
+
+    # Con tasa fija, cada conexión envía cada `intervalo` segundos, desfasadas entre sí
+    intervalo = args.concurrencia / args.tasa if args.tasa else 0.0
+    comienzo = time.perf_counter() + 0.5
+
+    async def cliente_virtual(indice: int):
+        conexion = ConexionHTTP(args.puerto)
+        programado = comienzo + indice * intervalo / args.concurrencia
+        try:
+            for _ in pendientes:
+                origen, destino, _, _ = generador.siguiente()
+                cuerpo = json.dumps({"origen": origen, "destino": destino, "monto": 1.0}).encode()
+                if intervalo:
+                    await asyncio.sleep(max(0.0, programado - time.perf_counter()))
+                    inicio = programado
+                    programado += intervalo
+                else:
+                    inicio = time.perf_counter()
+                try:
+                    codigo = await conexion.solicitar("POST", "/api/transferencias", cuerpo)
+                except (OSError, asyncio.IncompleteReadError) as e:
+                    codigo = type(e).__name__
+                    conexion.cerrar()
+                    conexion = ConexionHTTP(args.puerto)
+                latencia = time.perf_counter() - inicio
+                latencias.append(latencia)
+                if origen not in calientes and destino not in calientes:
+                    latencias_frias.append(latencia)
+                codigos[codigo] += 1
+        finally:
+            conexion.cerrar()
+
+    async def sonda():
+        conexion = ConexionHTTP(args.puerto)
+        while not terminado.is_set():
+            inicio = time.perf_counter()
+            await conexion.solicitar("GET", "/health")
+            latencias_health.append(time.perf_counter() - inicio)
+            await asyncio.sleep(0.01)
+        conexion.cerrar()
+
+    tarea_sonda = asyncio.ensure_future(sonda())
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente_virtual(i) for i in range(args.concurrencia)))
+    duracion = time.perf_counter() - inicio
+    terminado.set()
+    await tarea_sonda
+    return latencias, latencias_frias, latencias_health, codigos, duracion
+
+
+def iniciar_servidor(args) -> subprocess.Popen:
+    comando = [sys.executable, os.path.abspath(__file__), "--servidor", "--puerto", str(args.puerto),
+               "--cuentas", str(args.cuentas), "--fraccion-caliente", str(args.fraccion_caliente),
+               "--periodo-ms", str(args.periodo_ms), "--retencion-ms", str(args.retencion_ms)]
+    if args.modo_anterior:
+        comando.append("--modo-anterior")
+    proceso = subprocess.Popen(comando, env=entorno_servidor())
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            asyncio.run(ConexionHTTP(args.puerto).solicitar("GET", "/health"))
+            return proceso
+        except OSError:
+            time.sleep(0.2)
+    proceso.terminate()
+    raise RuntimeError("El servidor no respondió en 30 segundos")
+
+
+def resumen(valores: List[float]) -> dict:
+    valores.sort()
+    return {
+        "p50": round(percentil(valores, 50) * 1000, 3),
+        "p95": round(percentil(valores, 95) * 1000, 3),
+        "p99": round(percentil(valores, 99) * 1000, 3),
+        "max": round(valores[-1] * 1000, 3) if valores else 0.0,
+    }
+
+
+def ejecutar(args) -> dict:
+    proceso = iniciar_servidor(args)
+    try:
+        latencias, frias, health, codigos, duracion = asyncio.run(generar_carga(args))
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+    return {
+        "commit": commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "configuracion": {
+            "modo_anterior": args.modo_anterior,
+            "concurrencia": args.concurrencia,
+            "solicitudes": args.solicitudes,
+            "cuentas": args.cuentas,
+            "fraccion_caliente": args.fraccion_caliente,
+            "peso_caliente": args.peso_caliente,
+            "periodo_ms": args.periodo_ms,
+            "retencion_ms": args.retencion_ms,
+            "tasa": args.tasa,
+        },
+        "duracion_s": round(duracion, 3),
+        "solicitudes_por_seg": round(len(latencias) / duracion, 1),
+        "latencia_ms": resumen(latencias),
+        "latencia_cuentas_frias_ms": resumen(frias),
+        "latencia_health_ms": resumen(health),
+        "codigos": {str(codigo): cantidad for codigo, cantidad in sorted(codigos.items(), key=lambda c: str(c[0]))},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrencia", type=int, default=500, help="Conexiones simultáneas")
+    parser.add_argument("--solicitudes", type=int, default=20_000)
+    parser.add_argument("--cuentas", type=int, default=1000)
+    parser.add_argument("--fraccion-caliente", type=float, default=0.01)
+    parser.add_argument("--peso-caliente", type=float, default=0.3,
+                        help="Probabilidad de elegir una cuenta caliente como origen o destino")
+    parser.add_argument("--periodo-ms", type=float, default=50, help="Cada cuánto se retienen los locks")
+    parser.add_argument("--retencion-ms", type=float, default=10, help="Cuánto se retienen")
+    parser.add_argument("--tasa", type=float, default=0,
+                        help="Solicitudes/seg totales a ritmo fijo (0: cada conexión espera su respuesta)")
+    parser.add_argument("--modo-anterior", action="store_true",
+                        help="El motor espera los locks en el event loop (comparación)")
+    parser.add_argument("--puerto", type=int, default=8798)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--salida", help="Archivo JSON de resultados (además de imprimirlos)")
+    parser.add_argument("--servidor", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.servidor:
+        servir(args)
+        return
+
+    resultado = ejecutar(args)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
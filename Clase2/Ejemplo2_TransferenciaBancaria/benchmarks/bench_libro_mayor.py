@@ -0,0 +1,102 @@
+"""
+Benchmark del libro mayor (commit agrupado) vs una transacción por transferencia
+N clientes asyncio envían transferencias entre pares de cuentas disjuntos, sin
+HTTP, por el mismo camino que POST /api/transferencias:
+
+- individual: en memoria se aplica en el loop; con SQLite, en un threadpool
+  de 40 threads (como run_in_threadpool), y se registra en el historial
+- libro mayor: LibroMayor.transferir (un escritor, un commit por lote)
+
+Uso:
+    python benchmarks/bench_libro_mayor.py --clientes 1 16 128 512 --ops 20000
+    python benchmarks/bench_libro_mayor.py --almacen sqlite --espera-us 200 --max-lote 512
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import AlmacenMemoria, AlmacenSQLite  # noqa: E402
+from bloqueos import GestorBloqueos  # noqa: E402
+from historial import HistorialTransferencias  # noqa: E402
+from libro_mayor import LibroMayor  # noqa: E402
+from motor_transferencias import Cuenta  # noqa: E402
+
+INFINITO = float("inf")
+
+
+def crear_almacen(tipo: str, directorio: str):
+    if tipo == "memoria":
+        return AlmacenMemoria(GestorBloqueos(), INFINITO, INFINITO)
+    return AlmacenSQLite(os.path.join(directorio, f"bench-{time.perf_counter_ns()}.db"), INFINITO, INFINITO)
+
+
+async def ejecutar(almacen, modo: str, clientes: int, ops: int, max_lote: int, espera: float) -> Tuple[float, float]:
+    """Retorna (transferencias/seg, p99 en ms)"""
+    almacen.sembrar(Cuenta(f"{i:08d}", saldo=10**12) for i in range(clientes * 2))
+    historial = HistorialTransferencias()
+    hilos = ThreadPoolExecutor(max_workers=40)
+    libro = LibroMayor(almacen, historial, max_lote, espera) if modo == "libro" else None
+    loop = asyncio.get_running_loop()
+    latencias: List[float] = []
+    por_cliente = ops // clientes
+
+    async def individual(origen, destino):
+        resultado = almacen.intentar_transferir(origen, destino, 100)
+        if resultado is None:
+            resultado = await loop.run_in_executor(hilos, almacen.transferir, origen, destino, 100)
+        historial.registrar(origen.numero, destino.numero, 100)
+        return resultado
+
+    async def cliente(n: int):
+        origen, destino = almacen.obtener(f"{2 * n:08d}"), almacen.obtener(f"{2 * n + 1:08d}")
+        for _ in range(por_cliente):
+            inicio = time.perf_counter()
+            if libro is not None:
+                await libro.transferir(origen, destino, 100)
+            else:
+                await individual(origen, destino)
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(n) for n in range(clientes)))
+    duracion = time.perf_counter() - inicio
+    if libro is not None:
+        await libro.cerrar()
+    hilos.shutdown()
+    latencias.sort()
+    return len(latencias) / duracion, latencias[int(len(latencias) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--almacen", nargs="+", choices=("memoria", "sqlite"), default=["memoria", "sqlite"])
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 16, 128, 512])
+    parser.add_argument("--ops", type=int, default=20_000, help="Transferencias por ejecución")
+    parser.add_argument("--max-lote", type=int, default=256)
+    parser.add_argument("--espera-us", type=float, default=500, help="Espera del escritor por más transferencias")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for tipo in args.almacen:
+            print(f"\n{tipo}")
+            print(f"{'clientes':>8} | {'individual tx/s':>15} | {'p99 ms':>8} | {'libro tx/s':>12} | {'p99 ms':>8}")
+            print("-" * 64)
+            for clientes in args.clientes:
+                fila = []
+                for modo in ("individual", "libro"):
+                    almacen = crear_almacen(tipo, directorio)
+                    fila.extend(asyncio.run(ejecutar(almacen, modo, clientes, args.ops, args.max_lote,
+                                                     args.espera_us / 1_000_000)))
+                    almacen.cerrar()
+                print(f"{clientes:>8} | {fila[0]:>15,.0f} | {fila[1]:>8.2f} | {fila[2]:>12,.0f} | {fila[3]:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
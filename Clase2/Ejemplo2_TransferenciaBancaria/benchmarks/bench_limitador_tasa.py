@@ -0,0 +1,77 @@
+"""
+Microbenchmark del rate limiter: costo por llamada con 100k cuentas distintas
+Compara la implementación original (reconstrucción de listas) contra LimitadorTasa
+
+Uso:
+    python benchmarks/bench_limitador_tasa.py --cuentas 100000 --llamadas 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limitador_tasa import LimitadorTasa  # noqa: E402
+
+
+def limitador_original():
+    """Réplica de la versión anterior de validar_rate_limit"""
+    tracker = {}
+
+    def validar(cuenta, max_ops=10, ventana_segundos=60):
+        ahora = datetime.now()
+        if cuenta not in tracker:
+            tracker[cuenta] = []
+        tracker[cuenta] = [
+            ts for ts in tracker[cuenta]
+            if ahora - ts < timedelta(seconds=ventana_segundos)
+        ]
+        if len(tracker[cuenta]) >= max_ops:
+            return False
+        tracker[cuenta].append(ahora)
+        return True
+
+    return validar
+
+
+def medir(nombre, fabrica, cuentas, llamadas):
+    validar = fabrica()
+    inicio = time.perf_counter()
+    for cuenta in cuentas:
+        validar(cuenta)
+    duracion = time.perf_counter() - inicio
+
+    # Segunda pasada solo para memoria (tracemalloc distorsiona los tiempos)
+    tracemalloc.start()
+    validar = fabrica()
+    for cuenta in cuentas:
+        validar(cuenta)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{nombre:<22} | {duracion / llamadas * 1e9:>10,.0f} ns/llamada | pico memoria {pico / 2**20:>8.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cuentas", type=int, default=100_000)
+    parser.add_argument("--llamadas", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    pool = [f"{i:08d}" for i in range(args.cuentas)]
+    cuentas = [rnd.choice(pool) for _ in range(args.llamadas)]
+
+    print(f"{args.cuentas:,} cuentas distintas, {args.llamadas:,} llamadas")
+    medir("original (listas)", limitador_original, cuentas, args.llamadas)
+    medir("LimitadorTasa", lambda: LimitadorTasa().permitir, cuentas, args.llamadas)
+    medir("LimitadorTasa (tope)", lambda: LimitadorTasa(max_cuentas=args.cuentas // 10).permitir,
+          cuentas, args.llamadas)
+
+
+if __name__ == "__main__":
+    main()
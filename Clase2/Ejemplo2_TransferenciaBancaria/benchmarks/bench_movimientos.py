@@ -0,0 +1,81 @@
+"""
+Benchmark de consultas de movimientos por cuenta y rango de fechas
+Historial con N registros entre C cuentas (una transferencia por ms); cada
+consulta pide una ventana de V segundos de una cuenta:
+
+- recorrido: todos los registros retenidos, filtrando cuenta y fecha
+- índice por id: ids de la cuenta (origen y destino) filtrados por fecha,
+  como hacía consultar() antes de indexar las fechas
+- bisección: HistorialTransferencias.movimientos
+
+Uso:
+    python benchmarks/bench_movimientos.py --registros 1000000 2000000 --cuentas 1000
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from historial import HistorialTransferencias  # noqa: E402
+
+
+def recorrido(historial, cuenta, desde, hasta):
+    return [r for r in historial.consultar() if (r.origen == cuenta or r.destino == cuenta)
+            and desde <= r.ts <= hasta]
+
+
+def indice_por_id(historial, cuenta, desde, hasta):
+    lados = [historial._por_origen[cuenta].ids, historial._por_destino[cuenta].ids]
+    registros = map(historial.obtener, heapq.merge(*lados))
+    return [r for r in registros if desde <= r.ts <= hasta]
+
+
+def biseccion(historial, cuenta, desde, hasta):
+    return list(historial.movimientos(cuenta, desde, hasta))
+
+
+def medir(funcion, historial, consultas) -> float:
+    """Microsegundos por consulta"""
+    inicio = time.perf_counter()
+    for cuenta, desde, hasta in consultas:
+        funcion(historial, cuenta, desde, hasta)
+    return (time.perf_counter() - inicio) / len(consultas) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registros", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--cuentas", type=int, default=1000)
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--ventana-segundos", type=float, default=60)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'registros':>10} | {'resultados':>10} | {'recorrido µs':>13} | {'índice por id µs':>16} | "
+          f"{'bisección µs':>12}")
+    print("-" * 76)
+    for total in args.registros:
+        aleatorio = random.Random(args.semilla)
+        cuentas = [f"{i:08d}" for i in range(args.cuentas)]
+        historial = HistorialTransferencias(retencion=total)
+        for i in range(total):
+            origen, destino = aleatorio.sample(cuentas, 2)
+            historial._agregar(origen, destino, 100, i / 1000, "COMPLETED")
+        duracion = total / 1000
+        consultas = []
+        for _ in range(args.consultas):
+            desde = aleatorio.uniform(0, max(0.0, duracion - args.ventana_segundos))
+            consultas.append((aleatorio.choice(cuentas), desde, desde + args.ventana_segundos))
+        resultados = sum(len(biseccion(historial, *c)) for c in consultas) / len(consultas)
+        # El recorrido completo es lento: se mide con menos consultas
+        lento = medir(recorrido, historial, consultas[:max(1, 2_000_000 // total)])
+        print(f"{total:>10,} | {resultados:>10,.0f} | {lento:>13,.0f} | "
+              f"{medir(indice_por_id, historial, consultas):>16,.0f} | {medir(biseccion, historial, consultas):>12,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Microbenchmark de validación (pasos 4-9): costo por solicitud
+Compara la cadena de if original contra ConjuntoReglas con orden fijo y
+adaptativo, para distintas mezclas de solicitudes válidas y rechazadas.
+Las cuentas se buscan en un dict (como AlmacenMemoria) o, con --almacen
+sqlite, en AlmacenSQLite: ahí cada búsqueda que el orden evita es una
+consulta menos.
+
+Uso:
+    python benchmarks/bench_reglas.py --solicitudes 200000
+    python benchmarks/bench_reglas.py --almacen sqlite --solicitudes 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from almacenamiento import AlmacenSQLite  # noqa: E402
+from main import configuracion_reglas, reglas_transferencia, servicio_otp  # noqa: E402
+from motor_transferencias import Cuenta  # noqa: E402
+from reglas import ConjuntoReglas  # noqa: E402
+
+CUENTAS = {f"{i:08d}": Cuenta(f"{i:08d}", saldo=10**12) for i in range(10_000)}
+CUENTAS["99999999"] = Cuenta("99999999", saldo=0, estado="BLOQUEADA")
+NIVEL = configuracion_reglas.actual().nivel("00000000")
+# Búsqueda de cuentas de ambas variantes (dict o AlmacenSQLite.obtener)
+obtener = CUENTAS.get
+
+# (nombre, fracción de cada tipo de solicitud)
+MEZCLAS = [
+    ("todas válidas", {"valida": 1.0}),
+    ("30% destino inexistente", {"valida": 0.7, "destino_inexistente": 0.3}),
+    ("30% sin OTP", {"valida": 0.7, "otp": 0.3}),
+    ("50% misma cuenta", {"valida": 0.5, "misma_cuenta": 0.5}),
+]
+
+
+def generar(mezcla: dict, cantidad: int, semilla: int):
+    aleatorio = random.Random(semilla)
+    tipos, pesos = zip(*mezcla.items())
+    solicitudes = []
+    for tipo in aleatorio.choices(tipos, pesos, k=cantidad):
+        origen, destino = aleatorio.sample(range(10_000), 2)
+        origen, destino, monto, otp = f"{origen:08d}", f"{destino:08d}", 100_00, None
+        if tipo == "destino_inexistente":
+            destino = "XXXXXXXX"
+        elif tipo == "otp":
+            monto = 2_000_000_00
+        elif tipo == "misma_cuenta":
+            destino = origen
+        solicitudes.append((origen, destino, monto, otp))
+    return solicitudes
+
+
+class Rechazo(Exception):
+    pass
+
+
+def cadena_original(origen, destino, monto, otp):
+    """Réplica de la versión anterior de validar_transferencia (sin métricas)"""
+    if origen == destino:
+        raise Rechazo("misma_cuenta")
+    cuenta_origen = obtener(origen)
+    if cuenta_origen is None:
+        raise Rechazo("origen_inexistente")
+    if cuenta_origen.estado == "BLOQUEADA":
+        raise Rechazo("cuenta_bloqueada")
+    cuenta_destino = obtener(destino)
+    if cuenta_destino is None:
+        raise Rechazo("destino_inexistente")
+    if monto <= 0:
+        raise Rechazo("monto_invalido")
+    if monto > NIVEL.monto_requiere_otp:
+        if not otp or not servicio_otp.verificar(origen, destino, monto, otp):
+            raise Rechazo("otp")
+    return cuenta_origen, cuenta_destino
+
+
+def con_reglas(conjunto: ConjuntoReglas):
+    """Como validar_transferencia (sin métricas)"""
+    def validar(origen, destino, monto, otp):
+        nivel = configuracion_reglas.actual().nivel(origen)
+        regla, cuenta_origen, cuenta_destino = conjunto.validar(origen, destino, monto, otp, nivel, obtener)
+        if regla is not None:
+            raise Rechazo(regla.motivo)
+        return cuenta_origen, cuenta_destino
+    return validar
+
+
+def medir(validar, solicitudes) -> float:
+    """Nanosegundos por solicitud"""
+    inicio = time.perf_counter()
+    for solicitud in solicitudes:
+        try:
+            validar(*solicitud)
+        except Rechazo:
+            pass
+    return (time.perf_counter() - inicio) / len(solicitudes) * 1e9
+
+
+def main():
+    global obtener
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--solicitudes", type=int, default=200_000)
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--almacen", choices=("memoria", "sqlite"), default="memoria")
+    args = parser.parse_args()
+
+    directorio = tempfile.TemporaryDirectory()
+    if args.almacen == "sqlite":
+        almacen = AlmacenSQLite(os.path.join(directorio.name, "bench.db"), 0, 0)
+        almacen.sembrar(CUENTAS.values())
+        obtener = almacen.obtener
+
+    print(f"{'mezcla':<26} | {'cadena if ns':>12} | {'reglas fijas ns':>15} | {'adaptativas ns':>14} | orden final")
+    print("-" * 110)
+    for nombre, mezcla in MEZCLAS:
+        solicitudes = generar(mezcla, args.solicitudes, args.semilla)
+        fijas = ConjuntoReglas(reglas_transferencia.reglas, reglas_transferencia.constantes, reordenar_cada=0)
+        adaptativas = ConjuntoReglas(reglas_transferencia.reglas, reglas_transferencia.constantes, 10_000)
+        # Calentamiento: el conjunto adaptativo aprende la mezcla
+        medir(con_reglas(adaptativas), solicitudes[:20_000])
+        tiempos = [medir(validar, solicitudes)
+                   for validar in (cadena_original, con_reglas(fijas), con_reglas(adaptativas))]
+        print(f"{nombre:<26} | {tiempos[0]:>12,.0f} | {tiempos[1]:>15,.0f} | {tiempos[2]:>14,.0f} | "
+              f"{', '.join(adaptativas.orden)}")
+    if args.almacen == "sqlite":
+        almacen.cerrar()
+    directorio.cleanup()
+
+
+if __name__ == "__main__":
+    main()
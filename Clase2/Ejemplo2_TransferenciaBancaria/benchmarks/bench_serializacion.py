@@ -0,0 +1,138 @@
+"""
+Benchmark de serialización de respuestas: cuánto de cada solicitud es JSON
+Compara el camino anterior (modelo pydantic + validación por response_model
++ jsonable_encoder + JSONResponse) con RespuestaJSON (orjson y json estándar):
+
+- transferencia: POST /api/transferencias completo, en proceso vía ASGI
+  (sin red), contra el costo de serializar su respuesta
+- historial: armar una página de N registros (consultar + como_dict) contra
+  serializarla
+
+Uso:
+    python benchmarks/bench_serializacion.py --solicitudes 3000 --items 10000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_MAX_OPS", str(10**9))
+
+import httpx  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+import main  # noqa: E402
+import respuestas_json  # noqa: E402
+from dinero import a_centavos  # noqa: E402
+from historial import HistorialTransferencias  # noqa: E402
+from motor_transferencias import Cuenta  # noqa: E402
+from respuestas_json import RespuestaJSON  # noqa: E402
+
+CUENTAS = [f"{80_000_000 + i:08d}" for i in range(200)]
+
+
+def _ruta(path: str):
+    return next(ruta for ruta in main.app.routes if getattr(ruta, "path", None) == path)
+
+
+async def _anterior(campo, contenido) -> bytes:
+    """Camino de FastAPI para un endpoint que retorna un modelo (o dict) sin Response"""
+    datos = await serialize_response(field=campo, response_content=contenido, is_coroutine=True)
+    return JSONResponse(datos).body
+
+
+async def _micro(funcion, repeticiones: int) -> float:
+    """Microsegundos por llamada de una corrutina"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        await funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+async def medir_nuevas(contenido, repeticiones: int):
+    """Microsegundos de RespuestaJSON con json estándar y con orjson (nan si no está)"""
+    resultados = []
+    original = respuestas_json.dumps
+    try:
+        for dumps in (respuestas_json._dumps_estandar, respuestas_json.orjson and respuestas_json.orjson.dumps):
+            if not dumps:
+                resultados.append(float("nan"))
+                continue
+            respuestas_json.dumps = dumps
+
+            async def nueva():
+                return RespuestaJSON(contenido).body
+            resultados.append(await _micro(nueva, repeticiones))
+    finally:
+        respuestas_json.dumps = original
+    return resultados
+
+
+async def bench_transferencia(solicitudes: int):
+    main.almacen.sembrar(Cuenta(numero, saldo=a_centavos(10**9)) for numero in CUENTAS)
+    transporte = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+        async def solicitud(i: int):
+            cuerpo = {"origen": CUENTAS[i % 100], "destino": CUENTAS[100 + i % 100], "monto": 1}
+            respuesta = await cliente.post("/api/transferencias", json=cuerpo, headers={"Authorization": "Bearer b"})
+            assert respuesta.status_code == 200, respuesta.text
+            return respuesta.json()
+
+        for i in range(200):
+            await solicitud(i)
+        inicio = time.perf_counter()
+        for i in range(solicitudes):
+            contenido = await solicitud(i)
+        latencia = (time.perf_counter() - inicio) / solicitudes * 1e6
+
+    # Antes: el endpoint armaba el modelo y FastAPI lo validaba y serializaba
+    campo = _ruta("/api/transferencias").response_field
+    anterior = await _micro(lambda: _anterior(campo, main.TransferenciaResponse(**contenido)), solicitudes)
+    return (latencia, anterior, *await medir_nuevas(contenido, solicitudes))
+
+
+async def bench_historial(items: int, repeticiones: int):
+    historial = HistorialTransferencias(retencion=items)
+    historial.registrar_varias((CUENTAS[i % 100], CUENTAS[100 + i % 100], 1_00 + i) for i in range(items))
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        pagina = {"transferencias": [registro.como_dict() for registro in historial.consultar()],
+                  "total": historial.ultimo_id, "primer_id": historial.primer_id, "siguiente_cursor": None}
+    armado = (time.perf_counter() - inicio) / repeticiones * 1e6
+    # Antes: el endpoint retornaba el dict y FastAPI lo pasaba por jsonable_encoder
+    anterior = await _micro(lambda: _anterior(None, pagina), repeticiones)
+    return (armado, anterior, *await medir_nuevas(pagina, repeticiones))
+
+
+def _fila(nombre: str, base: float, anterior: float, estandar: float, rapido: float):
+    nuevo = rapido if rapido == rapido else estandar  # nan: sin orjson
+    print(f"{nombre:<22} | {base:>10,.1f} | {anterior:>12,.1f} | {estandar:>10,.1f} | {rapido:>10,.1f} | "
+          f"{anterior / (base - nuevo + anterior):>7.0%} -> {nuevo / base:>4.0%}")
+
+
+async def ejecutar(args):
+    print(f"orjson: {'sí' if respuestas_json.orjson else 'no (solo json estándar)'}")
+    print(f"{'escenario':<22} | {'total µs':>10} | {'FastAPI µs':>12} | {'json µs':>10} | {'orjson µs':>10} | "
+          f"% serialización")
+    print("-" * 100)
+    latencia, anterior, estandar, rapido = await bench_transferencia(args.solicitudes)
+    _fila("transferencia", latencia, anterior, estandar, rapido)
+    armado, anterior, estandar, rapido = await bench_historial(args.items, args.repeticiones)
+    # Total del endpoint de historial: armar la página + serializarla con el camino nuevo
+    nuevo = rapido if rapido == rapido else estandar
+    _fila(f"historial {args.items:,} items", armado + nuevo, anterior, estandar, rapido)
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--solicitudes", type=int, default=3000)
+    parser.add_argument("--items", type=int, default=10_000, help="Registros por página de historial")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Páginas de historial a serializar")
+    asyncio.run(ejecutar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,76 @@
+"""
+Benchmark de los agregados de velocidad: memoria por cuenta y costo por operación
+Cada cuenta recibe transferencias hacia D destinos distintos (D = max_destinos
+es el peor caso de memoria); luego se mide registrar y consultar sobre
+cuentas al azar con el reloj avanzando 1 ms por operación.
+
+Uso:
+    python benchmarks/bench_velocidad.py --cuentas 10000 100000 --destinos 1 8 32
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from velocidad import AgregadosVelocidad  # noqa: E402
+
+
+def memoria_por_cuenta(cuentas: int, destinos: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    antes = tracemalloc.get_traced_memory()[0]
+    agregados = AgregadosVelocidad(max_destinos=32)
+    for i in range(cuentas):
+        origen = f"{i:08d}"
+        for d in range(destinos):
+            agregados.registrar(origen, f"{90_000_000 + d:08d}", 100, ts=1000.0 + d)
+    despues = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (despues - antes) / cuentas
+
+
+def costo(cuentas: int, operaciones: int, semilla: int):
+    """(ns por registrar, ns por consultar con candidata)"""
+    aleatorio = random.Random(semilla)
+    agregados = AgregadosVelocidad()
+    origenes = [f"{aleatorio.randrange(cuentas):08d}" for _ in range(operaciones)]
+    destinos = [f"{aleatorio.randrange(cuentas):08d}" for _ in range(operaciones)]
+    inicio = time.perf_counter()
+    for i in range(operaciones):
+        agregados.registrar(origenes[i], destinos[i], 100, ts=1000.0 + i / 1000)
+    registrar = (time.perf_counter() - inicio) / operaciones * 1e9
+    inicio = time.perf_counter()
+    for i in range(operaciones):
+        agregados.consultar(origenes[i], destinos[i], 100, ahora=1000.0 + (operaciones + i) / 1000)
+    consultar = (time.perf_counter() - inicio) / operaciones * 1e9
+    return registrar, consultar
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cuentas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--destinos", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--operaciones", type=int, default=200_000)
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'cuentas':>8} | {'destinos':>8} | {'bytes/cuenta':>12}")
+    print("-" * 36)
+    for cuentas in args.cuentas:
+        for destinos in args.destinos:
+            print(f"{cuentas:>8,} | {destinos:>8} | {memoria_por_cuenta(cuentas, destinos):>12,.0f}")
+
+    print(f"\n{'cuentas':>8} | {'registrar ns':>12} | {'consultar ns':>12}")
+    print("-" * 38)
+    for cuentas in args.cuentas:
+        registrar, consultar = costo(cuentas, args.operaciones, args.semilla)
+        print(f"{cuentas:>8,} | {registrar:>12,.0f} | {consultar:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Gestor de bloqueos por cuenta para transferencias concurrentes
+Reemplaza el lock global: transferencias entre cuentas distintas avanzan en paralelo
+"""
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Optional
+
+
+class GestorBloqueos:
+    """
+    Locks particionados (lock striping) indexados por número de cuenta.
+
+    Cada cuenta se asigna de forma estable a uno de `particiones` locks, así la
+    memoria queda acotada aunque existan millones de cuentas. Para evitar
+    deadlocks, los locks de una operación se adquieren siempre en orden
+    ascendente de partición.
+
+    `observar_espera(segundos)`, si se indica, recibe el tiempo que tomó
+    adquirir los locks de cada operación (contención de la sección crítica).
+    """
+
+    def __init__(self, particiones: int = 256, observar_espera=None):
+        if particiones < 1:
+            raise ValueError("El número de particiones debe ser mayor a cero")
+        self.particiones = particiones
+        self.observar_espera = observar_espera
+        self._locks = [threading.Lock() for _ in range(particiones)]
+
+    def particion(self, cuenta: str) -> int:
+        """Partición estable (independiente de PYTHONHASHSEED) para una cuenta"""
+        return zlib.crc32(cuenta.encode()) % self.particiones
+
+    def _ordenar(self, cuentas) -> list:
+        return sorted({self.particion(c) for c in cuentas})
+
+    @contextmanager
+    def adquirir(self, *cuentas: str):
+        """Adquiere en orden determinístico los locks de todas las cuentas dadas"""
+        indices = self._ordenar(cuentas)
+        adquiridos = []
+        inicio = time.perf_counter() if self.observar_espera is not None else None
+        try:
+            for i in indices:
+                self._locks[i].acquire()
+                adquiridos.append(i)
+            if inicio is not None:
+                self.observar_espera(time.perf_counter() - inicio)
+            yield
+        finally:
+            for i in reversed(adquiridos):
+                self._locks[i].release()
+
+    @contextmanager
+    def adquirir_todas(self):
+        """Todas las particiones (en orden): excluye cualquier operación sobre cuentas"""
+        adquiridos = []
+        try:
+            for lock in self._locks:
+                lock.acquire()
+                adquiridos.append(lock)
+            yield
+        finally:
+            for lock in reversed(adquiridos):
+                lock.release()
+
+    @contextmanager
+    def intentar(self, *cuentas: str, desde: Optional[float] = None):
+        """
+        Como `adquirir`, pero sin esperar: entrega False (sin retener ningún
+        lock) si alguno está ocupado. Para el event loop, que no debe bloquearse.
+
+        `desde` es el `time.perf_counter()` del primer intento: al reintentar,
+        la espera que se observa al adquirir cubre todos los intentos.
+        """
+        indices = self._ordenar(cuentas)
+        adquiridos = []
+        if desde is None:
+            desde = time.perf_counter()
+        for i in indices:
+            if not self._locks[i].acquire(blocking=False):
+                break
+            adquiridos.append(i)
+        completo = len(adquiridos) == len(indices)
+        if not completo:
+            for i in reversed(adquiridos):
+                self._locks[i].release()
+            adquiridos = []
+        elif self.observar_espera is not None:
+            self.observar_espera(time.perf_counter() - desde)
+        try:
+            yield completo
+        finally:
+            for i in reversed(adquiridos):
+                self._locks[i].release()
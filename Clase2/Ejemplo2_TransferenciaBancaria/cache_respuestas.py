@@ -0,0 +1,47 @@
+"""
+Cache de respuestas ya serializadas, validadas por ETag
+Evita volver a serializar recursos que no cambiaron (p. ej. cuentas consultadas
+por dashboards que hacen polling)
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class CacheRespuestas:
+    """
+    Cuerpo JSON por clave junto con el ETag con que se generó. Una entrada solo
+    se usa si el ETag actual del recurso coincide; si no, se regenera y se
+    reemplaza. Acotada a `max_entradas` (LRU).
+    """
+
+    def __init__(self, max_entradas: int = 100_000):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def obtener(self, clave: str, etag: str) -> Optional[bytes]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] != etag:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave: str, etag: str, cuerpo: bytes):
+        with self._lock:
+            self._entradas[clave] = (etag, cuerpo)
+            self._entradas.move_to_end(clave)
+            if len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
@@ -0,0 +1,76 @@
+"""
+Pool de conexiones SQLite (una por thread) compartido por los componentes
+que persisten estado en el mismo archivo: cuentas, rate limiting, etc.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolConexionesSQLite:
+    """
+    Una conexión por thread hacia `ruta` (sqlite3 no comparte conexiones entre
+    threads). Todas las conexiones usan modo WAL y control explícito de
+    transacciones; cada una cachea sus sentencias compiladas.
+
+    Las transacciones de un mismo proceso se encolan en un lock propio antes
+    de BEGIN IMMEDIATE: el busy timeout de SQLite reintenta con pausas de
+    hasta 100 ms, y con muchos threads del threadpool compitiendo por el
+    archivo esas pausas dominarían la latencia. Entre procesos sigue
+    arbitrando SQLite.
+
+    `observar_espera(segundos)`, si se indica, recibe el tiempo que tomó
+    obtener el lock de escritura (BEGIN IMMEDIATE) de cada transacción.
+    """
+
+    def __init__(self, ruta: str, timeout: float = 30, observar_espera=None):
+        self.ruta = ruta
+        self.timeout = timeout
+        self.observar_espera = observar_espera
+        self._local = threading.local()
+        self._conexiones = []
+        self._lock = threading.Lock()
+        self._escritura = threading.Lock()
+
+    def conexion(self) -> sqlite3.Connection:
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            # isolation_level=None: las transacciones se controlan explícitamente
+            conexion = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None,
+                                       check_same_thread=False, cached_statements=64)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            self._local.conexion = conexion
+            with self._lock:
+                self._conexiones.append(conexion)
+        return conexion
+
+    @contextmanager
+    def transaccion(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT: el lock de escritura se toma al inicio, así
+        lo leído dentro de la transacción no cambia antes del COMMIT, aunque
+        escriban otros procesos. Ante cualquier excepción hace ROLLBACK.
+        """
+        conexion = self.conexion()
+        inicio = time.perf_counter() if self.observar_espera is not None else None
+        with self._escritura:
+            conexion.execute("BEGIN IMMEDIATE")
+            if inicio is not None:
+                self.observar_espera(time.perf_counter() - inicio)
+            try:
+                yield conexion
+            except BaseException:
+                if conexion.in_transaction:
+                    conexion.execute("ROLLBACK")
+                raise
+            if conexion.in_transaction:
+                conexion.execute("COMMIT")
+
+    def cerrar(self):
+        with self._lock:
+            for conexion in self._conexiones:
+                conexion.close()
+            self._conexiones.clear()
+        self._local = threading.local()
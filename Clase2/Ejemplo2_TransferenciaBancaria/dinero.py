@@ -0,0 +1,60 @@
+"""
+Representación exacta de montos: enteros en centavos
+Saldos, acumulados y montos se guardan y suman como int; la conversión a
+unidades (float/texto) ocurre solo al recibir y al responder
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Union
+
+CENTAVOS_POR_UNIDAD = 100
+
+Centavos = int
+
+# Mayor monto representable: entero de 64 bits con signo (SQLite, instantáneas)
+MAX_CENTAVOS = 2 ** 63 - 1
+
+# Hasta aquí centavos/100 es exacto en un double: vale el atajo sin Decimal
+_MAX_FLOAT_DIRECTO = 2 ** 53 // CENTAVOS_POR_UNIDAD
+
+
+def a_centavos(valor: Union[int, float, str, Decimal]) -> Centavos:
+    """
+    Convierte un monto en unidades a centavos exactos, sin redondeos silenciosos.
+
+    Los float se interpretan por su representación decimal más corta
+    (`repr`), que es la que escribió el cliente en el JSON: 0.1 -> 10.
+    Lanza ValueError si el monto tiene más de 2 decimales o no es finito.
+    """
+    tipo = type(valor)
+    if tipo is int:
+        return valor * CENTAVOS_POR_UNIDAD
+    if tipo is float and -_MAX_FLOAT_DIRECTO < valor < _MAX_FLOAT_DIRECTO:
+        # Si centavos/100 vuelve al mismo float, su decimal más corto tiene <= 2 decimales
+        centavos = round(valor * CENTAVOS_POR_UNIDAD)
+        if centavos / CENTAVOS_POR_UNIDAD == valor:
+            return centavos
+        raise ValueError("El monto solo puede tener máximo 2 decimales")
+    if isinstance(valor, bool):
+        raise ValueError("El monto debe ser numérico")
+    try:
+        decimal = Decimal(repr(valor) if isinstance(valor, float) else str(valor).strip())
+    except InvalidOperation:
+        raise ValueError("El monto debe ser numérico") from None
+    if not decimal.is_finite():
+        raise ValueError("El monto debe ser un número finito")
+    centavos = decimal * CENTAVOS_POR_UNIDAD
+    if centavos != centavos.to_integral_value():
+        raise ValueError("El monto solo puede tener máximo 2 decimales")
+    return int(centavos)
+
+
+def a_unidades(centavos: Centavos) -> float:
+    """Monto en unidades para respuestas JSON (el float más cercano al decimal exacto)"""
+    return centavos / CENTAVOS_POR_UNIDAD
+
+
+def formatear(centavos: Centavos) -> str:
+    """Texto con separador de miles y 2 decimales, sin redondeos float: 123456 -> '1,234.56'"""
+    signo = "-" if centavos < 0 else ""
+    unidades, resto = divmod(abs(centavos), CENTAVOS_POR_UNIDAD)
+    return f"{signo}{unidades:,}.{resto:02d}"
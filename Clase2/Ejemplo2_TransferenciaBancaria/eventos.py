@@ -0,0 +1,102 @@
+"""
+Pub/sub en proceso de movimientos por cuenta (alimenta el stream SSE)
+Cada suscriptor tiene una cola acotada; el que no consume a tiempo se descarta
+"""
+import asyncio
+import threading
+from typing import Any, Dict, Optional, Set
+
+
+class Suscripcion:
+    """Cola de eventos de una cuenta para un cliente conectado"""
+    __slots__ = ("cuenta", "cola", "loop", "descartada")
+
+    def __init__(self, cuenta: str, max_cola: int, loop: asyncio.AbstractEventLoop):
+        self.cuenta = cuenta
+        # Un lugar extra para el aviso de descarte
+        self.cola: asyncio.Queue = asyncio.Queue(max_cola + 1)
+        self.loop = loop
+        self.descartada = False
+
+    async def siguiente(self) -> Optional[Any]:
+        """Próximo evento; None si la suscripción fue descartada por lenta"""
+        return await self.cola.get()
+
+
+class LimiteSuscriptores(Exception):
+    """Se alcanzó el máximo de suscriptores simultáneos"""
+
+
+class BusEventos:
+    """
+    Fan-out de eventos por número de cuenta.
+
+    - `publicar` puede llamarse desde cualquier thread (los endpoints sync
+      corren en el threadpool): la entrega se agenda en el loop de cada
+      suscriptor con call_soon_threadsafe. Sin suscriptores para la cuenta,
+      publicar es una consulta a un dict.
+    - Cada suscriptor tiene una cola de `max_cola` eventos. Si se llena, se
+      vacía y se le envía None: el cliente se desconecta y puede reanudar
+      con Last-Event-ID, en lugar de retrasar o hacer crecer la memoria.
+    """
+
+    def __init__(self, max_cola: int = 100, max_suscriptores: int = 10_000):
+        self.max_cola = max_cola
+        self.max_suscriptores = max_suscriptores
+        self._suscriptores: Dict[str, Set[Suscripcion]] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self.descartadas = 0
+
+    def __len__(self) -> int:
+        return self._total
+
+    def suscribir(self, cuenta: str) -> Suscripcion:
+        """Crea una suscripción en el loop actual; lanza LimiteSuscriptores si no hay cupo"""
+        suscripcion = Suscripcion(cuenta, self.max_cola, asyncio.get_running_loop())
+        with self._lock:
+            if self._total >= self.max_suscriptores:
+                raise LimiteSuscriptores(cuenta)
+            # Copia al escribir: publicar itera sin lock sobre el conjunto vigente
+            self._suscriptores[cuenta] = self._suscriptores.get(cuenta, set()) | {suscripcion}
+            self._total += 1
+        return suscripcion
+
+    def cancelar(self, suscripcion: Suscripcion):
+        with self._lock:
+            actuales = self._suscriptores.get(suscripcion.cuenta)
+            if actuales is None or suscripcion not in actuales:
+                return
+            restantes = actuales - {suscripcion}
+            if restantes:
+                self._suscriptores[suscripcion.cuenta] = restantes
+            else:
+                del self._suscriptores[suscripcion.cuenta]
+            self._total -= 1
+
+    def publicar(self, cuenta: str, evento: Any):
+        """Entrega `evento` a los suscriptores de la cuenta (no se copia ni serializa aquí)"""
+        suscripciones = self._suscriptores.get(cuenta)
+        if not suscripciones:
+            return
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(self._entregar, suscripcion, evento)
+            except RuntimeError:
+                # Loop cerrado: el cliente ya no existe
+                self.cancelar(suscripcion)
+
+    def _entregar(self, suscripcion: Suscripcion, evento: Any):
+        # Corre en el loop del suscriptor
+        if suscripcion.descartada:
+            return
+        cola = suscripcion.cola
+        if cola.qsize() < self.max_cola:
+            cola.put_nowait(evento)
+            return
+        suscripcion.descartada = True
+        self.descartadas += 1
+        self.cancelar(suscripcion)
+        while not cola.empty():
+            cola.get_nowait()
+        cola.put_nowait(None)
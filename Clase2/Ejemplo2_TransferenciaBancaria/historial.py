@@ -0,0 +1,282 @@
+"""
+Diario (journal) de transferencias acotado en memoria
+Buffer circular con ids monotónicos, índices por cuenta y volcado a disco
+"""
+import heapq
+import json
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dinero import Centavos, a_unidades
+from reloj import formatear_fecha
+
+
+class RegistroTransferencia:
+    """Entrada compacta del diario; la fecha se guarda como epoch y se formatea al leer"""
+    __slots__ = ("id", "origen", "destino", "monto", "ts", "status")
+
+    def __init__(self, id: int, origen: str, destino: str, monto: Centavos, ts: float, status: str):
+        self.id = id
+        self.origen = origen
+        self.destino = destino
+        self.monto = monto
+        self.ts = ts
+        self.status = status
+
+    @property
+    def fecha(self) -> str:
+        return formatear_fecha(self.ts)
+
+    def como_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "origen": self.origen,
+            "destino": self.destino,
+            "monto": a_unidades(self.monto),
+            "fecha": self.fecha,
+            "status": self.status
+        }
+
+
+class _IndiceCuenta:
+    """
+    Ids de una cuenta en orden creciente y, en paralelo, sus fechas (epoch):
+    ambas columnas están ordenadas, así un rango de fechas se resuelve por
+    bisección. Las expulsiones avanzan `inicio`.
+    """
+    __slots__ = ("ids", "ts", "inicio")
+
+    def __init__(self):
+        self.ids = array("q")
+        self.ts = array("d")
+        self.inicio = 0
+
+    def agregar(self, transferencia_id: int, ts: float):
+        self.ids.append(transferencia_id)
+        self.ts.append(ts)
+
+    def expulsar_primero(self) -> bool:
+        """Descarta el id más antiguo; retorna True si el índice quedó vacío"""
+        self.inicio += 1
+        if self.inicio == len(self.ids):
+            return True
+        if self.inicio >= 64 and self.inicio * 2 >= len(self.ids):
+            del self.ids[:self.inicio]
+            del self.ts[:self.inicio]
+            self.inicio = 0
+        return False
+
+    def rango(self, cursor: int = 0, desde: Optional[float] = None, hasta: Optional[float] = None) -> array:
+        """Ids > cursor con fecha en [desde, hasta], en O(log n) más el tamaño del resultado"""
+        ids, ts = self.ids, self.ts
+        inicio = max(self.inicio, bisect_right(ids, cursor))
+        if desde is not None:
+            inicio = max(inicio, bisect_left(ts, desde, self.inicio))
+        fin = bisect_right(ts, hasta, self.inicio) if hasta is not None else len(ids)
+        return ids[inicio:fin]
+
+
+class HistorialTransferencias:
+    """
+    Diario append-only de transferencias con retención configurable.
+
+    - Los registros viven en un buffer circular de `retencion` posiciones; el
+      registro con id N ocupa la posición (N - 1) % retencion.
+    - Al sobrescribir una posición, el registro expulsado se agrega (NDJSON) al
+      `archivo` de volcado, si se configuró uno.
+    - Los ids los asigna un contador, por lo que siguen siendo monotónicos
+      aunque se expulsen registros.
+    - Los índices {cuenta: ids} por origen y destino se recortan con cada
+      expulsión, así la memoria total queda acotada por la retención.
+    - Las fechas no retroceden aunque se ajuste el reloj del sistema (se toma
+      la mayor entre la actual y la del registro anterior): el orden por id
+      es también orden por fecha, y los rangos de fechas se buscan por
+      bisección.
+    """
+
+    def __init__(self, retencion: int = 100_000, archivo: Optional[str] = None):
+        if retencion < 1:
+            raise ValueError("La retención debe ser mayor a cero")
+        self.retencion = retencion
+        self.archivo = archivo
+        self._buffer = [None] * retencion
+        self._ultimo_id = 0
+        self._ultimo_ts = 0.0
+        self._por_origen: Dict[str, _IndiceCuenta] = {}
+        self._por_destino: Dict[str, _IndiceCuenta] = {}
+        self._volcado = open(archivo, "a", encoding="utf-8") if archivo else None
+        self._lock = threading.Lock()
+
+    @property
+    def ultimo_id(self) -> int:
+        return self._ultimo_id
+
+    @property
+    def primer_id(self) -> int:
+        """Id más antiguo que sigue en memoria"""
+        return max(1, self._ultimo_id - self.retencion + 1)
+
+    def __len__(self) -> int:
+        """Cantidad de registros retenidos en memoria"""
+        return min(self._ultimo_id, self.retencion)
+
+    def registrar(self, origen: str, destino: str, monto: Centavos, status: str = "COMPLETED") -> RegistroTransferencia:
+        """Agrega una transferencia asignándole el siguiente id"""
+        with self._lock:
+            return self._agregar(origen, destino, monto, time.time(), status)
+
+    def registrar_varias(self, transferencias: Iterable[Tuple[str, str, Centavos]],
+                         status: str = "COMPLETED") -> List[RegistroTransferencia]:
+        """Agrega (origen, destino, monto) con ids consecutivos, tomando el lock una sola vez"""
+        with self._lock:
+            ts = time.time()
+            return [self._agregar(origen, destino, monto, ts, status) for origen, destino, monto in transferencias]
+
+    def _agregar(self, origen: str, destino: str, monto: Centavos, ts: float, status: str) -> RegistroTransferencia:
+        # Requiere self._lock
+        self._ultimo_id += 1
+        if ts < self._ultimo_ts:
+            ts = self._ultimo_ts
+        self._ultimo_ts = ts
+        registro = RegistroTransferencia(self._ultimo_id, origen, destino, monto, ts, status)
+        posicion = (registro.id - 1) % self.retencion
+        expulsado = self._buffer[posicion]
+        if expulsado is not None:
+            self._expulsar(expulsado)
+        self._buffer[posicion] = registro
+        self._indexar(self._por_origen, origen, registro)
+        self._indexar(self._por_destino, destino, registro)
+        return registro
+
+    @staticmethod
+    def _indexar(indices: Dict[str, _IndiceCuenta], cuenta: str, registro: RegistroTransferencia):
+        indice = indices.get(cuenta)
+        if indice is None:
+            indice = indices[cuenta] = _IndiceCuenta()
+        indice.agregar(registro.id, registro.ts)
+
+    def _expulsar(self, registro: RegistroTransferencia):
+        if self._volcado is not None:
+            self._volcado.write(json.dumps(registro.como_dict(), ensure_ascii=False) + "\n")
+        # Las expulsiones van en orden de id: siempre es el primero de cada índice
+        if self._por_origen[registro.origen].expulsar_primero():
+            del self._por_origen[registro.origen]
+        if self._por_destino[registro.destino].expulsar_primero():
+            del self._por_destino[registro.destino]
+
+    def obtener(self, transferencia_id: int) -> Optional[RegistroTransferencia]:
+        """Registro retenido con ese id, o None si no existe o ya fue expulsado"""
+        if transferencia_id < 1:
+            return None
+        registro = self._buffer[(transferencia_id - 1) % self.retencion]
+        return registro if registro is not None and registro.id == transferencia_id else None
+
+    def exportar(self) -> Tuple[int, List[RegistroTransferencia]]:
+        """(último id asignado, registros retenidos en orden de id)"""
+        with self._lock:
+            ids = range(self.primer_id, self._ultimo_id + 1)
+            return self._ultimo_id, [registro for registro in map(self.obtener, ids) if registro is not None]
+
+    def restaurar(self, ultimo_id: int, registros: Iterable[RegistroTransferencia]):
+        """
+        Reemplaza el contenido por `registros` (en orden de id, ninguno mayor
+        a `ultimo_id`). Si exceden la retención se conservan los más nuevos;
+        los descartados no se vuelcan al archivo.
+        """
+        registros = list(registros)
+        anterior, ts = 0, 0.0
+        for registro in registros:
+            if not anterior < registro.id <= ultimo_id:
+                raise ValueError("Los ids del historial deben ser crecientes y no mayores al último id")
+            if registro.ts < ts:
+                raise ValueError("Las fechas del historial no pueden retroceder")
+            anterior, ts = registro.id, registro.ts
+        registros = [registro for registro in registros if registro.id > ultimo_id - self.retencion]
+        with self._lock:
+            self._buffer = [None] * self.retencion
+            self._por_origen.clear()
+            self._por_destino.clear()
+            self._ultimo_id = ultimo_id
+            self._ultimo_ts = ts
+            for registro in registros:
+                self._buffer[(registro.id - 1) % self.retencion] = registro
+                self._indexar(self._por_origen, registro.origen, registro)
+                self._indexar(self._por_destino, registro.destino, registro)
+
+    def limpiar(self):
+        with self._lock:
+            self._buffer = [None] * self.retencion
+            self._ultimo_id = 0
+            self._ultimo_ts = 0.0
+            self._por_origen.clear()
+            self._por_destino.clear()
+
+    def cerrar(self):
+        """Cierra el archivo de volcado (los registros en memoria no se vuelcan)"""
+        with self._lock:
+            if self._volcado is not None:
+                self._volcado.close()
+                self._volcado = None
+
+    def consultar(self, cursor: Optional[int] = None, origen: Optional[str] = None,
+                  destino: Optional[str] = None, desde: Optional[float] = None,
+                  hasta: Optional[float] = None, status: Optional[str] = None) -> Iterator[RegistroTransferencia]:
+        """
+        Itera (de forma perezosa) los registros retenidos con id > cursor que
+        cumplen los filtros. `desde`/`hasta` son epoch (segundos).
+        """
+        cursor = cursor or 0
+
+        # Elegir el índice más selectivo disponible
+        if origen is not None or destino is not None:
+            indices = []
+            if origen is not None:
+                indices.append(self._por_origen.get(origen))
+            if destino is not None:
+                indices.append(self._por_destino.get(destino))
+            if any(indice is None for indice in indices):
+                return
+            # Bajo el lock: una expulsión puede estar compactando las columnas
+            with self._lock:
+                ids = min((indice.rango(cursor, desde, hasta) for indice in indices), key=len)
+        else:
+            ids = range(max(cursor + 1, self.primer_id), self._ultimo_id + 1)
+
+        for transferencia_id in ids:
+            registro = self.obtener(transferencia_id)
+            if registro is None:
+                continue  # expulsado mientras se iteraba
+            if hasta is not None and registro.ts > hasta:
+                return  # ordenado por fecha: no hay más coincidencias
+            if desde is not None and registro.ts < desde:
+                continue
+            if origen is not None and registro.origen != origen:
+                continue
+            if destino is not None and registro.destino != destino:
+                continue
+            if status is not None and registro.status != status:
+                continue
+            yield registro
+
+    def movimientos(self, cuenta: str, desde: Optional[float] = None, hasta: Optional[float] = None,
+                    cursor: Optional[int] = None) -> Iterator[RegistroTransferencia]:
+        """
+        Registros retenidos con id > cursor en que `cuenta` es origen o
+        destino, con fecha en [desde, hasta] (epoch), en orden de id. El rango
+        se ubica por bisección en los índices de la cuenta: el costo no
+        depende del tamaño del historial.
+        """
+        with self._lock:
+            lados = [indice.rango(cursor or 0, desde, hasta)
+                     for indice in (self._por_origen.get(cuenta), self._por_destino.get(cuenta)) if indice is not None]
+        anterior = 0
+        for transferencia_id in heapq.merge(*lados):
+            if transferencia_id == anterior:
+                continue  # origen y destino iguales: un solo movimiento
+            anterior = transferencia_id
+            registro = self.obtener(transferencia_id)
+            if registro is not None:
+                yield registro
@@ -0,0 +1,226 @@
+"""
+Cache de resultados por clave de idempotencia (header Idempotency-Key)
+Acotada por TTL y LRU; agrupa solicitudes duplicadas que llegan en paralelo.
+En memoria del proceso o, para varios workers, en una tabla SQLite compartida
+"""
+import asyncio
+import inspect
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+
+class ConflictoIdempotencia(Exception):
+    """La clave ya se usó con un cuerpo de solicitud distinto"""
+
+
+class _Entrada:
+    __slots__ = ("huella", "expira", "futuro")
+
+    def __init__(self, huella: str, expira: float, futuro: asyncio.Future):
+        self.huella = huella
+        self.expira = expira
+        self.futuro = futuro
+
+
+class CacheIdempotencia:
+    """
+    Guarda el primer resultado de cada clave y lo repite en los reintentos.
+
+    - Mientras la primera ejecución está en curso, los duplicados esperan su
+      mismo futuro en lugar de ejecutar de nuevo (coalescencia).
+    - Las entradas vencen a los `ttl_segundos`; los vencimientos se revisan
+      desde el inicio del OrderedDict (las más antiguas), O(1) amortizado.
+    - `max_entradas` es un tope duro: al superarlo se descarta la menos
+      usada recientemente.
+    - `cachear_error(exc)` decide si un error se repite en los reintentos o
+      si la clave se libera para que el cliente pueda reintentar de verdad.
+    - Los reintentos reciben `error_repetido(exc)` en lugar del error
+      original, para poder distinguir la repetición de un rechazo nuevo.
+    """
+
+    def __init__(self, max_entradas: int = 100_000, ttl_segundos: float = 24 * 3600,
+                 cachear_error: Callable[[BaseException], bool] = lambda exc: True,
+                 error_repetido: Callable[[Exception], BaseException] = lambda exc: exc,
+                 reloj=time.monotonic):
+        self.max_entradas = max_entradas
+        self.ttl = ttl_segundos
+        self.cachear_error = cachear_error
+        self.error_repetido = error_repetido
+        self._reloj = reloj
+        self._entradas: "OrderedDict[str, _Entrada]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    async def ejecutar(self, clave: str, huella: str, funcion: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Ejecuta `funcion` una sola vez por clave. Retorna (resultado, repetido);
+        si la primera ejecución lanzó una excepción cacheable, lanza
+        `error_repetido(exc)`.
+        """
+        ahora = self._reloj()
+        self._purgar_vencidas(ahora)
+
+        entrada = self._entradas.get(clave)
+        if entrada is not None and entrada.expira > ahora:
+            if entrada.huella != huella:
+                raise ConflictoIdempotencia(clave)
+            self._entradas.move_to_end(clave)
+            # shield: si este cliente se desconecta no se cancela la ejecución original
+            try:
+                return await asyncio.shield(entrada.futuro), True
+            except Exception as exc:
+                raise self.error_repetido(exc)
+
+        futuro = asyncio.get_running_loop().create_future()
+        entrada = _Entrada(huella, ahora + self.ttl, futuro)
+        self._entradas[clave] = entrada
+        self._entradas.move_to_end(clave)
+        if len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+        try:
+            resultado = funcion()
+            if inspect.isawaitable(resultado):
+                resultado = await resultado
+        except Exception as exc:
+            if not self.cachear_error(exc) and self._entradas.get(clave) is entrada:
+                del self._entradas[clave]
+            futuro.set_exception(exc)
+            futuro.exception()  # marcada como leída aunque nadie más la espere
+            raise
+        except BaseException:
+            # Cancelación: no hay resultado que repetir
+            if self._entradas.get(clave) is entrada:
+                del self._entradas[clave]
+            futuro.cancel()
+            raise
+        futuro.set_result(resultado)
+        return resultado, False
+
+    def _purgar_vencidas(self, ahora: float, maximo: int = 4):
+        entradas = self._entradas
+        for _ in range(maximo):
+            if not entradas:
+                return
+            clave, entrada = next(iter(entradas.items()))
+            if entrada.expira > ahora or not entrada.futuro.done():
+                return
+            del entradas[clave]
+
+    def limpiar(self):
+        self._entradas.clear()
+
+
+class CacheIdempotenciaSQLite:
+    """
+    Misma semántica que CacheIdempotencia con las claves en una tabla SQLite
+    del archivo compartido: un reintento que llega a otro worker recibe el
+    resultado original (o espera a que termine) en lugar de ejecutar de nuevo.
+
+    - La primera solicitud reclama la clave con una fila 'en_curso' que vale
+      `plazo_segundos`; los duplicados consultan la fila hasta que cambie.
+      Si el proceso que la reclamó muere, al vencer el plazo otro la toma.
+    - El resultado se guarda como JSON (`funcion` debe retornar datos
+      serializables) y vence a los `ttl_segundos` de completarse.
+    - Los errores que `cachear_error` acepta se guardan con
+      `error_a_datos(exc)` y los reintentos reciben `error_desde_datos(datos)`;
+      si `error_a_datos` retorna None, la clave se libera.
+    - Las consultas corren en el executor, fuera del event loop. Cada
+      `purga_cada` reclamos se eliminan las filas vencidas.
+    """
+
+    _SQL_ESQUEMA = (
+        "CREATE TABLE IF NOT EXISTS idempotencia (clave TEXT PRIMARY KEY, huella TEXT NOT NULL, "
+        "expira REAL NOT NULL, estado TEXT NOT NULL, resultado TEXT)",
+        "CREATE INDEX IF NOT EXISTS idempotencia_expira ON idempotencia (expira)",
+    )
+    _SQL_BUSCAR = "SELECT huella, expira, estado, resultado FROM idempotencia WHERE clave = ?"
+    _SQL_RECLAMAR = "INSERT OR REPLACE INTO idempotencia VALUES (?, ?, ?, 'en_curso', NULL)"
+    _SQL_GUARDAR = "UPDATE idempotencia SET estado = ?, resultado = ?, expira = ? WHERE clave = ?"
+    _SQL_LIBERAR = "DELETE FROM idempotencia WHERE clave = ? AND estado = 'en_curso'"
+    _SQL_PURGAR = "DELETE FROM idempotencia WHERE expira <= ?"
+
+    def __init__(self, pool, ttl_segundos: float = 24 * 3600,
+                 cachear_error: Callable[[BaseException], bool] = lambda exc: True,
+                 error_a_datos: Callable[[BaseException], Optional[dict]] = lambda exc: None,
+                 error_desde_datos: Callable[[dict], BaseException] = lambda datos: RuntimeError(datos),
+                 plazo_segundos: float = 30, purga_cada: int = 1000, reloj=time.time):
+        self.pool = pool
+        self.ttl = ttl_segundos
+        self.cachear_error = cachear_error
+        self.error_a_datos = error_a_datos
+        self.error_desde_datos = error_desde_datos
+        self.plazo = plazo_segundos
+        self.purga_cada = purga_cada
+        self._reloj = reloj
+        self._llamadas = 0
+        for sql in self._SQL_ESQUEMA:
+            pool.conexion().execute(sql)
+
+    def __len__(self) -> int:
+        """Claves vigentes (en curso o con resultado)"""
+        sql = "SELECT COUNT(*) FROM idempotencia WHERE expira > ?"
+        return self.pool.conexion().execute(sql, (self._reloj(),)).fetchone()[0]
+
+    async def ejecutar(self, clave: str, huella: str, funcion: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Como CacheIdempotencia.ejecutar, coordinando entre procesos"""
+        loop = asyncio.get_running_loop()
+        pausa = 0.005
+        while True:
+            estado, datos = await loop.run_in_executor(None, self._reclamar, clave, huella)
+            if estado == "reclamada":
+                break
+            if estado == "listo":
+                return json.loads(datos), True
+            if estado == "error":
+                raise self.error_desde_datos(json.loads(datos))
+            # En curso en este u otro worker: esperar su resultado
+            await asyncio.sleep(pausa)
+            pausa = min(pausa * 2, 0.1)
+
+        try:
+            resultado = funcion()
+            if inspect.isawaitable(resultado):
+                resultado = await resultado
+        except Exception as exc:
+            datos = self.error_a_datos(exc) if self.cachear_error(exc) else None
+            if datos is None:
+                await loop.run_in_executor(None, self._liberar, clave)
+            else:
+                await loop.run_in_executor(None, self._guardar, clave, "error", json.dumps(datos))
+            raise
+        except BaseException:
+            # Cancelación: no hay resultado que repetir; se libera sin esperar
+            loop.run_in_executor(None, self._liberar, clave)
+            raise
+        await loop.run_in_executor(None, self._guardar, clave, "listo", json.dumps(resultado))
+        return resultado, False
+
+    def _reclamar(self, clave: str, huella: str) -> Tuple[str, Optional[str]]:
+        """("reclamada", None) si esta solicitud debe ejecutar; si no, (estado, resultado) de la fila"""
+        ahora = self._reloj()
+        self._llamadas += 1
+        with self.pool.transaccion() as conexion:
+            if self._llamadas % self.purga_cada == 0:
+                conexion.execute(self._SQL_PURGAR, (ahora,))
+            fila = conexion.execute(self._SQL_BUSCAR, (clave,)).fetchone()
+            if fila is None or fila[1] <= ahora:
+                conexion.execute(self._SQL_RECLAMAR, (clave, huella, ahora + self.plazo))
+                return "reclamada", None
+            if fila[0] != huella:
+                raise ConflictoIdempotencia(clave)
+            return fila[2], fila[3]
+
+    def _guardar(self, clave: str, estado: str, resultado: str):
+        with self.pool.transaccion() as conexion:
+            conexion.execute(self._SQL_GUARDAR, (estado, resultado, self._reloj() + self.ttl, clave))
+
+    def _liberar(self, clave: str):
+        with self.pool.transaccion() as conexion:
+            conexion.execute(self._SQL_LIBERAR, (clave,))
+
+    def limpiar(self):
+        self.pool.conexion().execute("DELETE FROM idempotencia")
@@ -0,0 +1,198 @@
+"""
+Instantáneas binarias del estado de la API (cuentas, historial y rate limiting)
+Para preparar escenarios de prueba: se restauran en milisegundos en lugar de
+recrear el estado con miles de solicitudes
+"""
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from typing import Dict, List, NamedTuple
+
+from almacenamiento import AlmacenCuentas
+from historial import HistorialTransferencias, RegistroTransferencia
+from motor_transferencias import Cuenta
+
+MAGICO = b"TBIN"
+VERSION = 1
+# mágico, versión, creada (epoch), crc32 y largo del cuerpo comprimido
+_CABECERA = struct.Struct("<4sHdIQ")
+_ENTERO = struct.Struct("<Q")
+
+
+class Instantanea(NamedTuple):
+    """
+    Estado completo en un instante. `marcas` son las del rate limiting por
+    cuenta, como antigüedad en segundos (ver LimitadorTasa.exportar).
+    """
+    cuentas: List[Cuenta]
+    ultimo_id: int
+    registros: List[RegistroTransferencia]
+    marcas: Dict[str, List[float]]
+    creada: float
+
+
+def capturar(almacen: AlmacenCuentas, historial: HistorialTransferencias, limitador) -> Instantanea:
+    """
+    Lee el estado de los tres componentes. Cada uno es consistente en sí
+    mismo; con transferencias en curso el historial puede diferir en las que
+    estaban en vuelo, por lo que conviene capturar sin carga.
+    """
+    cuentas = almacen.exportar()
+    ultimo_id, registros = historial.exportar()
+    return Instantanea(cuentas, ultimo_id, registros, limitador.exportar(), time.time())
+
+
+def restaurar(instantanea: Instantanea, almacen: AlmacenCuentas, historial: HistorialTransferencias, limitador):
+    """
+    Reemplaza el estado por el de la instantánea. Historial y rate limiting
+    se restauran dentro de la sección exclusiva del almacén: ninguna
+    transferencia ve una mezcla del estado anterior y el restaurado.
+    """
+    def restaurar_resto():
+        historial.restaurar(instantanea.ultimo_id, instantanea.registros)
+        limitador.restaurar(instantanea.marcas)
+
+    almacen.reemplazar(instantanea.cuentas, restaurar_resto)
+
+
+# ==================== FORMATO ====================
+# Cabecera y cuerpo comprimido con zlib. El cuerpo es columnar: una tabla de
+# textos (cada número de cuenta o estado una sola vez) y columnas de enteros
+# de 64 bits o flotantes, little-endian, que referencian la tabla por índice.
+
+def _columna(tipo: str, valores) -> bytes:
+    columna = array(tipo, valores)
+    if sys.byteorder == "big":
+        columna.byteswap()
+    return _ENTERO.pack(len(columna)) + columna.tobytes()
+
+
+class _Lector:
+    def __init__(self, datos: bytes):
+        self.datos = memoryview(datos)
+        self.posicion = 0
+
+    def bytes(self, largo: int) -> memoryview:
+        fin = self.posicion + largo
+        if fin > len(self.datos):
+            raise ValueError("Instantánea truncada")
+        parte = self.datos[self.posicion:fin]
+        self.posicion = fin
+        return parte
+
+    def entero(self) -> int:
+        return _ENTERO.unpack(self.bytes(_ENTERO.size))[0]
+
+    def columna(self, tipo: str) -> array:
+        columna = array(tipo)
+        largo = self.entero()
+        columna.frombytes(self.bytes(largo * columna.itemsize))
+        if sys.byteorder == "big":
+            columna.byteswap()
+        return columna
+
+
+def serializar(instantanea: Instantanea) -> bytes:
+    textos: Dict[str, int] = {}
+
+    def indices(valores) -> List[int]:
+        return [textos.setdefault(valor, len(textos)) for valor in valores]
+
+    cuentas, registros, marcas = instantanea.cuentas, instantanea.registros, instantanea.marcas
+    columnas = [
+        _columna("Q", indices(c.numero for c in cuentas)),
+        _columna("Q", indices(c.estado for c in cuentas)),
+        _columna("q", [c.saldo for c in cuentas]),
+        _columna("q", [c.transferido_hoy for c in cuentas]),
+        _columna("q", [c.transferido_mes for c in cuentas]),
+        _columna("q", [c.periodo_dia for c in cuentas]),
+        _columna("q", [c.periodo_mes for c in cuentas]),
+        _columna("q", [c.version for c in cuentas]),
+        _ENTERO.pack(instantanea.ultimo_id),
+        _columna("q", [r.id for r in registros]),
+        _columna("Q", indices(r.origen for r in registros)),
+        _columna("Q", indices(r.destino for r in registros)),
+        _columna("q", [r.monto for r in registros]),
+        _columna("d", [r.ts for r in registros]),
+        _columna("Q", indices(r.status for r in registros)),
+        _columna("Q", indices(marcas)),
+        _columna("Q", [len(edades) for edades in marcas.values()]),
+        _columna("d", [edad for edades in marcas.values() for edad in edades]),
+    ]
+    codificados = [texto.encode() for texto in textos]
+    cuerpo = b"".join([_columna("Q", map(len, codificados)), *codificados, *columnas])
+    # Nivel 1: la mayor parte de la ganancia (columnas de ceros y valores
+    # repetidos) a una fracción del costo de los niveles altos
+    comprimido = zlib.compress(cuerpo, 1)
+    return _CABECERA.pack(MAGICO, VERSION, instantanea.creada, zlib.crc32(comprimido), len(comprimido)) + comprimido
+
+
+def deserializar(datos: bytes) -> Instantanea:
+    """Lanza ValueError si los datos no son una instantánea válida de esta versión"""
+    if len(datos) < _CABECERA.size:
+        raise ValueError("Instantánea truncada")
+    magico, version, creada, crc, largo = _CABECERA.unpack_from(datos)
+    if magico != MAGICO:
+        raise ValueError("El archivo no es una instantánea")
+    if version != VERSION:
+        raise ValueError(f"Versión de instantánea no soportada: {version}")
+    comprimido = datos[_CABECERA.size:]
+    if len(comprimido) != largo or zlib.crc32(comprimido) != crc:
+        raise ValueError("Instantánea corrupta (crc o largo no coinciden)")
+    try:
+        lector = _Lector(zlib.decompress(comprimido))
+    except zlib.error:
+        raise ValueError("Instantánea corrupta (no se pudo descomprimir)") from None
+
+    textos = [str(lector.bytes(n), "utf-8") for n in lector.columna("Q")]
+    columnas_cuentas = [lector.columna("Q"), lector.columna("Q")] + [lector.columna("q") for _ in range(6)]
+    ultimo_id = lector.entero()
+    columnas_registros = [lector.columna("q"), lector.columna("Q"), lector.columna("Q"),
+                          lector.columna("q"), lector.columna("d"), lector.columna("Q")]
+    cuentas_marcas, cantidades, edades = lector.columna("Q"), lector.columna("Q"), lector.columna("d")
+    if (len(set(map(len, columnas_cuentas))) != 1 or len(set(map(len, columnas_registros))) != 1
+            or len(cuentas_marcas) != len(cantidades) or sum(cantidades) != len(edades)):
+        raise ValueError("Instantánea corrupta (columnas de distinto largo)")
+    try:
+        cuentas = [Cuenta(textos[n], saldo, textos[e], h, m, d, ms, v)
+                   for n, e, saldo, h, m, d, ms, v in zip(*columnas_cuentas)]
+        registros = [RegistroTransferencia(i, textos[o], textos[d], monto, ts, textos[s])
+                     for i, o, d, monto, ts, s in zip(*columnas_registros)]
+        marcas = {}
+        inicio = 0
+        for cuenta, cantidad in zip(cuentas_marcas, cantidades):
+            marcas[textos[cuenta]] = edades[inicio:inicio + cantidad].tolist()
+            inicio += cantidad
+    except IndexError:
+        raise ValueError("Instantánea corrupta (referencia a un texto inexistente)") from None
+    return Instantanea(cuentas, ultimo_id, registros, marcas, creada)
+
+
+def guardar(instantanea: Instantanea, ruta: str) -> int:
+    """
+    Escribe la instantánea en `ruta` de forma atómica (archivo temporal en el
+    mismo directorio + os.replace): un lector nunca ve un archivo a medias.
+    Retorna el tamaño en bytes.
+    """
+    datos = serializar(instantanea)
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, prefix=".instantanea-")
+    try:
+        with os.fdopen(descriptor, "wb") as archivo:
+            archivo.write(datos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+    return len(datos)
+
+
+def cargar(ruta: str) -> Instantanea:
+    with open(ruta, "rb") as archivo:
+        return deserializar(archivo.read())
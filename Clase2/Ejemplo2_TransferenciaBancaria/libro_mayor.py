@@ -0,0 +1,133 @@
+"""
+Libro mayor con escritor único y commit agrupado (group commit)
+Las transferencias ya validadas (pasos 2-9) se encolan; un solo escritor las
+aplica por lotes con AlmacenCuentas.transferir_lote y las registra en el
+historial tomando su lock una vez por lote
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from almacenamiento import AlmacenCuentas
+from dinero import Centavos
+from historial import HistorialTransferencias, RegistroTransferencia
+from motor_transferencias import Cuenta, ResultadoTransferencia
+
+logger = logging.getLogger(__name__)
+
+
+class LibroMayor:
+    """
+    Cola de transferencias con un escritor único.
+
+    - El escritor toma la primera pendiente y, si no hay otras en cola pero
+      el lote anterior juntó varias, espera `espera_maxima` segundos a que
+      lleguen más; luego junta hasta `max_lote`. El lote se aplica en modo
+      no atómico: cada transferencia se aprueba o rechaza por sí sola, igual
+      que si llegara sola.
+    - Con SQLite, un lote es una única transacción: un commit para N
+      transferencias en lugar de N.
+    - El lote se aplica en un thread dedicado: el event loop no espera locks
+      ni I/O, y el almacén ve siempre un solo escritor de este proceso.
+    - Cada solicitud recibe su (ResultadoTransferencia, registro) por un
+      future; el registro es None si fue rechazada.
+    - Una vez aplicado el lote, las aprobadas se informan como aprobadas
+      aunque falle el historial (por ejemplo, el volcado a disco): el error
+      se registra en el log, la transferencia queda sin registro (None) y
+      `degradado` pasa a True. Solo un error del almacén falla el lote.
+    """
+
+    def __init__(self, almacen: AlmacenCuentas, historial: HistorialTransferencias,
+                 max_lote: int = 256, espera_maxima: float = 0.0005, observar_lote=None):
+        if max_lote < 1:
+            raise ValueError("El tamaño máximo de lote debe ser mayor a cero")
+        self.almacen = almacen
+        self.historial = historial
+        self.max_lote = max_lote
+        self.espera_maxima = espera_maxima
+        self.observar_lote = observar_lote
+        # La cola y la tarea se crean con el primer uso, dentro del loop que las atiende
+        self._cola: Optional[asyncio.Queue] = None
+        self._escritor: Optional[asyncio.Task] = None
+        self._hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="libro-mayor")
+        self._cerrado = False
+        # Transferencias aplicadas que el historial no pudo registrar
+        self.sin_registro = 0
+
+    async def transferir(self, origen: Cuenta, destino: Cuenta,
+                         monto: Centavos) -> Tuple[ResultadoTransferencia, Optional[RegistroTransferencia]]:
+        if self._cerrado:
+            raise RuntimeError("El libro mayor está cerrado")
+        if self._cola is None:
+            self._cola = asyncio.Queue()
+            self._escritor = asyncio.ensure_future(self._escribir())
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.put_nowait((origen, destino, monto, futuro))
+        # shield: si el cliente se desconecta, la transferencia ya encolada se aplica igual
+        return await asyncio.shield(futuro)
+
+    async def _escribir(self):
+        loop = asyncio.get_running_loop()
+        cola = self._cola
+        terminar = False
+        ultimo_lote = 0
+        while not terminar:
+            pendiente = await cola.get()
+            if pendiente is None:
+                return
+            if cola.empty() and ultimo_lote > 1 and self.espera_maxima > 0:
+                # Con carga concurrente (el lote anterior juntó varias), dar
+                # tiempo a que lleguen más para el mismo commit. Con un solo
+                # cliente la espera solo agregaría latencia.
+                await asyncio.sleep(self.espera_maxima)
+            pendientes = [pendiente]
+            while len(pendientes) < self.max_lote and not cola.empty():
+                pendiente = cola.get_nowait()
+                if pendiente is None:
+                    terminar = True
+                    break
+                pendientes.append(pendiente)
+
+            ultimo_lote = len(pendientes)
+            operaciones = [pendiente[:3] for pendiente in pendientes]
+            try:
+                resultados = await loop.run_in_executor(self._hilo, self._aplicar, operaciones)
+            except Exception as e:
+                for *_, futuro in pendientes:
+                    if not futuro.done():
+                        futuro.set_exception(e)
+                continue
+            for (*_, futuro), resultado in zip(pendientes, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+
+    @property
+    def degradado(self) -> bool:
+        """True si alguna transferencia aplicada quedó fuera del historial"""
+        return self.sin_registro > 0
+
+    def _aplicar(self, operaciones) -> List[Tuple[ResultadoTransferencia, Optional[RegistroTransferencia]]]:
+        # Corre en el thread del escritor
+        resultados = self.almacen.transferir_lote(operaciones)
+        if self.observar_lote is not None:
+            self.observar_lote(len(operaciones))
+        # Desde acá el lote ya está aplicado: un error del historial no cambia los resultados
+        aprobadas = [(origen.numero, destino.numero, monto)
+                     for (origen, destino, monto), resultado in zip(operaciones, resultados) if resultado.aprobada]
+        try:
+            registros = iter(self.historial.registrar_varias(aprobadas))
+        except Exception:
+            self.sin_registro += len(aprobadas)
+            logger.exception("Historial no disponible: %d transferencias aplicadas sin registro", len(aprobadas))
+            return [(resultado, None) for resultado in resultados]
+        return [(resultado, next(registros) if resultado.aprobada else None) for resultado in resultados]
+
+    async def cerrar(self):
+        """Aplica las transferencias ya encoladas y detiene el escritor"""
+        self._cerrado = True
+        if self._escritor is not None:
+            self._cola.put_nowait(None)
+            await self._escritor
+            self._escritor = None
+        self._hilo.shutdown(wait=True)
@@ -0,0 +1,191 @@
+"""
+Rate limiter de ventana deslizante con costo O(1) amortizado por llamada
+Usa reloj monotónico y expulsa cuentas inactivas para acotar la memoria
+"""
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List
+
+
+class LimitadorTasa:
+    """
+    Ventana deslizante exacta: máximo `max_ops` operaciones por cuenta en
+    cualquier intervalo de `ventana_segundos`.
+
+    - Cada cuenta guarda a lo sumo `max_ops` instantes en orden; los vencidos
+      se descartan por bisección (costo acotado por `max_ops`, no por el
+      historial). Una lista corta ocupa ~4x menos que un deque por cuenta.
+    - Las cuentas se mantienen en orden de último uso; las que llevan más de
+      una ventana inactivas se expulsan de forma incremental en cada llamada.
+    - `max_cuentas` es un tope duro de memoria: al superarlo se expulsa la
+      cuenta usada hace más tiempo.
+    """
+
+    def __init__(self, max_ops: int = 10, ventana_segundos: float = 60,
+                 max_cuentas: int = 1_000_000, reloj=time.monotonic):
+        self.max_ops = max_ops
+        self.ventana = ventana_segundos
+        self.max_cuentas = max_cuentas
+        self._reloj = reloj
+        self._cuentas: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def permitir(self, cuenta: str) -> bool:
+        """Registra un intento; retorna False si la cuenta excede el límite"""
+        return self.permitir_varias(cuenta, 1) == 1
+
+    def permitir_varias(self, cuenta: str, cantidad: int) -> int:
+        """Registra hasta `cantidad` intentos de una vez; retorna cuántos caben en el límite"""
+        ahora = self._reloj()
+        limite = ahora - self.ventana
+        with self._lock:
+            self._expulsar_inactivas(limite)
+
+            marcas = self._cuentas.get(cuenta)
+            if marcas is None:
+                marcas = []
+                self._cuentas[cuenta] = marcas
+                if len(self._cuentas) > self.max_cuentas:
+                    self._cuentas.popitem(last=False)
+            else:
+                self._cuentas.move_to_end(cuenta)
+                if marcas and marcas[0] <= limite:
+                    del marcas[:bisect_right(marcas, limite)]
+
+            admitidos = max(0, min(cantidad, self.max_ops - len(marcas)))
+            marcas.extend([ahora] * admitidos)
+            return admitidos
+
+    def _expulsar_inactivas(self, limite: float, maximo: int = 2):
+        # Las cuentas menos recientes están al inicio; basta revisar unas pocas
+        # por llamada para que la expulsión sea O(1) amortizada
+        cuentas = self._cuentas
+        for _ in range(maximo):
+            if not cuentas:
+                return
+            cuenta, marcas = next(iter(cuentas.items()))
+            if marcas and marcas[-1] > limite:
+                return
+            del cuentas[cuenta]
+
+    def __len__(self) -> int:
+        return len(self._cuentas)
+
+    def exportar(self) -> Dict[str, List[float]]:
+        """
+        Marcas vigentes por cuenta (de la usada hace más tiempo a la más
+        reciente), como antigüedad en segundos: el reloj monotónico no es
+        comparable entre procesos.
+        """
+        ahora = self._reloj()
+        limite = ahora - self.ventana
+        with self._lock:
+            return {cuenta: [ahora - marca for marca in marcas if marca > limite]
+                    for cuenta, marcas in self._cuentas.items() if marcas and marcas[-1] > limite}
+
+    def restaurar(self, edades: Dict[str, List[float]]):
+        """Reemplaza el estado por el de `exportar` (antigüedades respecto de ahora)"""
+        ahora = self._reloj()
+        cuentas = OrderedDict()
+        for cuenta, antiguedades in edades.items():
+            marcas = sorted(ahora - edad for edad in antiguedades if edad < self.ventana)
+            if marcas:
+                cuentas[cuenta] = marcas[-self.max_ops:]
+        while len(cuentas) > self.max_cuentas:
+            cuentas.popitem(last=False)
+        with self._lock:
+            self._cuentas = cuentas
+
+    def limpiar(self):
+        with self._lock:
+            self._cuentas.clear()
+
+
+class LimitadorTasaSQLite:
+    """
+    Misma ventana deslizante que LimitadorTasa, pero con las marcas en una
+    tabla SQLite para que el límite se respete entre varios procesos (workers).
+
+    Usa reloj de pared (time.time), comparable entre procesos. Cada llamada
+    es una transacción BEGIN IMMEDIATE que descarta las marcas vencidas de la
+    cuenta, cuenta las vigentes e inserta la nueva. Cada `purga_cada`
+    llamadas se eliminan las marcas vencidas de todas las cuentas, lo que
+    acota el tamaño de la tabla.
+    """
+
+    _SQL_ESQUEMA = (
+        "CREATE TABLE IF NOT EXISTS rate_limit (cuenta TEXT NOT NULL, ts REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS rate_limit_cuenta_ts ON rate_limit (cuenta, ts)",
+        "CREATE INDEX IF NOT EXISTS rate_limit_ts ON rate_limit (ts)",
+    )
+    _SQL_DESCARTAR = "DELETE FROM rate_limit WHERE cuenta = ? AND ts <= ?"
+    _SQL_CONTAR = "SELECT COUNT(*) FROM rate_limit WHERE cuenta = ?"
+    _SQL_REGISTRAR = "INSERT INTO rate_limit (cuenta, ts) VALUES (?, ?)"
+    _SQL_PURGAR = "DELETE FROM rate_limit WHERE ts <= ?"
+    _SQL_EXPORTAR = "SELECT cuenta, ts FROM rate_limit WHERE ts > ? ORDER BY cuenta, ts"
+
+    def __init__(self, pool, max_ops: int = 10, ventana_segundos: float = 60,
+                 purga_cada: int = 1000, reloj=time.time):
+        self.pool = pool
+        self.max_ops = max_ops
+        self.ventana = ventana_segundos
+        self.purga_cada = purga_cada
+        self._reloj = reloj
+        self._llamadas = 0
+        for sql in self._SQL_ESQUEMA:
+            pool.conexion().execute(sql)
+
+    def permitir(self, cuenta: str) -> bool:
+        """Registra un intento; retorna False si la cuenta excede el límite"""
+        return self.permitir_varias(cuenta, 1) == 1
+
+    def permitir_varias(self, cuenta: str, cantidad: int) -> int:
+        """Como LimitadorTasa.permitir_varias, en una sola transacción"""
+        ahora = self._reloj()
+        limite = ahora - self.ventana
+        self._llamadas += 1
+        with self.pool.transaccion() as conexion:
+            if self._llamadas % self.purga_cada == 0:
+                conexion.execute(self._SQL_PURGAR, (limite,))
+            else:
+                conexion.execute(self._SQL_DESCARTAR, (cuenta, limite))
+            vigentes = conexion.execute(self._SQL_CONTAR, (cuenta,)).fetchone()[0]
+            admitidos = max(0, min(cantidad, self.max_ops - vigentes))
+            conexion.executemany(self._SQL_REGISTRAR, [(cuenta, ahora)] * admitidos)
+            return admitidos
+
+    def __len__(self) -> int:
+        """Cantidad de cuentas con marcas registradas"""
+        return self.pool.conexion().execute("SELECT COUNT(DISTINCT cuenta) FROM rate_limit").fetchone()[0]
+
+    def exportar(self) -> Dict[str, List[float]]:
+        """Marcas vigentes por cuenta, como antigüedad en segundos (ver LimitadorTasa.exportar)"""
+        ahora = self._reloj()
+        edades: Dict[str, List[float]] = {}
+        for cuenta, ts in self.pool.conexion().execute(self._SQL_EXPORTAR, (ahora - self.ventana,)):
+            edades.setdefault(cuenta, []).append(ahora - ts)
+        return edades
+
+    def restaurar(self, edades: Dict[str, List[float]]):
+        """
+        Reemplaza las marcas por las de `exportar`. Dentro de una transacción
+        ya abierta en este thread (AlmacenSQLite.reemplazar) se suma a ella.
+        """
+        ahora = self._reloj()
+        filas = [(cuenta, ahora - edad) for cuenta, antiguedades in edades.items()
+                 for edad in antiguedades if edad < self.ventana]
+        conexion = self.pool.conexion()
+        if conexion.in_transaction:
+            self._reemplazar(conexion, filas)
+        else:
+            with self.pool.transaccion() as conexion:
+                self._reemplazar(conexion, filas)
+
+    def _reemplazar(self, conexion, filas):
+        conexion.execute("DELETE FROM rate_limit")
+        conexion.executemany(self._SQL_REGISTRAR, filas)
+
+    def limpiar(self):
+        self.pool.conexion().execute("DELETE FROM rate_limit")
@@ -2,62 +2,392 @@
 API de Transferencias Bancarias - Ejercicio Práctico
 Sistema de banca online con validaciones de límites, OTP y mantenimiento
 """
+import argparse
+import asyncio
+import hashlib
+import heapq
+import json
+import os
+import secrets
+from collections import Counter
+from contextlib import asynccontextmanager
+from itertools import islice
 from datetime import datetime, time
-from typing import Optional
-from fastapi import FastAPI, HTTPException, Header, Request
-from pydantic import BaseModel, Field, field_validator
+from time import perf_counter
+from typing import List, Literal, Optional
+from fastapi import FastAPI, HTTPException, Header, Path, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, BeforeValidator, Field, PlainSerializer, WithJsonSchema, model_validator
+from typing_extensions import Annotated
 import uvicorn
-import threading
+
+from almacenamiento import AlmacenCuentas, AlmacenMemoria, AlmacenSQLite
+from autenticacion import TokenInvalido, VerificadorTokens
+from bloqueos import GestorBloqueos
+from cache_respuestas import CacheRespuestas
+from dinero import MAX_CENTAVOS, a_centavos, a_unidades, formatear
+from eventos import BusEventos, LimiteSuscriptores
+from historial import HistorialTransferencias, RegistroTransferencia
+from idempotencia import CacheIdempotencia, CacheIdempotenciaSQLite, ConflictoIdempotencia
+import instantanea
+from libro_mayor import LibroMayor
+from limitador_tasa import LimitadorTasa, LimitadorTasaSQLite
+from metricas import MiddlewareMetricas, RegistroMetricas
+from motor_transferencias import Cuenta, Periodos, Rechazo, ResultadoTransferencia, periodos_actuales
+from otp import OTPBloqueado, ReservaOTP, ServicioOTP
+from reglas import ConfiguracionReglas, ConjuntoReglas, FuenteConfiguracion, Nivel, Regla
+from reloj import RelojMantenimiento, VentanaMantenimiento, ahora_iso, formatear_fecha
+from respuestas_json import RespuestaJSON, dumps
+from velocidad import AgregadosVelocidad, EvaluadorUmbrales, cargar_evaluador
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Aplicar lo encolado en el libro mayor, y cerrar el archivo de volcado
+    # del historial y las conexiones al apagar
+    if libro_mayor is not None:
+        await libro_mayor.cerrar()
+    transferencias_historial.cerrar()
+    almacen.cerrar()
+
 
 app = FastAPI(
     title="API Transferencias Bancarias",
     description="API REST para transferencias con validaciones de límites, seguridad y horarios",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # ==================== CONFIGURACIÓN ====================
+# Límites del nivel por defecto y ventana de mantenimiento; REGLAS_ARCHIVO
+# puede cambiarlos y agregar niveles por cuenta sin reiniciar (ver reglas.py)
 LIMITE_DIARIO = 50000
 LIMITE_MENSUAL = 5000000
 MONTO_REQUIERE_OTP = 1000000
 MANTENIMIENTO_INICIO = time(1, 0)  # 1:00 AM
 MANTENIMIENTO_FIN = time(3, 0)     # 3:00 AM
+REGLAS_ARCHIVO = os.getenv("REGLAS_ARCHIVO")
+REGLAS_RECARGA_SEGUNDOS = float(os.getenv("REGLAS_RECARGA_SEGUNDOS", "1"))
+REGLAS_REORDENAR_CADA = int(os.getenv("REGLAS_REORDENAR_CADA", "10000"))
+RATE_LIMIT_MAX_OPS = int(os.getenv("RATE_LIMIT_MAX_OPS", "10"))
+RATE_LIMIT_VENTANA_SEGUNDOS = float(os.getenv("RATE_LIMIT_VENTANA_SEGUNDOS", "60"))
+RATE_LIMIT_MAX_CUENTAS = int(os.getenv("RATE_LIMIT_MAX_CUENTAS", "1000000"))
+HISTORIAL_RETENCION = int(os.getenv("HISTORIAL_RETENCION", "100000"))
+HISTORIAL_ARCHIVO = os.getenv("HISTORIAL_ARCHIVO")  # Volcado NDJSON de registros expulsados
+ALMACEN_CUENTAS = os.getenv("ALMACEN_CUENTAS", "memoria")  # memoria | sqlite
+SQLITE_RUTA = os.getenv("SQLITE_RUTA", "cuentas.db")
+LOTE_MAX_TRANSFERENCIAS = int(os.getenv("LOTE_MAX_TRANSFERENCIAS", "5000"))
+IDEMPOTENCIA_MAX_CLAVES = int(os.getenv("IDEMPOTENCIA_MAX_CLAVES", "100000"))
+IDEMPOTENCIA_TTL_SEGUNDOS = float(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", "86400"))
+CONSULTA_MAX_CUENTAS = int(os.getenv("CONSULTA_MAX_CUENTAS", "1000"))
+CACHE_CUENTAS_MAX = int(os.getenv("CACHE_CUENTAS_MAX", "100000"))
+EVENTOS_MAX_COLA = int(os.getenv("EVENTOS_MAX_COLA", "100"))
+EVENTOS_MAX_SUSCRIPTORES = int(os.getenv("EVENTOS_MAX_SUSCRIPTORES", "10000"))
+EVENTOS_KEEPALIVE_SEGUNDOS = float(os.getenv("EVENTOS_KEEPALIVE_SEGUNDOS", "15"))
+AUTH_SECRETO = os.getenv("AUTH_SECRETO")  # Sin secreto basta con que venga el header (modo legado)
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "100000"))
+AUTH_CACHE_TTL_SEGUNDOS = float(os.getenv("AUTH_CACHE_TTL_SEGUNDOS", "300"))
+AUTH_CACHE_NEGATIVO_SEGUNDOS = float(os.getenv("AUTH_CACHE_NEGATIVO_SEGUNDOS", "60"))
+OTP_TTL_SEGUNDOS = float(os.getenv("OTP_TTL_SEGUNDOS", "300"))
+OTP_MAX_INTENTOS = int(os.getenv("OTP_MAX_INTENTOS", "5"))
+OTP_BLOQUEO_SEGUNDOS = float(os.getenv("OTP_BLOQUEO_SEGUNDOS", "900"))
+OTP_MAX_DESAFIOS = int(os.getenv("OTP_MAX_DESAFIOS", "1000000"))
+OTP_ESTATICO = os.getenv("OTP_ESTATICO")  # Solo testing: código aceptado para cualquier transferencia
+OTP_CODIGO_EN_RESPUESTA = os.getenv("OTP_CODIGO_EN_RESPUESTA", "0") == "1"  # Solo testing
+# Velocidad por cuenta origen y puntaje de fraude (ver velocidad.py)
+VELOCIDAD_MAX_CUENTAS = int(os.getenv("VELOCIDAD_MAX_CUENTAS", "1000000"))
+VELOCIDAD_UMBRALES = os.getenv("VELOCIDAD_UMBRALES")  # JSON {campo: máximo}; montos en unidades
+VELOCIDAD_MARCAR = float(os.getenv("VELOCIDAD_MARCAR", "0.8"))
+VELOCIDAD_EVALUADOR = os.getenv("VELOCIDAD_EVALUADOR")  # modulo:nombre; reemplaza a los umbrales
+# Instantáneas y siembra masiva de cuentas (administración)
+ADMIN_HABILITADO = os.getenv("ADMIN_HABILITADO", "0") == "1"  # Sin él, /api/admin/* responde 404
+INSTANTANEAS_DIR = os.getenv("INSTANTANEAS_DIR", "instantaneas")
+SEMBRAR_MAX_CUENTAS = int(os.getenv("SEMBRAR_MAX_CUENTAS", "1000000"))
+# Libro mayor: transferencias aplicadas por lotes por un escritor único (commit agrupado)
+LIBRO_MAYOR = os.getenv("LIBRO_MAYOR", "0") == "1"
+LIBRO_MAYOR_MAX_LOTE = int(os.getenv("LIBRO_MAYOR_MAX_LOTE", "256"))
+LIBRO_MAYOR_ESPERA_US = float(os.getenv("LIBRO_MAYOR_ESPERA_US", "500"))
+# Reintentos del motor en el event loop con locks ocupados (segundos, backoff exponencial)
+MOTOR_ESPERA_INICIAL = 0.0005
+MOTOR_ESPERA_MAXIMA = 0.005
+WORKERS = int(os.getenv("WORKERS", "1"))  # >1 requiere ALMACEN_CUENTAS=sqlite
+
+# Los montos se configuran en unidades y se operan en centavos (ver dinero.py)
+LIMITE_DIARIO_CENTAVOS = a_centavos(LIMITE_DIARIO)
+LIMITE_MENSUAL_CENTAVOS = a_centavos(LIMITE_MENSUAL)
+MONTO_REQUIERE_OTP_CENTAVOS = a_centavos(MONTO_REQUIERE_OTP)
+SALDO_RESET_CENTAVOS = a_centavos(100000)
 
-# Mock de base de datos en memoria
-cuentas_db = {
-    "12345678": {"saldo": 100000, "estado": "ACTIVA", "transferido_hoy": 0, "transferido_mes": 0},
-    "87654321": {"saldo": 50000, "estado": "ACTIVA", "transferido_hoy": 0, "transferido_mes": 0},
-    "87654322": {"saldo": 30000, "estado": "ACTIVA", "transferido_hoy": 0, "transferido_mes": 0},
-    "99999999": {"saldo": 10000, "estado": "BLOQUEADA", "transferido_hoy": 0, "transferido_mes": 0},
+# ==================== MÉTRICAS ====================
+# Expuestas en /metrics (formato Prometheus); con varios workers, cada uno expone las suyas
+metricas = RegistroMetricas()
+SOLICITUDES_DURACION = metricas.histograma(
+    "http_solicitudes_duracion_segundos", "Duración de las solicitudes HTTP", ("ruta", "metodo", "codigo")
+)
+SOLICITUDES_EN_CURSO = metricas.gauge("http_solicitudes_en_curso", "Solicitudes HTTP en proceso").etiquetar()
+PASOS_DURACION = metricas.histograma(
+    "transferencias_paso_duracion_segundos", "Duración de cada paso de una transferencia", ("paso",)
+)
+PASOS = {
+    paso: PASOS_DURACION.etiquetar(paso)
+    for paso in ("autenticacion", "mantenimiento", "rate_limit", "reglas", "puntaje", "motor", "historial")
 }
+RECHAZOS = metricas.contador("transferencias_rechazos_total", "Transferencias rechazadas por motivo", ("motivo",))
+AUTENTICACION_CACHE = metricas.contador(
+    "autenticacion_cache_total", "Verificaciones de token por resultado de la cache", ("resultado", "token")
+)
+MARCADAS = metricas.contador(
+    "transferencias_marcadas_total", "Transferencias marcadas para revisión por el control de fraude", ("motivo",)
+)
+ESPERA_LOCK = metricas.histograma(
+    "transferencias_espera_lock_segundos",
+    "Espera para entrar a la sección crítica (locks por cuenta o BEGIN IMMEDIATE en SQLite)"
+).etiquetar()
+MOTOR_REINTENTOS = metricas.contador(
+    "transferencias_motor_reintentos_total",
+    "Reintentos del motor en el event loop por locks de cuenta ocupados"
+).etiquetar()
+LIBRO_MAYOR_LOTE = metricas.histograma(
+    "transferencias_libro_mayor_lote", "Transferencias por lote aplicado por el libro mayor",
+    limites=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+).etiquetar()
+EVENTOS_SUSCRIPTORES = metricas.gauge("eventos_suscriptores", "Streams de eventos abiertos").etiquetar()
+EVENTOS_DESCARTADOS = metricas.contador(
+    "eventos_suscriptores_descartados_total", "Streams cerrados por no consumir a tiempo"
+).etiquetar()
+
+app.add_middleware(MiddlewareMetricas, duracion=SOLICITUDES_DURACION, en_curso=SOLICITUDES_EN_CURSO)
+
+# Cuentas de prueba (se crean si no existen en el almacén)
+CUENTAS_INICIALES = [
+    Cuenta("12345678", saldo=a_centavos(100000)),
+    Cuenta("87654321", saldo=a_centavos(50000)),
+    Cuenta("87654322", saldo=a_centavos(30000)),
+    Cuenta("99999999", saldo=a_centavos(10000), estado="BLOQUEADA"),
+]
+
+transferencias_historial = HistorialTransferencias(HISTORIAL_RETENCION, HISTORIAL_ARCHIVO)
+
+# Límites por nivel de cuenta y ventana de mantenimiento, recargables en caliente
+configuracion_reglas = FuenteConfiguracion(
+    ConfiguracionReglas(
+        {"estandar": Nivel("estandar", LIMITE_DIARIO_CENTAVOS, LIMITE_MENSUAL_CENTAVOS, MONTO_REQUIERE_OTP_CENTAVOS)},
+        "estandar", {}, [VentanaMantenimiento(MANTENIMIENTO_INICIO, MANTENIMIENTO_FIN)]
+    ),
+    REGLAS_ARCHIVO, REGLAS_RECARGA_SEGUNDOS
+)
+
+# Estado de las ventanas de mantenimiento hasta su próxima transición
+reloj_mantenimiento = RelojMantenimiento()
+
+
+def limites_cuenta(numero: str):
+    """(límite diario, límite mensual) en centavos del nivel de la cuenta"""
+    nivel = configuracion_reglas.actual().nivel(numero)
+    return nivel.limite_diario, nivel.limite_mensual
 
-transferencias_historial = []
-rate_limit_tracker = {}  # {cuenta: [(timestamp, count)]}
 
-# Lock para transacciones atómicas (evitar race conditions)
-db_lock = threading.Lock()
+def crear_almacen() -> AlmacenCuentas:
+    """Almacén de cuentas según ALMACEN_CUENTAS (memoria o sqlite)"""
+    if ALMACEN_CUENTAS == "sqlite":
+        return AlmacenSQLite(SQLITE_RUTA, LIMITE_DIARIO_CENTAVOS, LIMITE_MENSUAL_CENTAVOS,
+                             observar_espera=ESPERA_LOCK.observar, limites=limites_cuenta)
+    if ALMACEN_CUENTAS != "memoria":
+        raise ValueError(f"ALMACEN_CUENTAS desconocido: {ALMACEN_CUENTAS}")
+    # Locks por cuenta: transferencias entre pares de cuentas distintos no se bloquean entre sí
+    return AlmacenMemoria(GestorBloqueos(observar_espera=ESPERA_LOCK.observar),
+                          LIMITE_DIARIO_CENTAVOS, LIMITE_MENSUAL_CENTAVOS, limites=limites_cuenta)
 
-# OTP válido para testing (en producción vendría por SMS/email)
-OTP_VALIDO = "123456"
+
+def crear_limitador_tasa():
+    """
+    Rate limiting por cuenta origen (ventana deslizante). Con el almacén SQLite
+    las marcas se guardan en el mismo archivo, para que el límite se respete
+    entre todos los workers; en memoria, se acota el número de cuentas.
+    """
+    if isinstance(almacen, AlmacenSQLite):
+        return LimitadorTasaSQLite(almacen.pool, RATE_LIMIT_MAX_OPS, RATE_LIMIT_VENTANA_SEGUNDOS)
+    return LimitadorTasa(RATE_LIMIT_MAX_OPS, RATE_LIMIT_VENTANA_SEGUNDOS, RATE_LIMIT_MAX_CUENTAS)
+
+
+# Saldo/límites y débito/crédito se validan y aplican en una sola operación atómica
+almacen = crear_almacen()
+almacen.sembrar(CUENTAS_INICIALES)
+limitador_tasa = crear_limitador_tasa()
+
+
+def crear_evaluador_fraude():
+    """
+    Evaluador del control de fraude: VELOCIDAD_EVALUADOR (externo),
+    VELOCIDAD_UMBRALES o ninguno (los agregados se calculan igual)
+    """
+    if VELOCIDAD_EVALUADOR:
+        return cargar_evaluador(VELOCIDAD_EVALUADOR)
+    if VELOCIDAD_UMBRALES:
+        umbrales = {campo: a_centavos(limite) if campo.startswith("monto") else limite
+                    for campo, limite in json.loads(VELOCIDAD_UMBRALES).items()}
+        return EvaluadorUmbrales(umbrales, VELOCIDAD_MARCAR)
+    return None
+
+
+# Actividad saliente por cuenta (1 min / 1 h / 24 h), por proceso
+velocidad_cuentas = AgregadosVelocidad(VELOCIDAD_MAX_CUENTAS)
+evaluador_fraude = crear_evaluador_fraude()
+
+# Tokens firmados (JWT HS256) verificados localmente, con cache por hash del token
+_AUTENTICACION_RESULTADOS = {
+    (resultado, token): AUTENTICACION_CACHE.etiquetar(resultado, token)
+    for resultado in ("acierto", "fallo") for token in ("valido", "invalido")
+}
+verificador_tokens = VerificadorTokens(
+    AUTH_SECRETO, AUTH_CACHE_MAX, AUTH_CACHE_TTL_SEGUNDOS, AUTH_CACHE_NEGATIVO_SEGUNDOS,
+    observar=lambda resultado, token: _AUTENTICACION_RESULTADOS[resultado, token].inc()
+) if AUTH_SECRETO else None
+
+
+def sujeto_autenticado(authorization: Optional[str]) -> Optional[str]:
+    """
+    Quién llama, o None si el header Authorization no es válido: con
+    AUTH_SECRETO, "Bearer <token>" con firma y vigencia correctas (el `sub`
+    del token, si lo tiene); sin él, cualquier valor no vacío. Si no hay
+    `sub`, el sujeto es el hash del header.
+    """
+    if not authorization:
+        return None
+    claims = {}
+    if verificador_tokens is not None:
+        esquema, _, token = authorization.partition(" ")
+        if esquema.lower() != "bearer" or not token.strip():
+            return None
+        try:
+            claims = verificador_tokens.verificar(token.strip())
+        except TokenInvalido:
+            return None
+    if "sub" in claims:
+        return f"sub:{claims['sub']}"
+    return "token:" + hashlib.sha256(authorization.encode()).hexdigest()
+
+
+def error_no_autorizado(authorization: Optional[str]) -> HTTPException:
+    detalle = "No autorizado - Token inválido o vencido" if authorization else "No autorizado - Token requerido"
+    return rechazar("no_autorizado", status_code=401, detail=detalle)
+
+
+def _requerir_autorizacion(authorization: Optional[str]):
+    if sujeto_autenticado(authorization) is None:
+        raise error_no_autorizado(authorization)
+
+
+def _requerir_admin(authorization: Optional[str]):
+    """Endpoints de administración: 404 si no se habilitaron con ADMIN_HABILITADO=1"""
+    if not ADMIN_HABILITADO:
+        raise HTTPException(status_code=404, detail="Not Found")
+    _requerir_autorizacion(authorization)
+
+
+def _error_definitivo(exc: BaseException) -> bool:
+    """Errores que se repiten en los reintentos; los transitorios (429, 503, 5xx) no"""
+    return isinstance(exc, HTTPException) and exc.status_code < 500 and exc.status_code != 429
+
+
+def _error_repetido(exc: Exception) -> Exception:
+    """Copia del error cacheado con Idempotent-Replayed, como las respuestas repetidas"""
+    if not isinstance(exc, HTTPException):
+        return exc
+    headers = {**(exc.headers or {}), "Idempotent-Replayed": "true"}
+    return HTTPException(status_code=exc.status_code, detail=exc.detail, headers=headers)
+
+
+def crear_cache_idempotencia():
+    """
+    Resultado de la primera ejecución por Idempotency-Key (reintentos sin
+    doble débito). Con el almacén SQLite las claves se guardan en el mismo
+    archivo, así un reintento que llega a otro worker no vuelve a debitar;
+    en memoria, se acota el número de claves.
+    """
+    if isinstance(almacen, AlmacenSQLite):
+        return CacheIdempotenciaSQLite(
+            almacen.pool, IDEMPOTENCIA_TTL_SEGUNDOS, _error_definitivo,
+            error_a_datos=lambda exc: {"status_code": exc.status_code, "detail": exc.detail},
+            error_desde_datos=lambda datos: _error_repetido(HTTPException(**datos))
+        )
+    return CacheIdempotencia(IDEMPOTENCIA_MAX_CLAVES, IDEMPOTENCIA_TTL_SEGUNDOS, _error_definitivo,
+                             error_repetido=_error_repetido)
+
+
+cache_idempotencia = crear_cache_idempotencia()
+
+# JSON ya serializado por cuenta, reutilizado mientras no cambie su ETag
+cache_cuentas = CacheRespuestas(CACHE_CUENTAS_MAX)
+
+libro_mayor = LibroMayor(
+    almacen, transferencias_historial, LIBRO_MAYOR_MAX_LOTE, LIBRO_MAYOR_ESPERA_US / 1_000_000,
+    observar_lote=LIBRO_MAYOR_LOTE.observar
+) if LIBRO_MAYOR else None
+
+# Movimientos por cuenta para los streams de /api/cuentas/{n}/eventos (por proceso)
+bus_eventos = BusEventos(EVENTOS_MAX_COLA, EVENTOS_MAX_SUSCRIPTORES)
+
+# Desafíos OTP por transferencia (en producción el código se envía por SMS/email)
+servicio_otp = ServicioOTP(
+    OTP_TTL_SEGUNDOS, max_intentos=OTP_MAX_INTENTOS, ventana_intentos=OTP_BLOQUEO_SEGUNDOS,
+    bloqueo_segundos=OTP_BLOQUEO_SEGUNDOS, max_desafios=OTP_MAX_DESAFIOS, max_cuentas=RATE_LIMIT_MAX_CUENTAS,
+    estatico=OTP_ESTATICO
+)
+
+# La regla solo verifica el código; el desafío se reserva en validar_transferencia
+# cuando pasaron todas las reglas, así el orden no cambia qué se aprueba
+REGLA_OTP = Regla(
+    "otp", 401,
+    lambda nivel, **_: f"OTP inválido o ausente. Requerido para montos > "
+                       f"${formatear_limite(nivel.monto_requiere_otp)}",
+    "monto > nivel.monto_requiere_otp and not verificar_otp(origen, destino, monto, otp)"
+)
+
+# Pasos 4-9. Cada regla es independiente de las demás, así ConjuntoReglas
+# puede reordenarlas sin cambiar qué se aprueba
+reglas_transferencia = ConjuntoReglas([
+    Regla("misma_cuenta", 400, "La cuenta origen no puede ser igual a la cuenta destino", "origen == destino"),
+    # Ya validado por Pydantic (gt=0); se mantiene para llamadas internas
+    Regla("monto_invalido", 400, "El monto debe ser mayor a cero", "monto <= 0"),
+    REGLA_OTP,
+    # Las siguientes consultan el almacén (una vez por cuenta y solicitud)
+    Regla("origen_inexistente", 404, "Cuenta origen no encontrada", "cuenta_origen is None", costo=10),
+    Regla("cuenta_bloqueada", 403, "Cuenta bloqueada. Contacte al banco",
+          "cuenta_origen is not None and cuenta_origen.estado == 'BLOQUEADA'", costo=10),
+    Regla("destino_inexistente", 404, "Cuenta destino no encontrada", "cuenta_destino is None", costo=10),
+], {"verificar_otp": servicio_otp.verificar}, REGLAS_REORDENAR_CADA)
 
 
 # ==================== MODELOS ====================
+# Monto recibido en unidades (máximo 2 decimales) y guardado como centavos
+# exactos, hasta MAX_CENTAVOS (entero de 64 bits); al serializar vuelve a unidades
+Monto = Annotated[
+    int,
+    BeforeValidator(a_centavos),
+    Field(le=MAX_CENTAVOS),
+    PlainSerializer(a_unidades, return_type=float),
+    WithJsonSchema({"type": "number", "description": "Monto en unidades, máximo 2 decimales"})
+]
+
+
 class TransferenciaRequest(BaseModel):
     origen: str = Field(..., description="Número de cuenta origen", min_length=8, max_length=8)
     destino: str = Field(..., description="Número de cuenta destino", min_length=8, max_length=8)
-    monto: float = Field(..., description="Monto a transferir", gt=0)
+    monto: Monto = Field(..., description="Monto a transferir", gt=0)
     otp: Optional[str] = Field(None, description="Código OTP para montos > $1,000,000")
 
-    @field_validator('monto')
-    @classmethod
-    def validar_decimales(cls, v):
-        # Permitir máximo 2 decimales
-        if round(v, 2) != v:
-            raise ValueError("El monto solo puede tener máximo 2 decimales")
-        return v
+
+class DesafioOTPRequest(BaseModel):
+    origen: str = Field(..., description="Número de cuenta origen", min_length=8, max_length=8)
+    destino: str = Field(..., description="Número de cuenta destino", min_length=8, max_length=8)
+    monto: Monto = Field(..., description="Monto de la transferencia a autorizar", gt=0)
 
 
 class TransferenciaResponse(BaseModel):
-    id: int
+    id: Optional[int] = None  # None: aplicada, pero el historial no la registró (libro mayor degradado)
     origen: str
     destino: str
     monto: float
@@ -67,36 +397,238 @@ class TransferenciaResponse(BaseModel):
     saldo_restante: Optional[float] = None
 
 
+class LoteRequest(BaseModel):
+    transferencias: List[TransferenciaRequest] = Field(
+        ..., min_length=1, max_length=LOTE_MAX_TRANSFERENCIAS, description="Transferencias a aplicar en orden"
+    )
+    modo: Literal["mejor_esfuerzo", "todo_o_nada"] = Field(
+        "mejor_esfuerzo", description="todo_o_nada: si una falla no se aplica ninguna"
+    )
+
+
+class ConsultaCuentasRequest(BaseModel):
+    numeros: List[str] = Field(..., min_length=1, max_length=CONSULTA_MAX_CUENTAS)
+
+
+class CuentaSemilla(BaseModel):
+    numero: str = Field(..., min_length=8, max_length=8)
+    saldo: Monto = Field(..., ge=0)
+    estado: Literal["ACTIVA", "BLOQUEADA"] = "ACTIVA"
+
+
+class RangoCuentas(BaseModel):
+    """Cuentas numeradas consecutivamente: f"{n:08d}" para n en [desde, desde + cantidad)"""
+    desde: int = Field(..., ge=0)
+    cantidad: int = Field(..., gt=0, le=SEMBRAR_MAX_CUENTAS)
+    saldo: Monto = Field(..., ge=0)
+
+    @model_validator(mode="after")
+    def _ocho_digitos(self):
+        if self.desde + self.cantidad > 10**8:
+            raise ValueError("El rango excede los números de cuenta de 8 dígitos")
+        return self
+
+
+class SembrarRequest(BaseModel):
+    cuentas: List[CuentaSemilla] = Field(default_factory=list, max_length=SEMBRAR_MAX_CUENTAS)
+    rango: Optional[RangoCuentas] = None
+
+
+class ResultadoLoteItem(BaseModel):
+    indice: int
+    status_code: int
+    id: Optional[int] = None
+    status: str
+    detalle: str
+    saldo_restante: Optional[float] = None
+
+
+class LoteResponse(BaseModel):
+    modo: str
+    total: int
+    exitosas: int
+    rechazadas: int
+    resultados: List[ResultadoLoteItem]
+
+
 # ==================== UTILIDADES ====================
 def es_horario_mantenimiento(force_maintenance: bool = False) -> bool:
     """Verifica si estamos en ventana de mantenimiento"""
     if force_maintenance:
         return True
     
-    ahora = datetime.now().time()
-    return MANTENIMIENTO_INICIO <= ahora < MANTENIMIENTO_FIN
+    return reloj_mantenimiento.en_mantenimiento(configuracion_reglas.actual().ventanas)
 
 
-def validar_rate_limit(cuenta: str, max_ops: int = 10, ventana_segundos: int = 60) -> bool:
-    """Validación simple de rate limiting"""
-    from datetime import datetime, timedelta
-    
-    ahora = datetime.now()
-    if cuenta not in rate_limit_tracker:
-        rate_limit_tracker[cuenta] = []
-    
-    # Limpiar entradas antiguas
-    rate_limit_tracker[cuenta] = [
-        ts for ts in rate_limit_tracker[cuenta]
-        if ahora - ts < timedelta(seconds=ventana_segundos)
-    ]
+def _hora(valor: time) -> str:
+    return f"{valor.hour % 12 or 12}:{valor.minute:02d} {'AM' if valor.hour < 12 else 'PM'}"
+
+
+def error_mantenimiento() -> HTTPException:
+    """503 indicando cuándo reintentar según la ventana activa (o la primera, si es forzado)"""
+    ventanas = configuracion_reglas.actual().ventanas
+    ventana = reloj_mantenimiento.ventana_activa(ventanas) or (ventanas[0] if ventanas else None)
+    if ventana is None:
+        detalle = "Sistema en mantenimiento. Intente más tarde"
+    else:
+        zona = f" ({ventana.zona})" if ventana.zona else ""
+        detalle = f"Sistema en mantenimiento. Intente entre {_hora(ventana.fin)} y {_hora(ventana.inicio)}{zona}"
+    return rechazar("mantenimiento", status_code=503, detail=detalle)
+
+
+def validar_rate_limit(cuenta: str) -> bool:
+    """Validación de rate limiting por cuenta (ver LimitadorTasa)"""
+    return limitador_tasa.permitir(cuenta)
+
+
+def rechazar(motivo: str, status_code: int, detail: str) -> HTTPException:
+    """HTTPException de un rechazo, contada por motivo en /metrics"""
+    RECHAZOS.etiquetar(motivo).inc()
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def formatear_limite(centavos: int) -> str:
+    """Límite para mensajes: sin decimales si es entero ($50,000)"""
+    texto = formatear(centavos)
+    return texto[:-3] if texto.endswith(".00") else texto
+
+
+def error_rechazo(rechazo: Rechazo, valor: int, origen: str = "") -> HTTPException:
+    """
+    Traduce un código de rechazo del motor a la respuesta HTTP correspondiente.
+    Los límites informados son los del nivel de la cuenta `origen`.
+    """
+    if rechazo is Rechazo.SALDO_INSUFICIENTE:
+        return rechazar(
+            "saldo_insuficiente",
+            status_code=402,
+            detail=f"Saldo insuficiente. Disponible: ${formatear(valor)}"
+        )
+    if rechazo is Rechazo.LIMITE_DIARIO:
+        limite = formatear_limite(limites_cuenta(origen)[0])
+        return rechazar(
+            "limite_diario",
+            status_code=403,
+            detail=f"Excede límite diario de ${limite}. Usado hoy: ${formatear(valor)}"
+        )
+    if rechazo is Rechazo.ORIGEN_INEXISTENTE:
+        return rechazar("origen_inexistente", status_code=404, detail="Cuenta origen no encontrada")
+    if rechazo is Rechazo.DESTINO_INEXISTENTE:
+        return rechazar("destino_inexistente", status_code=404, detail="Cuenta destino no encontrada")
+    if rechazo is Rechazo.LOTE_ABORTADO:
+        return rechazar(
+            "lote_abortado",
+            status_code=409,
+            detail="No aplicada: otra transferencia del lote fue rechazada"
+        )
+    limite = formatear_limite(limites_cuenta(origen)[1])
+    return rechazar(
+        "limite_mensual",
+        status_code=403,
+        detail=f"Excede límite mensual de ${limite}. Usado este mes: ${formatear(valor)}"
+    )
+
+
+def validar_transferencia(transferencia: TransferenciaRequest, x_otp: Optional[str] = None):
+    """
+    Pasos 4 a 9 (reglas_transferencia): cuentas, estado, monto y OTP, sin
+    tocar saldos. Retorna (cuenta_origen, cuenta_destino, reserva_otp) o lanza
+    HTTPException; si el motor rechaza la transferencia, la reserva se devuelve
+    (ver registrar_resultado).
+    """
+    nivel = configuracion_reglas.actual().nivel(transferencia.origen)
+    otp = x_otp or transferencia.otp
+    with PASOS["reglas"].medir():
+        regla, cuenta_origen, cuenta_destino = reglas_transferencia.validar(
+            transferencia.origen, transferencia.destino, transferencia.monto, otp, nivel, almacen.obtener
+        )
+    if regla is not None:
+        detalle = regla.detalle_para(origen=transferencia.origen, destino=transferencia.destino,
+                                     monto=transferencia.monto, otp=otp, nivel=nivel)
+        raise rechazar(regla.motivo, status_code=regla.status_code, detail=detalle)
     
-    # Verificar límite
-    if len(rate_limit_tracker[cuenta]) >= max_ops:
-        return False
+    # 9b. CONTROL DE FRAUDE (velocidad de la cuenta, con esta transferencia incluida)
+    if evaluador_fraude is not None:
+        with PASOS["puntaje"].medir():
+            velocidad = velocidad_cuentas.consultar(transferencia.origen, transferencia.destino, transferencia.monto)
+            decision = evaluador_fraude(transferencia.origen, transferencia.destino, transferencia.monto, velocidad)
+        if decision.accion == "rechazar":
+            raise rechazar("fraude", status_code=403,
+                           detail="Transferencia rechazada por el control de fraude. Contacte al banco")
+        if decision.accion == "marcar":
+            MARCADAS.etiquetar(decision.motivo).inc()
+
+    # 9c. RESERVAR EL DESAFÍO OTP (un código autoriza una sola transferencia)
+    # Se retira ahora, así otra solicitud no puede usarlo en paralelo, y se
+    # repone si el motor rechaza la transferencia por saldo o límites
+    reserva = None
+    if transferencia.monto > nivel.monto_requiere_otp:
+        reserva = servicio_otp.reservar(transferencia.origen, transferencia.destino, transferencia.monto, otp)
+        if reserva is None:
+            raise rechazar(REGLA_OTP.motivo, status_code=REGLA_OTP.status_code,
+                           detail=REGLA_OTP.detalle_para(nivel=nivel))
+    return cuenta_origen, cuenta_destino, reserva
+
+
+def publicar_movimiento(registro: RegistroTransferencia):
+    """Notifica la transferencia ya registrada a los streams de ambas cuentas y a los agregados de velocidad"""
+    velocidad_cuentas.registrar(registro.origen, registro.destino, registro.monto, registro.ts)
+    bus_eventos.publicar(registro.origen, registro)
+    bus_eventos.publicar(registro.destino, registro)
+
+
+def procesar_transferencia(cuenta_origen: Cuenta, cuenta_destino: Cuenta, monto: int,
+                           reserva: Optional[ReservaOTP] = None):
+    """
+    Valida saldo y límites, debita, acredita y registra la transferencia.
+    Retorna (registro_historial, saldo_restante_origen), montos en centavos.
+    """
+    with PASOS["motor"].medir():
+        resultado = almacen.transferir(cuenta_origen, cuenta_destino, monto)
+    return registrar_resultado(resultado, cuenta_origen, cuenta_destino, monto, reserva)
+
+
+async def procesar_transferencia_async(cuenta_origen: Cuenta, cuenta_destino: Cuenta, monto: int,
+                                       reserva: Optional[ReservaOTP] = None):
+    """
+    procesar_transferencia sin bloquear el event loop: cada intento toma los
+    locks de ambas cuentas sin esperar y, si alguno está ocupado, se reintenta
+    tras un `asyncio.sleep` con backoff exponencial (de MOTOR_ESPERA_INICIAL a
+    MOTOR_ESPERA_MAXIMA) que deja avanzar al resto de las solicitudes.
+
+    En el loop los locks se toman y liberan sin un `await` de por medio: un
+    lock ocupado solo puede retenerlo un hilo del threadpool o un lote
+    (lotes, reset, instantáneas, el escritor del libro mayor), así la espera
+    termina cuando ese hilo lo suelta.
+    """
+    with PASOS["motor"].medir():
+        # ESPERA_LOCK mide desde el primer intento hasta el que adquiere los locks
+        desde = perf_counter()
+        resultado = almacen.intentar_transferir(cuenta_origen, cuenta_destino, monto, desde)
+        espera = MOTOR_ESPERA_INICIAL
+        while resultado is None:
+            MOTOR_REINTENTOS.inc()
+            await asyncio.sleep(espera)
+            espera = min(espera * 2, MOTOR_ESPERA_MAXIMA)
+            resultado = almacen.intentar_transferir(cuenta_origen, cuenta_destino, monto, desde)
+    return registrar_resultado(resultado, cuenta_origen, cuenta_destino, monto, reserva)
+
+
+def registrar_resultado(resultado: ResultadoTransferencia, cuenta_origen: Cuenta, cuenta_destino: Cuenta, monto: int,
+                        reserva: Optional[ReservaOTP] = None):
+    """
+    Rechazo -> HTTPException (devolviendo el desafío OTP reservado, que no se
+    gastó); aprobada -> (registro_historial, saldo_restante_origen)
+    """
+    if not resultado.aprobada:
+        servicio_otp.devolver(reserva)
+        raise error_rechazo(resultado.rechazo, resultado.valor, cuenta_origen.numero)
     
-    rate_limit_tracker[cuenta].append(ahora)
-    return True
+    # Guardar en historial (asigna el id de forma atómica)
+    with PASOS["historial"].medir():
+        registro = transferencias_historial.registrar(cuenta_origen.numero, cuenta_destino.numero, monto)
+    publicar_movimiento(registro)
+    return registro, resultado.valor
 
 
 # ==================== ENDPOINTS ====================
@@ -107,7 +639,10 @@ def root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    if libro_mayor is not None and libro_mayor.degradado:
+        # Las transferencias se siguen aplicando, pero hay aplicadas fuera del historial
+        return {"status": "degraded", "timestamp": ahora_iso(), "sin_registro": libro_mayor.sin_registro}
+    return {"status": "healthy", "timestamp": ahora_iso()}
 
 
 @app.post("/api/transferencias", response_model=TransferenciaResponse)
@@ -116,12 +651,14 @@ async def crear_transferencia(
     request: Request,
     authorization: Optional[str] = Header(None),
     x_otp: Optional[str] = Header(None),
-    x_force_maintenance: Optional[str] = Header(None)
+    x_force_maintenance: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
     """
     Crea una transferencia bancaria con validaciones completas
     
-    Validaciones implementadas:
+    Validaciones implementadas (límites del nivel de la cuenta origen;
+    por defecto los indicados):
     - Límite diario: $50,000
     - Límite mensual: $5,000,000
     - OTP obligatorio para montos > $1,000,000
@@ -131,162 +668,620 @@ async def crear_transferencia(
     - Cuenta origen activa (no bloqueada)
     - Origen != Destino
     - Rate limiting
+    
+    Con el header `Idempotency-Key`, los reintentos con la misma clave y el
+    mismo cuerpo reciben el resultado original sin volver a procesarse.
     """
     
     # 1. VALIDAR AUTENTICACIÓN
-    if not authorization:
-        raise HTTPException(status_code=401, detail="No autorizado - Token requerido")
+    with PASOS["autenticacion"].medir():
+        sujeto = sujeto_autenticado(authorization)
+    if sujeto is None:
+        raise error_no_autorizado(authorization)
     
-    # 2. VALIDAR HORARIO DE MANTENIMIENTO
     force_maint = x_force_maintenance == "1" if x_force_maintenance else False
-    if es_horario_mantenimiento(force_maint):
-        raise HTTPException(
-            status_code=503,
-            detail="Sistema en mantenimiento. Intente entre 3:00 AM y 1:00 AM"
+    if not idempotency_key:
+        return RespuestaJSON(await ejecutar_transferencia_async(transferencia, x_otp, force_maint))
+    
+    # La clave es por quien llama: la misma Idempotency-Key de otro cliente no colisiona
+    clave = hashlib.sha256(f"{sujeto}\n{idempotency_key}".encode()).hexdigest()
+    huella = hashlib.sha256(f"{transferencia.model_dump_json()}|{x_otp}".encode()).hexdigest()
+    try:
+        respuesta, repetida = await cache_idempotencia.ejecutar(
+            clave, huella, lambda: ejecutar_transferencia_async(transferencia, x_otp, force_maint)
+        )
+    except ConflictoIdempotencia:
+        raise rechazar(
+            "idempotencia_conflicto",
+            status_code=422,
+            detail="Idempotency-Key ya utilizada con una solicitud distinta"
         )
+    if repetida:
+        return RespuestaJSON(respuesta, headers={"Idempotent-Replayed": "true"})
+    return RespuestaJSON(respuesta)
+
+
+async def ejecutar_transferencia_async(transferencia: TransferenciaRequest, x_otp: Optional[str],
+                                       force_maint: bool) -> dict:
+    """
+    ejecutar_transferencia desde el event loop sin bloquearlo. Con un almacén
+    bloqueante (SQLite) todo el procesamiento va al threadpool; en memoria las
+    validaciones corren en el loop y solo el motor puede esperar locks. Con
+    el libro mayor, el motor y el historial los aplica su escritor por lotes.
+    """
+    if almacen.bloqueante and libro_mayor is None:
+        return await run_in_threadpool(ejecutar_transferencia, transferencia, x_otp, force_maint)
+    if almacen.bloqueante:
+        cuenta_origen, cuenta_destino, reserva = await run_in_threadpool(
+            validar_solicitud, transferencia, x_otp, force_maint
+        )
+    else:
+        cuenta_origen, cuenta_destino, reserva = validar_solicitud(transferencia, x_otp, force_maint)
+    
+    if libro_mayor is not None:
+        with PASOS["motor"].medir():
+            resultado, registro = await libro_mayor.transferir(cuenta_origen, cuenta_destino, transferencia.monto)
+        if not resultado.aprobada:
+            servicio_otp.devolver(reserva)
+            raise error_rechazo(resultado.rechazo, resultado.valor, cuenta_origen.numero)
+        if registro is None:
+            # Aplicada aunque el historial falló (ver LibroMayor.degradado): se responde sin id
+            registro = RegistroTransferencia(None, cuenta_origen.numero, cuenta_destino.numero,
+                                             transferencia.monto, datetime.now().timestamp(), "COMPLETED")
+            velocidad_cuentas.registrar(registro.origen, registro.destino, registro.monto, registro.ts)
+            return respuesta_transferencia(registro, resultado.valor)
+        publicar_movimiento(registro)
+        return respuesta_transferencia(registro, resultado.valor)
+    
+    registro, saldo_restante = await procesar_transferencia_async(
+        cuenta_origen, cuenta_destino, transferencia.monto, reserva
+    )
+    return respuesta_transferencia(registro, saldo_restante)
+
+
+def ejecutar_transferencia(transferencia: TransferenciaRequest, x_otp: Optional[str],
+                           force_maint: bool) -> dict:
+    """Pasos 2 a 12 y procesamiento de una transferencia ya autenticada"""
+    cuenta_origen, cuenta_destino, reserva = validar_solicitud(transferencia, x_otp, force_maint)
+    
+    # 10-12. SALDO, LÍMITE DIARIO Y LÍMITE MENSUAL
+    # Se validan dentro de la sección crítica junto con el débito/crédito
+    # (ver AlmacenCuentas.transferir)
+    
+    # ==================== PROCESAR TRANSFERENCIA ====================
+    registro, saldo_restante = procesar_transferencia(
+        cuenta_origen, cuenta_destino, transferencia.monto, reserva
+    )
+    return respuesta_transferencia(registro, saldo_restante)
+
+
+def validar_solicitud(transferencia: TransferenciaRequest, x_otp: Optional[str], force_maint: bool):
+    """Pasos 2 a 9; retorna (cuenta_origen, cuenta_destino, reserva_otp) o lanza HTTPException"""
+    
+    # 2. VALIDAR HORARIO DE MANTENIMIENTO
+    with PASOS["mantenimiento"].medir():
+        en_mantenimiento = es_horario_mantenimiento(force_maint)
+    if en_mantenimiento:
+        raise error_mantenimiento()
     
     # 3. VALIDAR RATE LIMITING
-    if not validar_rate_limit(transferencia.origen):
-        raise HTTPException(
+    with PASOS["rate_limit"].medir():
+        permitida = validar_rate_limit(transferencia.origen)
+    if not permitida:
+        raise rechazar(
+            "rate_limit",
             status_code=429,
             detail="Demasiadas solicitudes. Intente más tarde"
         )
     
-    # 4. VALIDAR ORIGEN != DESTINO
-    if transferencia.origen == transferencia.destino:
-        raise HTTPException(
-            status_code=400,
-            detail="La cuenta origen no puede ser igual a la cuenta destino"
-        )
+    # 4-9. CUENTAS, ESTADO, MONTO Y OTP
+    return validar_transferencia(transferencia, x_otp)
+
+
+def respuesta_transferencia(registro: RegistroTransferencia, saldo_restante: int) -> dict:
+    """Cuerpo de TransferenciaResponse, ya listo para serializar (ver respuestas_json.py)"""
+    return {
+        "id": registro.id,
+        "origen": registro.origen,
+        "destino": registro.destino,
+        "monto": a_unidades(registro.monto),
+        "status": registro.status,
+        "fecha": registro.fecha,
+        "mensaje": "Transferencia realizada exitosamente",
+        "saldo_restante": a_unidades(saldo_restante)
+    }
+
+
+@app.post("/api/transferencias/otp")
+def emitir_desafio_otp(desafio: DesafioOTPRequest, authorization: Optional[str] = Header(None)):
+    """
+    Emite un código OTP para una transferencia (origen, destino y monto)
     
-    # 5. VALIDAR CUENTA ORIGEN EXISTE
-    if transferencia.origen not in cuentas_db:
+    - El código vence a los OTP_TTL_SEGUNDOS y autoriza una sola transferencia
+      con esos mismos datos (campo `otp` o header X-OTP)
+    - Emitir de nuevo para la misma transferencia invalida el código anterior
+    - Tras OTP_MAX_INTENTOS códigos incorrectos la cuenta queda bloqueada
+      OTP_BLOQUEO_SEGUNDOS (429)
+    - En producción el código se envía por SMS/email; solo con
+      OTP_CODIGO_EN_RESPUESTA=1 (testing) se incluye en la respuesta
+    """
+    _requerir_autorizacion(authorization)
+    if almacen.obtener(desafio.origen) is None:
         raise HTTPException(status_code=404, detail="Cuenta origen no encontrada")
+    try:
+        codigo = servicio_otp.emitir(desafio.origen, desafio.destino, desafio.monto)
+    except OTPBloqueado as e:
+        raise HTTPException(status_code=429, detail="Demasiados intentos de OTP fallidos. Intente más tarde",
+                            headers={"Retry-After": str(int(e.restante) + 1)})
+    respuesta = {
+        "origen": desafio.origen,
+        "destino": desafio.destino,
+        "monto": a_unidades(desafio.monto),
+        "expira": formatear_fecha(datetime.now().timestamp() + servicio_otp.ttl)
+    }
+    if OTP_CODIGO_EN_RESPUESTA:
+        respuesta["codigo"] = codigo
+    return RespuestaJSON(respuesta, status_code=201)
+
+
+@app.post("/api/transferencias/lote", response_model=LoteResponse)
+def crear_lote_transferencias(
+    lote: LoteRequest,
+    authorization: Optional[str] = Header(None),
+    x_otp: Optional[str] = Header(None),
+    x_force_maintenance: Optional[str] = Header(None)
+):
+    """
+    Aplica un lote de transferencias (nómina, conciliaciones) en una sola llamada
     
-    cuenta_origen = cuentas_db[transferencia.origen]
+    - Autenticación y mantenimiento se validan una vez para todo el lote
+    - El rate limiting cuenta cada transferencia, como si llegaran por
+      separado: las que exceden el cupo de su cuenta origen reciben 429
+    - Cada transferencia recibe el mismo código y mensaje que tendría en
+      POST /api/transferencias (409 si no se aplicó por modo todo_o_nada)
+    """
+    _requerir_autorizacion(authorization)
     
-    # 6. VALIDAR CUENTA NO BLOQUEADA
-    if cuenta_origen["estado"] == "BLOQUEADA":
-        raise HTTPException(
-            status_code=403,
-            detail="Cuenta bloqueada. Contacte al banco"
-        )
+    force_maint = x_force_maintenance == "1" if x_force_maintenance else False
+    if es_horario_mantenimiento(force_maint):
+        raise error_mantenimiento()
     
-    # 7. VALIDAR CUENTA DESTINO EXISTE
-    if transferencia.destino not in cuentas_db:
-        raise HTTPException(status_code=404, detail="Cuenta destino no encontrada")
-    
-    # 8. VALIDAR MONTO NEGATIVO (ya validado por Pydantic gt=0)
-    if transferencia.monto <= 0:
-        raise HTTPException(status_code=400, detail="El monto debe ser mayor a cero")
-    
-    # 9. VALIDAR OTP PARA MONTOS ALTOS
-    if transferencia.monto > MONTO_REQUIERE_OTP:
-        otp_enviado = x_otp or transferencia.otp
-        if not otp_enviado or otp_enviado != OTP_VALIDO:
-            raise HTTPException(
-                status_code=401,
-                detail=f"OTP inválido o ausente. Requerido para montos > ${MONTO_REQUIERE_OTP:,.0f}"
-            )
+    atomico = lote.modo == "todo_o_nada"
+    # Una llamada al limitador por cuenta origen: las primeras de cada una, en
+    # orden, consumen el cupo que quede
+    pendientes = Counter(t.origen for t in lote.transferencias)
+    cupos = {origen: limitador_tasa.permitir_varias(origen, cantidad) for origen, cantidad in pendientes.items()}
     
-    # 10. VALIDAR SALDO SUFICIENTE
-    if cuenta_origen["saldo"] < transferencia.monto:
-        raise HTTPException(
-            status_code=402,
-            detail=f"Saldo insuficiente. Disponible: ${cuenta_origen['saldo']:,.2f}"
-        )
+    # Primera pasada: validaciones 3-9 por transferencia (sin tocar saldos)
+    errores = {}
+    operaciones = []
+    indices_operaciones = []
+    reservas = []
+    for indice, transferencia in enumerate(lote.transferencias):
+        try:
+            if not cupos[transferencia.origen]:
+                raise rechazar("rate_limit", status_code=429, detail="Demasiadas solicitudes. Intente más tarde")
+            cupos[transferencia.origen] -= 1
+            cuenta_origen, cuenta_destino, reserva = validar_transferencia(transferencia, x_otp)
+        except HTTPException as e:
+            errores[indice] = e
+            continue
+        operaciones.append((cuenta_origen, cuenta_destino, transferencia.monto))
+        indices_operaciones.append(indice)
+        reservas.append(reserva)
     
-    # 11. VALIDAR LÍMITE DIARIO
-    if cuenta_origen["transferido_hoy"] + transferencia.monto > LIMITE_DIARIO:
-        raise HTTPException(
-            status_code=403,
-            detail=f"Excede límite diario de ${LIMITE_DIARIO:,.0f}. Usado hoy: ${cuenta_origen['transferido_hoy']:,.2f}"
-        )
+    # Segunda pasada: saldo/límites y aplicación en una sola operación del almacén.
+    # Los desafíos OTP de las transferencias no aplicadas se devuelven
+    aplicados = {}
+    if errores and atomico:
+        abortada = error_rechazo(Rechazo.LOTE_ABORTADO, 0)
+        errores.update({indice: abortada for indice in indices_operaciones})
+        for reserva in reservas:
+            servicio_otp.devolver(reserva)
+    elif operaciones:
+        for indice, operacion, reserva, resultado in zip(
+            indices_operaciones, operaciones, reservas, almacen.transferir_lote(operaciones, atomico)
+        ):
+            if resultado.aprobada:
+                origen, destino, monto = operacion
+                registro = transferencias_historial.registrar(origen.numero, destino.numero, monto)
+                publicar_movimiento(registro)
+                aplicados[indice] = (registro, resultado.valor)
+            else:
+                servicio_otp.devolver(reserva)
+                errores[indice] = error_rechazo(resultado.rechazo, resultado.valor, operacion[0].numero)
     
-    # 12. VALIDAR LÍMITE MENSUAL
-    if cuenta_origen["transferido_mes"] + transferencia.monto > LIMITE_MENSUAL:
-        raise HTTPException(
-            status_code=403,
-            detail=f"Excede límite mensual de ${LIMITE_MENSUAL:,.0f}. Usado este mes: ${cuenta_origen['transferido_mes']:,.2f}"
-        )
+    # Cuerpo de LoteResponse armado directamente (ver respuestas_json.py)
+    resultados = []
+    for indice in range(len(lote.transferencias)):
+        if indice in aplicados:
+            registro, saldo_restante = aplicados[indice]
+            resultados.append({
+                "indice": indice, "status_code": 200, "id": registro.id, "status": registro.status,
+                "detalle": "Transferencia realizada exitosamente", "saldo_restante": a_unidades(saldo_restante)
+            })
+        else:
+            error = errores[indice]
+            resultados.append({
+                "indice": indice, "status_code": error.status_code, "id": None, "status": "REJECTED",
+                "detalle": error.detail, "saldo_restante": None
+            })
     
-    # ==================== PROCESAR TRANSFERENCIA ====================
-    # Simular transacción atómica con lock para evitar race conditions
-    with db_lock:
-        # Re-verificar saldo dentro del lock (double-check locking pattern)
-        if cuentas_db[transferencia.origen]["saldo"] < transferencia.monto:
-            raise HTTPException(
-                status_code=402,
-                detail=f"Saldo insuficiente. Disponible: ${cuentas_db[transferencia.origen]['saldo']:,.2f}"
-            )
-        
-        try:
-            # Debitar cuenta origen
-            cuentas_db[transferencia.origen]["saldo"] -= transferencia.monto
-            cuentas_db[transferencia.origen]["transferido_hoy"] += transferencia.monto
-            cuentas_db[transferencia.origen]["transferido_mes"] += transferencia.monto
-            
-            # Acreditar cuenta destino
-            cuentas_db[transferencia.destino]["saldo"] += transferencia.monto
-            
-            # Guardar en historial
-            transferencia_id = len(transferencias_historial) + 1
-            registro = {
-                "id": transferencia_id,
-                "origen": transferencia.origen,
-                "destino": transferencia.destino,
-                "monto": transferencia.monto,
-                "fecha": datetime.now().isoformat(),
-                "status": "COMPLETED"
-            }
-            transferencias_historial.append(registro)
-            
-            return TransferenciaResponse(
-                id=transferencia_id,
-                origen=transferencia.origen,
-                destino=transferencia.destino,
-                monto=transferencia.monto,
-                status="COMPLETED",
-                fecha=registro["fecha"],
-                mensaje="Transferencia realizada exitosamente",
-                saldo_restante=cuentas_db[transferencia.origen]["saldo"]
-            )
-            
-        except Exception as e:
-            # Rollback en caso de error
-            raise HTTPException(status_code=500, detail=f"Error procesando transferencia: {str(e)}")
+    return RespuestaJSON({
+        "modo": lote.modo,
+        "total": len(resultados),
+        "exitosas": len(aplicados),
+        "rechazadas": len(resultados) - len(aplicados),
+        "resultados": resultados
+    })
+
+
+def _epoch(fecha: Optional[datetime]) -> Optional[float]:
+    """Convierte un filtro de fecha a epoch (fechas sin zona se asumen hora local)"""
+    return fecha.timestamp() if fecha is not None else None
+
+
+def _ndjson(registros, tamano_bloque: int = 500):
+    """Serializa en bloques de líneas JSON para no materializar toda la respuesta"""
+    bloque = []
+    for registro in registros:
+        bloque.append(dumps(registro.como_dict()))
+        if len(bloque) >= tamano_bloque:
+            yield b"\n".join(bloque) + b"\n"
+            bloque = []
+    if bloque:
+        yield b"\n".join(bloque) + b"\n"
 
 
 @app.get("/api/transferencias/historial")
-def obtener_historial():
-    """Obtiene el historial de todas las transferencias"""
-    return {"transferencias": transferencias_historial, "total": len(transferencias_historial)}
+def obtener_historial(
+    cursor: Optional[int] = Query(None, ge=0, description="Retorna transferencias con id mayor al cursor"),
+    limite: Optional[int] = Query(None, ge=1, le=1000, description="Tamaño de página (100 por defecto en JSON)"),
+    origen: Optional[str] = None,
+    destino: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    status: Optional[str] = None,
+    formato: str = Query("json", pattern="^(json|ndjson)$", description="json (paginado) o ndjson (streaming)")
+):
+    """
+    Obtiene el historial de transferencias paginado por cursor
+    
+    - Filtros por origen, destino, rango de fechas y status
+    - formato=ndjson transmite todas las coincidencias (o `limite`) línea a línea
+    - Solo se consultan los registros retenidos en memoria (id >= primer_id);
+      los expulsados quedan en el archivo de volcado HISTORIAL_ARCHIVO
+    """
+    registros = transferencias_historial.consultar(
+        cursor=cursor, origen=origen, destino=destino,
+        desde=_epoch(desde), hasta=_epoch(hasta), status=status
+    )
+    
+    if formato == "ndjson":
+        if limite is not None:
+            registros = islice(registros, limite)
+        return StreamingResponse(_ndjson(registros), media_type="application/x-ndjson")
+    
+    # Se pide un registro extra para saber si existe una página siguiente
+    limite = limite or 100
+    pagina = list(islice(registros, limite + 1))
+    siguiente_cursor = pagina[limite - 1].id if len(pagina) > limite else None
+    return RespuestaJSON({
+        "transferencias": [registro.como_dict() for registro in pagina[:limite]],
+        "total": transferencias_historial.ultimo_id,
+        "primer_id": transferencias_historial.primer_id,
+        "siguiente_cursor": siguiente_cursor
+    })
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def exponer_metricas():
+    """Métricas del proceso en formato de texto Prometheus"""
+    return PlainTextResponse(metricas.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# En memoria las versiones vuelven a 0 en cada arranque: un id del arranque en el
+# ETag evita que uno recibido antes de reiniciar coincida con otro estado de la
+# cuenta. SQLite persiste las versiones y no lo necesita
+ID_ARRANQUE = "" if isinstance(almacen, AlmacenSQLite) else secrets.token_hex(4) + "-"
+
+
+def etag_cuenta(cuenta: Cuenta, periodos: Periodos) -> str:
+    """ETag de la representación: cambia con la versión y, por los acumulados, con el día"""
+    return f'"{ID_ARRANQUE}{cuenta.version}-{periodos[0]}"'
+
+
+def _etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = {valor.strip() for valor in if_none_match.split(",")}
+    # Comparación débil (RFC 9110): W/"x" equivale a "x"
+    candidatos |= {valor[2:] for valor in candidatos if valor.startswith("W/")}
+    return "*" in candidatos or etag in candidatos
+
+
+def _cuerpo_cuenta(cuenta: Cuenta, etag: str, periodos: Periodos) -> bytes:
+    """JSON de la cuenta, desde la cache si su ETag no cambió"""
+    cuerpo = cache_cuentas.obtener(cuenta.numero, etag)
+    if cuerpo is None:
+        cuerpo = dumps(cuenta.como_dict(periodos))
+        cache_cuentas.guardar(cuenta.numero, etag, cuerpo)
+    return cuerpo
+
+
+def _consultar_cuentas(numeros: List[str], if_none_match: Optional[str]) -> Response:
+    if len(numeros) > CONSULTA_MAX_CUENTAS:
+        raise HTTPException(status_code=400, detail=f"Máximo {CONSULTA_MAX_CUENTAS} cuentas por consulta")
+    periodos = periodos_actuales()
+    cuentas = almacen.obtener_varias(numeros)
+    # ETag del conjunto: combina los ETag de cada cuenta (y las no encontradas)
+    etags = [(numero, etag_cuenta(cuentas[numero], periodos) if numero in cuentas else "-") for numero in numeros]
+    etag = '"' + hashlib.sha1("|".join(f"{n}:{e}" for n, e in etags).encode()).hexdigest() + '"'
+    if _etag_coincide(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    encontradas = [_cuerpo_cuenta(cuentas[numero], e, periodos) for numero, e in etags if e != "-"]
+    no_encontradas = [numero for numero, e in etags if e == "-"]
+    cuerpo = (b'{"cuentas":[' + b",".join(encontradas) + b'],"no_encontradas":'
+              + dumps(no_encontradas) + b"}")
+    return Response(cuerpo, media_type="application/json", headers={"ETag": etag})
+
+
+@app.get("/api/cuentas")
+def consultar_cuentas(
+    numeros: str = Query(..., description="Números de cuenta separados por coma"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Consulta varias cuentas en una llamada (dashboards)
+    
+    Responde {"cuentas": [...], "no_encontradas": [...]} con un ETag del
+    conjunto; con If-None-Match igual al último ETag responde 304 sin cuerpo.
+    """
+    return _consultar_cuentas([n.strip() for n in numeros.split(",") if n.strip()], if_none_match)
+
+
+@app.post("/api/cuentas/consulta")
+def consultar_cuentas_post(consulta: ConsultaCuentasRequest, if_none_match: Optional[str] = Header(None)):
+    """Igual que GET /api/cuentas, con la lista de números en el cuerpo (listas largas)"""
+    return _consultar_cuentas(consulta.numeros, if_none_match)
 
 
 @app.get("/api/cuentas/{numero_cuenta}")
-def obtener_cuenta(numero_cuenta: str):
-    """Obtiene información de una cuenta"""
-    if numero_cuenta not in cuentas_db:
+def obtener_cuenta(numero_cuenta: str, if_none_match: Optional[str] = Header(None)):
+    """
+    Obtiene información de una cuenta
+    
+    Incluye un ETag por versión de la cuenta: con If-None-Match igual al
+    último ETag recibido responde 304 sin cuerpo si la cuenta no cambió.
+    """
+    periodos = periodos_actuales()
+    cuenta = almacen.obtener(numero_cuenta)
+    if cuenta is None:
         raise HTTPException(status_code=404, detail="Cuenta no encontrada")
     
-    return {
-        "numero": numero_cuenta,
-        **cuentas_db[numero_cuenta]
-    }
+    # El ETag se calcula antes de leer los datos (ver Cuenta.version)
+    etag = etag_cuenta(cuenta, periodos)
+    if _etag_coincide(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(_cuerpo_cuenta(cuenta, etag, periodos), media_type="application/json", headers={"ETag": etag})
+
+
+def _movimiento(registro: RegistroTransferencia, cuenta: str) -> dict:
+    datos = registro.como_dict()
+    datos["tipo"] = "debito" if registro.origen == cuenta else "credito"
+    return datos
+
+
+@app.get("/api/cuentas/{numero_cuenta}/movimientos")
+def movimientos_cuenta(
+    numero_cuenta: str,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[int] = Query(None, ge=0, description="Retorna movimientos con id mayor al cursor"),
+    limite: int = Query(100, ge=1, le=1000)
+):
+    """
+    Movimientos (débitos y créditos) de una cuenta en un rango de fechas
+    
+    - Se buscan por bisección en el índice por cuenta del historial: el costo
+      no depende de cuántas transferencias haya retenidas
+    - Paginado por cursor como /api/transferencias/historial
+    - Solo incluye los registros retenidos en memoria
+    """
+    if almacen.obtener(numero_cuenta) is None:
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+    registros = transferencias_historial.movimientos(numero_cuenta, _epoch(desde), _epoch(hasta), cursor)
+    pagina = list(islice(registros, limite + 1))
+    return RespuestaJSON({
+        "cuenta": numero_cuenta,
+        "movimientos": [_movimiento(registro, numero_cuenta) for registro in pagina[:limite]],
+        "siguiente_cursor": pagina[limite - 1].id if len(pagina) > limite else None
+    })
+
+
+@app.get("/api/cuentas/{numero_cuenta}/velocidad")
+def velocidad_cuenta(numero_cuenta: str):
+    """
+    Actividad saliente de la cuenta en el último minuto, hora y día:
+    cantidad, monto y destinos distintos (los que ve el control de fraude)
+    """
+    if almacen.obtener(numero_cuenta) is None:
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+    velocidad = velocidad_cuentas.consultar(numero_cuenta)._asdict()
+    for campo in ("monto_1m", "monto_1h", "monto_24h"):
+        velocidad[campo] = a_unidades(velocidad[campo])
+    return RespuestaJSON({"cuenta": numero_cuenta, **velocidad})
+
+
+def _evento_sse(registro: RegistroTransferencia, cuenta: str) -> str:
+    datos = dumps(_movimiento(registro, cuenta)).decode()
+    return f"id: {registro.id}\nevent: movimiento\ndata: {datos}\n\n"
+
+
+async def _stream_eventos(numero_cuenta: str, suscripcion, ultimo_id: int):
+    EVENTOS_SUSCRIPTORES.inc()
+    try:
+        # Reanudación: movimientos retenidos en el historial posteriores a Last-Event-ID
+        if ultimo_id:
+            pendientes = heapq.merge(
+                transferencias_historial.consultar(cursor=ultimo_id, origen=numero_cuenta),
+                transferencias_historial.consultar(cursor=ultimo_id, destino=numero_cuenta),
+                key=lambda registro: registro.id
+            )
+            for registro in pendientes:
+                ultimo_id = registro.id
+                yield _evento_sse(registro, numero_cuenta)
+        
+        while True:
+            try:
+                registro = await asyncio.wait_for(suscripcion.siguiente(), EVENTOS_KEEPALIVE_SEGUNDOS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if registro is None:
+                # Descartado por lento: el cliente reconecta con Last-Event-ID
+                EVENTOS_DESCARTADOS.inc()
+                yield "event: desconectado\ndata: {}\n\n"
+                return
+            if registro.id <= ultimo_id:
+                # Ya enviado en la reanudación. Solo se compara con ella: los
+                # eventos en vivo pueden llegar con ids fuera de orden
+                continue
+            yield _evento_sse(registro, numero_cuenta)
+    finally:
+        bus_eventos.cancelar(suscripcion)
+        EVENTOS_SUSCRIPTORES.dec()
+
+
+@app.get("/api/cuentas/{numero_cuenta}/eventos")
+async def eventos_cuenta(numero_cuenta: str, last_event_id: Optional[int] = Header(None, ge=0)):
+    """
+    Stream (server-sent events) de los movimientos de una cuenta
+    
+    - Un evento `movimiento` por transferencia aplicada, con `tipo` debito o
+      credito e `id` igual al de la transferencia
+    - Con el header Last-Event-ID se reenvían primero los movimientos
+      posteriores que sigan retenidos en el historial
+    - Un cliente que no consume a tiempo recibe `desconectado` y se cierra
+      el stream; debe reconectar con Last-Event-ID
+    - Los eventos son del proceso: con varios workers, cada stream ve solo
+      las transferencias atendidas por su worker
+    """
+    if almacen.bloqueante:
+        cuenta = await run_in_threadpool(almacen.obtener, numero_cuenta)
+    else:
+        cuenta = almacen.obtener(numero_cuenta)
+    if cuenta is None:
+        raise HTTPException(status_code=404, detail="Cuenta no encontrada")
+    
+    # Suscribirse antes de la reanudación para no perder movimientos intermedios
+    try:
+        suscripcion = bus_eventos.suscribir(numero_cuenta)
+    except LimiteSuscriptores:
+        raise HTTPException(status_code=503, detail="Demasiados streams de eventos abiertos. Intente más tarde")
+    return StreamingResponse(
+        _stream_eventos(numero_cuenta, suscripcion, last_event_id or 0),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.post("/api/cuentas/{numero_cuenta}/reset")
 def resetear_cuenta(numero_cuenta: str):
     """Resetea los límites diarios y mensuales (solo para testing)"""
-    if numero_cuenta not in cuentas_db:
+    cuenta = almacen.resetear(numero_cuenta, saldo=SALDO_RESET_CENTAVOS)  # Reset saldo inicial
+    if cuenta is None:
         raise HTTPException(status_code=404, detail="Cuenta no encontrada")
     
-    cuentas_db[numero_cuenta]["transferido_hoy"] = 0
-    cuentas_db[numero_cuenta]["transferido_mes"] = 0
-    cuentas_db[numero_cuenta]["saldo"] = 100000  # Reset saldo inicial
+    return {"mensaje": "Cuenta reseteada", "cuenta": cuenta.como_dict()}
+
+
+# ==================== ADMINISTRACIÓN (testing) ====================
+NombreInstantanea = Annotated[str, Path(pattern=r"^[A-Za-z0-9_-]{1,64}$", description="Nombre del archivo")]
+
+
+def _ruta_instantanea(nombre: str) -> str:
+    return os.path.join(INSTANTANEAS_DIR, f"{nombre}.tbin")
+
+
+@app.post("/api/admin/instantaneas/{nombre}")
+def crear_instantanea(nombre: NombreInstantanea, authorization: Optional[str] = Header(None)):
+    """
+    Guarda cuentas, historial y rate limiting en INSTANTANEAS_DIR/{nombre}.tbin
+    
+    Formato binario compacto (ver instantanea.py); el archivo se reemplaza de
+    forma atómica. Conviene capturar sin transferencias en curso.
+    """
+    _requerir_admin(authorization)
+    estado = instantanea.capturar(almacen, transferencias_historial, limitador_tasa)
+    os.makedirs(INSTANTANEAS_DIR, exist_ok=True)
+    tamano = instantanea.guardar(estado, _ruta_instantanea(nombre))
+    return {"nombre": nombre, "bytes": tamano, "cuentas": len(estado.cuentas),
+            "transferencias": len(estado.registros), "ultimo_id": estado.ultimo_id}
+
+
+@app.post("/api/admin/instantaneas/{nombre}/restaurar")
+async def restaurar_instantanea(nombre: NombreInstantanea, authorization: Optional[str] = Header(None)):
+    """
+    Reemplaza cuentas, historial y rate limiting por los de la instantánea
+    
+    El reemplazo es atómico respecto de las transferencias. Se vacían las
+    caches de respuestas e idempotencia y los agregados de velocidad, que
+    podrían referirse a estado que ya no existe.
+    """
+    _requerir_admin(authorization)
+    try:
+        estado = await run_in_threadpool(instantanea.cargar, _ruta_instantanea(nombre))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Instantánea no encontrada")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        await run_in_threadpool(instantanea.restaurar, estado, almacen, transferencias_historial, limitador_tasa)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    cache_cuentas.limpiar()
+    cache_idempotencia.limpiar()
+    velocidad_cuentas.limpiar()
+    return {"nombre": nombre, "cuentas": len(estado.cuentas), "transferencias": len(estado.registros),
+            "ultimo_id": estado.ultimo_id}
+
+
+@app.post("/api/admin/cuentas/sembrar")
+def sembrar_cuentas(semilla: SembrarRequest, authorization: Optional[str] = Header(None)):
+    """
+    Crea en una llamada las cuentas indicadas y/o un rango numerado
     
-    return {"mensaje": "Cuenta reseteada", "cuenta": cuentas_db[numero_cuenta]}
+    Las cuentas que ya existen no se modifican.
+    """
+    _requerir_admin(authorization)
+    cuentas = [Cuenta(c.numero, saldo=c.saldo, estado=c.estado) for c in semilla.cuentas]
+    rango = semilla.rango
+    if rango is not None:
+        cuentas.extend(Cuenta(f"{n:08d}", saldo=rango.saldo) for n in range(rango.desde, rango.desde + rango.cantidad))
+    if len(cuentas) > SEMBRAR_MAX_CUENTAS:
+        raise HTTPException(status_code=400, detail=f"Máximo {SEMBRAR_MAX_CUENTAS} cuentas por llamada")
+    antes = len(almacen)
+    almacen.sembrar(cuentas)
+    total = len(almacen)
+    return {"solicitadas": len(cuentas), "creadas": total - antes, "total": total}
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="API Transferencias Bancarias")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="Procesos uvicorn; con más de uno se usa el almacén SQLite compartido")
+    args = parser.parse_args()
+    
+    if args.workers > 1:
+        # Cada worker importa main de nuevo: el almacén y el rate limiting deben
+        # vivir en SQLite para que los límites se respeten entre procesos
+        if os.getenv("ALMACEN_CUENTAS", "sqlite") != "sqlite":
+            parser.error("--workers > 1 requiere ALMACEN_CUENTAS=sqlite")
+        os.environ["ALMACEN_CUENTAS"] = "sqlite"
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
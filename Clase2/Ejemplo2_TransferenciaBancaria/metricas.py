@@ -0,0 +1,242 @@
+"""
+Métricas en formato de texto Prometheus para la API de transferencias
+Contadores, gauges e histogramas fragmentados por thread (sin locks al registrar)
+"""
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Dict, List, Sequence, Tuple
+
+# Segundos: de 50 µs a 2.5 s
+LIMITES_LATENCIA = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class _Fragmentado:
+    """
+    Valor repartido en una celda por thread. Cada thread escribe solo en la
+    suya, así registrar no necesita locks ni compite con otros threads; la
+    lectura (poco frecuente) suma todas las celdas. Las celdas de threads
+    terminados se conservan para no perder lo ya contado.
+    """
+    __slots__ = ("_local", "_celdas", "_lock", "_tamano")
+
+    def __init__(self, tamano: int):
+        self._local = threading.local()
+        self._celdas: List[list] = []
+        self._lock = threading.Lock()
+        self._tamano = tamano
+
+    def celda(self) -> list:
+        try:
+            return self._local.celda
+        except AttributeError:
+            celda = [0] * self._tamano
+            with self._lock:
+                self._celdas.append(celda)
+            self._local.celda = celda
+            return celda
+
+    def sumar(self) -> list:
+        with self._lock:
+            celdas = list(self._celdas)
+        total = [0] * self._tamano
+        for celda in celdas:
+            for i, valor in enumerate(celda):
+                total[i] += valor
+        return total
+
+
+class Contador:
+    __slots__ = ("_valor",)
+
+    def __init__(self):
+        self._valor = _Fragmentado(1)
+
+    def inc(self, cantidad: float = 1):
+        self._valor.celda()[0] += cantidad
+
+    @property
+    def valor(self) -> float:
+        return self._valor.sumar()[0]
+
+
+class Gauge(Contador):
+    """Valor que sube y baja (p. ej. solicitudes en curso); inc y dec pueden ocurrir en threads distintos"""
+    __slots__ = ()
+
+    def dec(self, cantidad: float = 1):
+        self._valor.celda()[0] -= cantidad
+
+
+class _Cronometro:
+    __slots__ = ("_histograma", "_inicio")
+
+    def __init__(self, histograma: "Histograma"):
+        self._histograma = histograma
+
+    def __enter__(self):
+        self._inicio = perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        self._histograma.observar(perf_counter() - self._inicio)
+
+
+class Histograma:
+    """
+    Histograma de buckets fijos. Cada celda guarda las cuentas por bucket (no
+    acumuladas), la suma y el total; la acumulación se hace al exponer.
+    """
+    __slots__ = ("limites", "_datos", "_local")
+
+    def __init__(self, limites: Sequence[float] = LIMITES_LATENCIA):
+        self.limites = tuple(limites)
+        # buckets + (+Inf) + suma + total
+        self._datos = _Fragmentado(len(self.limites) + 3)
+        self._local = self._datos._local
+
+    def observar(self, valor: float):
+        # Camino rápido: la celda de este thread ya existe
+        try:
+            celda = self._local.celda
+        except AttributeError:
+            celda = self._datos.celda()
+        celda[bisect_left(self.limites, valor)] += 1
+        celda[-2] += valor
+        celda[-1] += 1
+
+    def medir(self) -> _Cronometro:
+        """`with histograma.medir():` observa la duración del bloque, aunque lance excepción"""
+        return _Cronometro(self)
+
+    def resumen(self) -> Tuple[List[int], float, int]:
+        """(cuentas acumuladas por bucket incluido +Inf, suma, total)"""
+        datos = self._datos.sumar()
+        acumulados = []
+        acumulado = 0
+        for cuenta in datos[:-2]:
+            acumulado += cuenta
+            acumulados.append(acumulado)
+        return acumulados, datos[-2], datos[-1]
+
+
+class Familia:
+    """Métrica con nombre, ayuda y etiquetas; cada combinación de valores es una serie"""
+
+    def __init__(self, nombre: str, ayuda: str, tipo: str, fabrica, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.etiquetas = tuple(etiquetas)
+        self._fabrica = fabrica
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def etiquetar(self, *valores: str):
+        """Serie para esos valores de etiqueta (se crea la primera vez)"""
+        serie = self._series.get(valores)
+        if serie is None:
+            if len(valores) != len(self.etiquetas):
+                raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}")
+            with self._lock:
+                serie = self._series.setdefault(valores, self._fabrica())
+        return serie
+
+    def series(self):
+        with self._lock:
+            return list(self._series.items())
+
+
+def _formatear_etiquetas(nombres: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class RegistroMetricas:
+    """Conjunto de familias que se exponen juntas en /metrics"""
+
+    def __init__(self):
+        self._familias: List[Familia] = []
+
+    def _registrar(self, familia: Familia) -> Familia:
+        self._familias.append(familia)
+        return familia
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Familia:
+        return self._registrar(Familia(nombre, ayuda, "counter", Contador, etiquetas))
+
+    def gauge(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()) -> Familia:
+        return self._registrar(Familia(nombre, ayuda, "gauge", Gauge, etiquetas))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_LATENCIA) -> Familia:
+        return self._registrar(Familia(nombre, ayuda, "histogram", lambda: Histograma(limites), etiquetas))
+
+    def exponer(self) -> str:
+        """Texto en formato de exposición Prometheus 0.0.4"""
+        lineas = []
+        for familia in self._familias:
+            lineas.append(f"# HELP {familia.nombre} {familia.ayuda}")
+            lineas.append(f"# TYPE {familia.nombre} {familia.tipo}")
+            for valores, serie in sorted(familia.series()):
+                if familia.tipo != "histogram":
+                    etiquetas = _formatear_etiquetas(familia.etiquetas, valores)
+                    lineas.append(f"{familia.nombre}{etiquetas} {_numero(serie.valor)}")
+                    continue
+                acumulados, suma, total = serie.resumen()
+                for limite, cuenta in zip(serie.limites + (float("inf"),), acumulados):
+                    etiquetas = _formatear_etiquetas(familia.etiquetas, valores, f'le="{_numero(limite)}"')
+                    lineas.append(f"{familia.nombre}_bucket{etiquetas} {cuenta}")
+                etiquetas = _formatear_etiquetas(familia.etiquetas, valores)
+                lineas.append(f"{familia.nombre}_sum{etiquetas} {_numero(suma)}")
+                lineas.append(f"{familia.nombre}_count{etiquetas} {total}")
+        return "\n".join(lineas) + "\n"
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI: duración de cada solicitud por ruta (plantilla, no la URL
+    concreta, para acotar la cardinalidad), método y código de respuesta, y
+    gauge de solicitudes en curso.
+    """
+
+    def __init__(self, app, duracion: Familia, en_curso: Gauge):
+        self.app = app
+        self.duracion = duracion
+        self.en_curso = en_curso
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        self.en_curso.inc()
+        inicio = perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            self.en_curso.dec()
+            ruta = scope.get("route")
+            self.duracion.etiquetar(
+                getattr(ruta, "path", "sin_ruta"), scope["method"], str(estado[0])
+            ).observar(perf_counter() - inicio)
@@ -0,0 +1,222 @@
+"""
+Motor de validación y aplicación de transferencias
+Valida saldo y límites y aplica débito/crédito en una sola sección crítica
+"""
+from datetime import date
+from enum import Enum
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from bloqueos import GestorBloqueos
+from dinero import Centavos, a_unidades
+
+# (día, mes) vigentes: ordinal de la fecha y año * 12 + mes
+Periodos = Tuple[int, int]
+
+
+def periodos_actuales() -> Periodos:
+    """Períodos de los acumulados según la fecha local"""
+    hoy = date.today()
+    return hoy.toordinal(), hoy.year * 12 + hoy.month
+
+
+class Cuenta:
+    """
+    Registro compacto por cuenta (__slots__, sin __dict__ por instancia).
+    Saldo y acumulados en centavos (int): las sumas son exactas.
+
+    `periodo_dia` y `periodo_mes` indican a qué día/mes corresponden los
+    acumulados: si ya no son los vigentes, los acumulados valen cero. Así los
+    límites se renuevan al cambiar de día o de mes sin recorrer las cuentas.
+
+    `version` aumenta con cada cambio (base del ETag de la cuenta). Quien
+    modifica la incrementa al final y quien lee la toma primero: sin locks, un
+    lector puede ver datos más nuevos que su versión, nunca más viejos.
+    """
+    __slots__ = ("numero", "saldo", "estado", "transferido_hoy", "transferido_mes",
+                 "periodo_dia", "periodo_mes", "version")
+
+    def __init__(self, numero: str, saldo: Centavos, estado: str = "ACTIVA",
+                 transferido_hoy: Centavos = 0, transferido_mes: Centavos = 0,
+                 periodo_dia: int = 0, periodo_mes: int = 0, version: int = 0):
+        self.numero = numero
+        self.saldo = saldo
+        self.estado = estado
+        self.transferido_hoy = transferido_hoy
+        self.transferido_mes = transferido_mes
+        self.periodo_dia = periodo_dia
+        self.periodo_mes = periodo_mes
+        self.version = version
+
+    def acumulados(self, periodos: Periodos) -> Tuple[Centavos, Centavos]:
+        """(transferido_hoy, transferido_mes) vigentes para los períodos dados"""
+        dia, mes = periodos
+        return (
+            self.transferido_hoy if self.periodo_dia == dia else 0,
+            self.transferido_mes if self.periodo_mes == mes else 0
+        )
+
+    def como_dict(self, periodos: Optional[Periodos] = None) -> dict:
+        """Representación para la API, con montos en unidades"""
+        hoy, mes = self.acumulados(periodos or periodos_actuales())
+        return {
+            "numero": self.numero,
+            "saldo": a_unidades(self.saldo),
+            "estado": self.estado,
+            "transferido_hoy": a_unidades(hoy),
+            "transferido_mes": a_unidades(mes)
+        }
+
+
+class Rechazo(str, Enum):
+    """Códigos estructurados de rechazo del motor"""
+    SALDO_INSUFICIENTE = "SALDO_INSUFICIENTE"
+    LIMITE_DIARIO = "LIMITE_DIARIO"
+    LIMITE_MENSUAL = "LIMITE_MENSUAL"
+    # Lote todo-o-nada: la operación no se aplicó porque otra del lote falló
+    LOTE_ABORTADO = "LOTE_ABORTADO"
+    # La cuenta dejó de existir (reemplazo o restauración) después de validarla
+    ORIGEN_INEXISTENTE = "ORIGEN_INEXISTENTE"
+    DESTINO_INEXISTENTE = "DESTINO_INEXISTENTE"
+
+
+class ResultadoTransferencia(NamedTuple):
+    rechazo: Optional[Rechazo]
+    # Saldo restante si fue aprobada; valor observado (saldo o acumulado) si fue rechazada
+    valor: Centavos
+
+    @property
+    def aprobada(self) -> bool:
+        return self.rechazo is None
+
+
+ABORTADA = ResultadoTransferencia(Rechazo.LOTE_ABORTADO, 0)
+SIN_ORIGEN = ResultadoTransferencia(Rechazo.ORIGEN_INEXISTENTE, 0)
+SIN_DESTINO = ResultadoTransferencia(Rechazo.DESTINO_INEXISTENTE, 0)
+
+# (origen, destino, monto)
+Operacion = Tuple["Cuenta", "Cuenta", Centavos]
+
+# numero_origen -> (límite diario, límite mensual)
+Limites = Callable[[str], Tuple[Centavos, Centavos]]
+
+
+def resultados_lote_abortado(resultados: List[ResultadoTransferencia], total: int) -> List[ResultadoTransferencia]:
+    """
+    Resultados de un lote todo-o-nada que falló en la última operación de
+    `resultados`: se conserva ese rechazo y todas las demás quedan abortadas.
+    """
+    fallida = len(resultados) - 1
+    return [ABORTADA] * fallida + [resultados[fallida]] + [ABORTADA] * (total - fallida - 1)
+
+
+def evaluar_limites(saldo: Centavos, hoy: Centavos, mes: Centavos, monto: Centavos,
+                    limite_diario: Centavos, limite_mensual: Centavos) -> Optional[ResultadoTransferencia]:
+    """Pasos 10-12 (saldo, límite diario, límite mensual); None si la transferencia procede"""
+    if saldo < monto:
+        return ResultadoTransferencia(Rechazo.SALDO_INSUFICIENTE, saldo)
+    if hoy + monto > limite_diario:
+        return ResultadoTransferencia(Rechazo.LIMITE_DIARIO, hoy)
+    if mes + monto > limite_mensual:
+        return ResultadoTransferencia(Rechazo.LIMITE_MENSUAL, mes)
+    return None
+
+
+class MotorTransferencias:
+    """
+    Valida y aplica transferencias en un único paso (validate-and-commit).
+
+    Las validaciones de saldo (paso 10), límite diario (11) y mensual (12) se
+    evalúan bajo los mismos locks que el débito/crédito, de modo que dos
+    transferencias concurrentes nunca pueden sobrepasar un límite.
+
+    Con `limites(numero_origen) -> (diario, mensual)` los límites dependen
+    de la cuenta origen (nivel de la cuenta) y se leen en cada operación.
+
+    Con `vigente(numero) -> Cuenta | None` las cuentas recibidas se vuelven a
+    buscar bajo los locks: si el almacén las eliminó o reemplazó después de
+    validarlas, se opera sobre el registro actual o se rechaza sin aplicar.
+    """
+
+    def __init__(self, bloqueos: GestorBloqueos, limite_diario: Centavos, limite_mensual: Centavos,
+                 periodos=periodos_actuales, limites: Optional[Limites] = None,
+                 vigente: Optional[Callable[[str], Optional[Cuenta]]] = None):
+        self.bloqueos = bloqueos
+        self.limite_diario = limite_diario
+        self.limite_mensual = limite_mensual
+        self.periodos = periodos
+        self.limites = limites
+        self.vigente = vigente
+
+    def validar_y_aplicar(self, origen: Cuenta, destino: Cuenta, monto: Centavos) -> ResultadoTransferencia:
+        periodos = self.periodos()
+        with self.bloqueos.adquirir(origen.numero, destino.numero):
+            return self._aplicar(origen, destino, monto, periodos)
+
+    def intentar_aplicar(self, origen: Cuenta, destino: Cuenta, monto: Centavos,
+                         desde: Optional[float] = None) -> Optional[ResultadoTransferencia]:
+        """
+        Como validar_y_aplicar, sin esperar locks: None si alguno está ocupado.
+        `desde` es el inicio del primer intento (ver GestorBloqueos.intentar).
+        """
+        periodos = self.periodos()
+        with self.bloqueos.intentar(origen.numero, destino.numero, desde=desde) as adquiridos:
+            return self._aplicar(origen, destino, monto, periodos) if adquiridos else None
+
+    def validar_y_aplicar_lote(self, operaciones: Sequence[Operacion],
+                               atomico: bool = False) -> List[ResultadoTransferencia]:
+        """
+        Aplica un lote tomando una sola vez los locks de todas sus cuentas.
+        Con `atomico`, la primera operación rechazada revierte las anteriores.
+        """
+        periodos = self.periodos()
+        numeros = {cuenta.numero for origen, destino, _ in operaciones for cuenta in (origen, destino)}
+        with self.bloqueos.adquirir(*numeros):
+            if not atomico:
+                return [self._aplicar(origen, destino, monto, periodos) for origen, destino, monto in operaciones]
+
+            respaldo = {}
+            resultados = []
+            for origen, destino, monto in operaciones:
+                for cuenta in (self._vigente(origen), self._vigente(destino)):
+                    if cuenta is not None and cuenta.numero not in respaldo:
+                        respaldo[cuenta.numero] = (cuenta, [getattr(cuenta, c) for c in self._CAMPOS_MUTABLES])
+                resultado = self._aplicar(origen, destino, monto, periodos)
+                resultados.append(resultado)
+                if not resultado.aprobada:
+                    for cuenta, valores in respaldo.values():
+                        for campo, valor in zip(self._CAMPOS_MUTABLES, valores):
+                            setattr(cuenta, campo, valor)
+                        # Versión nueva: los valores intermedios pudieron leerse
+                        cuenta.version += 1
+                    return resultados_lote_abortado(resultados, len(operaciones))
+            return resultados
+
+    _CAMPOS_MUTABLES = ("saldo", "transferido_hoy", "transferido_mes", "periodo_dia", "periodo_mes")
+
+    def _vigente(self, cuenta: Cuenta) -> Optional[Cuenta]:
+        # Requiere el lock de la cuenta
+        return self.vigente(cuenta.numero) if self.vigente is not None else cuenta
+
+    def _aplicar(self, origen: Cuenta, destino: Cuenta, monto: Centavos, periodos: Periodos) -> ResultadoTransferencia:
+        # Requiere los locks de origen y destino
+        origen, destino = self._vigente(origen), self._vigente(destino)
+        if origen is None:
+            return SIN_ORIGEN
+        if destino is None:
+            return SIN_DESTINO
+        saldo = origen.saldo
+        hoy, mes = origen.acumulados(periodos)
+        limite_diario, limite_mensual = (self.limites(origen.numero) if self.limites is not None
+                                         else (self.limite_diario, self.limite_mensual))
+        rechazo = evaluar_limites(saldo, hoy, mes, monto, limite_diario, limite_mensual)
+        if rechazo is not None:
+            return rechazo
+
+        origen.saldo = saldo - monto
+        origen.transferido_hoy = hoy + monto
+        origen.transferido_mes = mes + monto
+        origen.periodo_dia, origen.periodo_mes = periodos
+        destino.saldo += monto
+        origen.version += 1
+        destino.version += 1
+        return ResultadoTransferencia(None, origen.saldo)
@@ -0,0 +1,201 @@
+"""
+Desafíos OTP por transferencia
+Códigos de un solo uso con vencimiento, comparación en tiempo constante y
+bloqueo de la cuenta tras varios intentos fallidos
+"""
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from dinero import Centavos
+
+# (origen, destino, monto): un desafío vale solo para esa transferencia
+ClaveDesafio = Tuple[str, str, Centavos]
+
+
+class ReservaOTP(NamedTuple):
+    """Desafío retirado por `reservar`; `codigo` es None si se aceptó el código estático"""
+    clave: ClaveDesafio
+    codigo: Optional[bytes]
+    vence: float
+
+
+class OTPBloqueado(Exception):
+    """La cuenta superó los intentos fallidos; `restante` son los segundos de bloqueo que quedan"""
+
+    def __init__(self, cuenta: str, restante: float):
+        super().__init__(cuenta)
+        self.restante = restante
+
+
+class _Intentos:
+    __slots__ = ("fallos", "vence", "bloqueado_hasta")
+
+    def __init__(self, vence: float):
+        self.fallos = 0
+        self.vence = vence
+        self.bloqueado_hasta = 0.0
+
+
+class ServicioOTP:
+    """
+    Emite y verifica códigos OTP ligados a una transferencia.
+
+    - `emitir` genera un código aleatorio para (origen, destino, monto), que
+      vence a los `ttl_segundos`; emitir de nuevo para la misma transferencia
+      reemplaza el anterior. El código se entrega por otro canal (SMS/email).
+    - Con el TTL fijo, el orden de inserción del OrderedDict es el orden de
+      vencimiento: los vencidos se purgan desde el inicio, O(1) amortizado,
+      sin recorrer los desafíos vigentes. `max_desafios` es un tope duro: al
+      superarlo se descarta el que vence primero.
+    - Los códigos se comparan con `hmac.compare_digest`.
+    - `max_intentos` fallos de una cuenta dentro de `ventana_intentos`
+      segundos la bloquean por `bloqueo_segundos`: mientras tanto ningún
+      código se acepta ni se emiten desafíos nuevos. Un acierto reinicia
+      la cuenta de fallos.
+    - `reservar` retira el desafío al validar la transferencia (ninguna otra
+      puede usarlo mientras tanto) y `devolver` lo repone si el motor la
+      rechaza: el código se gasta solo con una transferencia aprobada.
+    - `estatico` es un código aceptado para cualquier transferencia, solo
+      para testing.
+    """
+
+    def __init__(self, ttl_segundos: float = 300, digitos: int = 6, max_intentos: int = 5,
+                 ventana_intentos: float = 900, bloqueo_segundos: float = 900, max_desafios: int = 1_000_000,
+                 max_cuentas: int = 1_000_000, estatico: Optional[str] = None, reloj=time.monotonic):
+        if digitos < 4:
+            raise ValueError("El OTP debe tener al menos 4 dígitos")
+        self.ttl = ttl_segundos
+        self.digitos = digitos
+        self.max_intentos = max_intentos
+        self.ventana_intentos = ventana_intentos
+        self.bloqueo_segundos = bloqueo_segundos
+        self.max_desafios = max_desafios
+        self.max_cuentas = max_cuentas
+        self._estatico = estatico.encode() if estatico else None
+        self._reloj = reloj
+        # clave -> (código, vence), en orden de vencimiento
+        self._desafios: "OrderedDict[ClaveDesafio, Tuple[bytes, float]]" = OrderedDict()
+        # cuenta -> intentos fallidos, en orden de último fallo (acotado a max_cuentas)
+        self._intentos: "OrderedDict[str, _Intentos]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Desafíos pendientes (incluye vencidos aún no purgados)"""
+        return len(self._desafios)
+
+    def emitir(self, origen: str, destino: str, monto: Centavos) -> str:
+        """Nuevo código para la transferencia; lanza OTPBloqueado si la cuenta está bloqueada"""
+        codigo = f"{secrets.randbelow(10 ** self.digitos):0{self.digitos}d}"
+        clave = (origen, destino, monto)
+        with self._lock:
+            ahora = self._reloj()
+            self._purgar_vencidos(ahora)
+            restante = self._bloqueo_restante(origen, ahora)
+            if restante > 0:
+                raise OTPBloqueado(origen, restante)
+            self._desafios[clave] = (codigo.encode(), ahora + self.ttl)
+            self._desafios.move_to_end(clave)
+            if len(self._desafios) > self.max_desafios:
+                self._desafios.popitem(last=False)
+        return codigo
+
+    def verificar(self, origen: str, destino: str, monto: Centavos, otp: Optional[str],
+                  consumir: bool = False) -> bool:
+        """
+        True si `otp` es el código vigente de la transferencia (o el estático).
+        Con `consumir`, el desafío se elimina en la misma operación: cada
+        código autoriza una sola transferencia. Sin código no cuenta como
+        intento fallido.
+        """
+        return self._validar(origen, destino, monto, otp, retirar=consumir) is not None
+
+    def reservar(self, origen: str, destino: str, monto: Centavos, otp: Optional[str]) -> Optional[ReservaOTP]:
+        """Como `verificar` con `consumir`, pero retorna el desafío retirado (None si no es válido)"""
+        return self._validar(origen, destino, monto, otp, retirar=True)
+
+    def devolver(self, reserva: Optional[ReservaOTP]):
+        """
+        Repone un desafío reservado (la transferencia no se aplicó), con su
+        vencimiento original. No hace nada si ya venció o si mientras tanto
+        se emitió otro para la misma transferencia.
+        """
+        if reserva is None or reserva.codigo is None:
+            return
+        with self._lock:
+            if reserva.vence > self._reloj() and reserva.clave not in self._desafios:
+                # Queda al final aunque venza antes que otros: se purga al pasar por él
+                self._desafios[reserva.clave] = (reserva.codigo, reserva.vence)
+                if len(self._desafios) > self.max_desafios:
+                    self._desafios.popitem(last=False)
+
+    def _validar(self, origen: str, destino: str, monto: Centavos, otp: Optional[str],
+                 retirar: bool) -> Optional[ReservaOTP]:
+        if not otp:
+            return None
+        ingresado = otp.encode()
+        clave = (origen, destino, monto)
+        with self._lock:
+            ahora = self._reloj()
+            self._purgar_vencidos(ahora)
+            if self._bloqueo_restante(origen, ahora) > 0:
+                return None
+            desafio = self._desafios.get(clave)
+            if desafio is not None and desafio[1] > ahora and hmac.compare_digest(desafio[0], ingresado):
+                if retirar:
+                    del self._desafios[clave]
+                self._intentos.pop(origen, None)
+                return ReservaOTP(clave, *desafio)
+            if self._estatico is not None and hmac.compare_digest(self._estatico, ingresado):
+                self._intentos.pop(origen, None)
+                return ReservaOTP(clave, None, float("inf"))
+            self._registrar_fallo(origen, ahora)
+            return None
+
+    def bloqueo_restante(self, cuenta: str) -> float:
+        """Segundos que le quedan de bloqueo a la cuenta (0 si no está bloqueada)"""
+        with self._lock:
+            return self._bloqueo_restante(cuenta, self._reloj())
+
+    def limpiar(self):
+        with self._lock:
+            self._desafios.clear()
+            self._intentos.clear()
+
+    def _bloqueo_restante(self, cuenta: str, ahora: float) -> float:
+        # Requiere self._lock
+        intentos = self._intentos.get(cuenta)
+        return max(0.0, intentos.bloqueado_hasta - ahora) if intentos is not None else 0.0
+
+    def _registrar_fallo(self, cuenta: str, ahora: float):
+        # Requiere self._lock
+        intentos = self._intentos.get(cuenta)
+        if intentos is None or intentos.vence <= ahora:
+            intentos = self._intentos[cuenta] = _Intentos(ahora + self.ventana_intentos)
+            if len(self._intentos) > self.max_cuentas:
+                self._intentos.popitem(last=False)
+        self._intentos.move_to_end(cuenta)
+        intentos.fallos += 1
+        if intentos.fallos >= self.max_intentos:
+            intentos.bloqueado_hasta = ahora + self.bloqueo_segundos
+            intentos.vence = max(intentos.vence, intentos.bloqueado_hasta)
+
+    def _purgar_vencidos(self, ahora: float):
+        # Requiere self._lock
+        desafios = self._desafios
+        while desafios:
+            clave, (_, vence) = next(iter(desafios.items()))
+            if vence > ahora:
+                break
+            del desafios[clave]
+        # Aproximado: un bloqueo alarga el vencimiento y puede quedar detrás de
+        # otros; se purga más tarde y al leerlo ya se ignora por vencido
+        intentos = self._intentos
+        while intentos:
+            cuenta, registro = next(iter(intentos.items()))
+            if registro.vence > ahora:
+                break
+            del intentos[cuenta]
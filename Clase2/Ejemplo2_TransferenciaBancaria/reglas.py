@@ -0,0 +1,289 @@
+"""
+Reglas de validación declarativas por nivel de cuenta
+Las reglas se compilan en una función con sus condiciones en orden (las más
+baratas y selectivas primero) y los límites de cada nivel se recargan en
+caliente desde un archivo JSON
+"""
+import ast
+import builtins
+import json
+import os
+import threading
+import time
+from datetime import time as hora
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Union
+
+from dinero import Centavos, a_centavos
+from reloj import VentanaMantenimiento, zona_horaria
+
+
+class Nivel(NamedTuple):
+    """Límites de un nivel de cuenta, en centavos"""
+    nombre: str
+    limite_diario: Centavos
+    limite_mensual: Centavos
+    monto_requiere_otp: Centavos
+
+
+class ConfiguracionReglas:
+    """
+    Valores vigentes de las reglas. Es inmutable: una recarga crea otra
+    instancia y reemplaza la referencia, así los lectores no toman locks.
+
+    `cuentas` asigna un nivel por número de cuenta; las demás usan
+    `nivel_por_defecto`. `ventanas` son las ventanas de mantenimiento.
+    """
+    __slots__ = ("niveles", "nivel_por_defecto", "cuentas", "ventanas")
+
+    def __init__(self, niveles: Dict[str, Nivel], nivel_por_defecto: str, cuentas: Dict[str, str],
+                 ventanas: Sequence[VentanaMantenimiento]):
+        if nivel_por_defecto not in niveles:
+            raise ValueError(f"Nivel por defecto desconocido: {nivel_por_defecto}")
+        desconocidos = set(cuentas.values()) - set(niveles)
+        if desconocidos:
+            raise ValueError(f"Niveles desconocidos: {', '.join(sorted(desconocidos))}")
+        self.niveles = niveles
+        self.nivel_por_defecto = nivel_por_defecto
+        self.cuentas = cuentas
+        # Tupla: RelojMantenimiento reconoce por identidad que no cambiaron
+        self.ventanas = tuple(ventanas)
+        for ventana in self.ventanas:
+            zona_horaria(ventana.zona)
+
+    def nivel(self, numero: str) -> Nivel:
+        return self.niveles[self.cuentas.get(numero, self.nivel_por_defecto)]
+
+    def combinar(self, datos: dict) -> "ConfiguracionReglas":
+        """
+        Nueva configuración con los valores de `datos` (montos en unidades)
+        sobre los actuales. Un nivel nuevo toma los límites que omita del
+        nivel por defecto. `mantenimiento` es una lista de ventanas que
+        reemplaza a las actuales, o un objeto que modifica la primera.
+        Lanza ValueError si los datos no son válidos.
+        """
+        if not isinstance(datos, dict):
+            raise ValueError("La configuración de reglas debe ser un objeto JSON")
+        base = self.niveles[self.nivel_por_defecto]
+        niveles = dict(self.niveles)
+        for nombre, valores in datos.get("niveles", {}).items():
+            anterior = niveles.get(nombre, base)
+            try:
+                niveles[nombre] = Nivel(nombre, *(
+                    a_centavos(valores[campo]) if campo in valores else getattr(anterior, campo)
+                    for campo in Nivel._fields[1:]
+                ))
+            except (TypeError, AttributeError):
+                raise ValueError(f"Nivel inválido: {nombre}") from None
+        mantenimiento = datos.get("mantenimiento")
+        if isinstance(mantenimiento, list):
+            ventanas = [_ventana(valores) for valores in mantenimiento]
+        elif mantenimiento is not None:
+            primera = self.ventanas[0] if self.ventanas else None
+            ventanas = [_ventana(mantenimiento, primera)] + list(self.ventanas[1:])
+        else:
+            ventanas = self.ventanas
+        return ConfiguracionReglas(
+            niveles,
+            datos.get("nivel_por_defecto", self.nivel_por_defecto),
+            dict(datos.get("cuentas", self.cuentas)),
+            ventanas
+        )
+
+
+def _ventana(valores: dict, anterior: Optional[VentanaMantenimiento] = None) -> VentanaMantenimiento:
+    """Ventana de la configuración JSON: {"inicio": "01:00", "fin": "03:00", "zona": "America/Santiago"}"""
+    try:
+        return VentanaMantenimiento(
+            hora.fromisoformat(valores["inicio"]) if "inicio" in valores or anterior is None else anterior.inicio,
+            hora.fromisoformat(valores["fin"]) if "fin" in valores or anterior is None else anterior.fin,
+            valores["zona"] if "zona" in valores else (anterior.zona if anterior is not None else None)
+        )
+    except (KeyError, TypeError, AttributeError):
+        raise ValueError(f"Ventana de mantenimiento inválida: {valores}") from None
+
+
+class FuenteConfiguracion:
+    """
+    Configuración de reglas recargable en caliente desde `archivo` (JSON).
+
+    `actual()` revisa la fecha de modificación del archivo a lo sumo una vez
+    cada `intervalo` segundos; entre revisiones cuesta una lectura del reloj.
+    Si el archivo cambió pero no es válido se conserva la configuración
+    anterior y el motivo queda en `error`. Al crearla, un archivo inválido
+    lanza ValueError (mejor no arrancar que arrancar con otros límites).
+    """
+
+    def __init__(self, base: ConfiguracionReglas, archivo: Optional[str] = None,
+                 intervalo: float = 1.0, reloj=time.monotonic):
+        self.base = base
+        self.archivo = archivo
+        self.intervalo = intervalo
+        self.error: Optional[str] = None
+        self.recargas = 0
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._modificado: Optional[int] = None
+        self._actual = base
+        self._proxima_revision = reloj() + intervalo
+        if archivo is not None:
+            self.recargar()
+
+    def actual(self) -> ConfiguracionReglas:
+        if self.archivo is not None and self._reloj() >= self._proxima_revision:
+            self._revisar()
+        return self._actual
+
+    def recargar(self) -> ConfiguracionReglas:
+        """Lee el archivo ahora; lanza ValueError si no es válido"""
+        with self._lock:
+            try:
+                modificado = os.stat(self.archivo).st_mtime_ns
+                with open(self.archivo, encoding="utf-8") as archivo:
+                    configuracion = self.base.combinar(json.load(archivo))
+            except (OSError, ValueError) as e:
+                raise ValueError(f"Configuración de reglas inválida ({self.archivo}): {e}") from e
+            self._actual = configuracion
+            self._modificado = modificado
+            self.error = None
+            self.recargas += 1
+            return configuracion
+
+    def _revisar(self):
+        if not self._lock.acquire(blocking=False):
+            return  # Otro thread ya está revisando
+        try:
+            self._proxima_revision = self._reloj() + self.intervalo
+            try:
+                modificado = os.stat(self.archivo).st_mtime_ns
+            except OSError as e:
+                self.error = str(e)
+                return
+            if modificado == self._modificado:
+                return
+        finally:
+            self._lock.release()
+        try:
+            self.recargar()
+        except ValueError as e:
+            self.error = str(e)
+            with self._lock:
+                self._modificado = modificado  # No reintentar hasta el próximo cambio
+
+
+# Variables que puede usar la condición de una regla. Las cuentas se buscan
+# con `obtener` justo antes de la primera regla que las usa: si una regla más
+# barata rechaza antes, no se consulta el almacén.
+VARIABLES = ("origen", "destino", "monto", "otp", "nivel")
+CUENTAS = {"cuenta_origen": "origen", "cuenta_destino": "destino"}
+
+
+class Regla(NamedTuple):
+    """
+    Una validación declarada como expresión de Python (`condicion`, True si
+    la solicitud se rechaza) sobre VARIABLES, las cuentas y las constantes
+    del conjunto. `detalle` es el mensaje, o una función que lo arma con las
+    mismas variables como argumentos por nombre; solo se evalúa al rechazar.
+    """
+    motivo: str
+    status_code: int
+    detalle: Union[str, Callable[..., str]]
+    condicion: str
+    # Costo relativo estimado de evaluar la condición (orden inicial)
+    costo: float = 1.0
+
+    def detalle_para(self, **variables) -> str:
+        return self.detalle if isinstance(self.detalle, str) else self.detalle(**variables)
+
+
+class ConjuntoReglas:
+    """
+    Reglas compiladas en una única función con una condición por regla en el
+    orden vigente, sin llamadas por regla: cuesta lo mismo que la cadena de
+    if escrita a mano. Las condiciones son código del repositorio, nunca
+    datos del archivo de configuración.
+
+    `validar(origen, destino, monto, otp, nivel, obtener)` es esa función:
+    retorna (regla, None, None) con la primera regla que la solicitud
+    incumple, o (None, cuenta_origen, cuenta_destino) si cumple todas.
+
+    - El orden inicial es el de menor costo declarado. Cada `reordenar_cada`
+      validaciones se recompila ordenando por probabilidad de rechazo
+      observada sobre costo: las reglas que más rechazan por unidad de costo
+      van primero y las solicitudes inválidas salen antes.
+    - Las reglas deben ser independientes entre sí, así el orden no cambia
+      qué se aprueba. Si una solicitud incumple varias reglas, se informa la
+      primera del orden vigente.
+    - Los contadores no toman locks: son una estimación y una actualización
+      perdida entre threads no afecta el resultado de ninguna validación.
+    """
+
+    def __init__(self, reglas: Sequence[Regla], constantes: Optional[Dict[str, object]] = None,
+                 reordenar_cada: int = 10_000):
+        if len({regla.motivo for regla in reglas}) != len(reglas):
+            raise ValueError("Los motivos de las reglas deben ser únicos")
+        self.reglas = tuple(reglas)
+        self.constantes = dict(constantes or {})
+        self.reordenar_cada = reordenar_cada
+        disponibles = set(VARIABLES) | set(CUENTAS) | set(self.constantes) | set(dir(builtins))
+        self._nombres = []
+        for regla in self.reglas:
+            nombres = {nodo.id for nodo in ast.walk(ast.parse(regla.condicion, mode="eval"))
+                       if isinstance(nodo, ast.Name)}
+            if nombres - disponibles:
+                raise ValueError(f"Regla {regla.motivo}: nombres desconocidos {sorted(nombres - disponibles)}")
+            self._nombres.append(nombres)
+        # Probabilidad de rechazo estimada por regla (promedio móvil entre reordenamientos)
+        self.probabilidades = [0.0] * len(self.reglas)
+        self._contadores = [0] * (len(self.reglas) + 1)
+        self._lock = threading.Lock()
+        self._compilar(sorted(range(len(self.reglas)), key=lambda i: self.reglas[i].costo))
+
+    @property
+    def orden(self) -> List[str]:
+        return [self.reglas[i].motivo for i in self._orden]
+
+    def _compilar(self, orden: List[int]):
+        # contadores[i]: rechazos de la regla i; contadores[-1]: validaciones
+        lineas = [f"def validar({', '.join(VARIABLES)}, obtener):", "    contadores[-1] += 1"]
+        if self.reordenar_cada:
+            lineas.append(f"    if contadores[-1] >= {self.reordenar_cada}:")
+            lineas.append("        reordenar()")
+        buscadas = set()
+        for i in orden:
+            for cuenta, numero in CUENTAS.items():
+                if cuenta in self._nombres[i] and cuenta not in buscadas:
+                    lineas.append(f"    {cuenta} = obtener({numero})")
+                    buscadas.add(cuenta)
+            lineas.append(f"    if {self.reglas[i].condicion}:")
+            lineas.append(f"        contadores[{i}] += 1")
+            lineas.append(f"        return reglas[{i}], None, None")
+        for cuenta, numero in CUENTAS.items():
+            if cuenta not in buscadas:
+                lineas.append(f"    {cuenta} = obtener({numero})")
+        lineas.append(f"    return None, {', '.join(CUENTAS)}")
+        espacio = dict(self.constantes, contadores=self._contadores, reglas=self.reglas, reordenar=self.reordenar)
+        exec(compile("\n".join(lineas), "<reglas>", "exec"), espacio)
+        self._orden = tuple(orden)
+        self.validar = espacio["validar"]
+
+    def reordenar(self):
+        """Actualiza las probabilidades con lo observado desde el último reordenamiento y recompila"""
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            *rechazos, validaciones = self._contadores
+            self._contadores[:] = [0] * len(self._contadores)
+            # Con el orden fijo entre reordenamientos, una regla se evaluó en
+            # las validaciones que no rechazó ninguna anterior
+            evaluadas = validaciones
+            for i in self._orden:
+                if evaluadas <= 0:
+                    break
+                self.probabilidades[i] = (self.probabilidades[i] + rechazos[i] / evaluadas) / 2
+                evaluadas -= rechazos[i]
+            orden = sorted(range(len(self.reglas)),
+                           key=lambda i: (-self.probabilidades[i] / self.reglas[i].costo, self.reglas[i].costo))
+            if tuple(orden) != self._orden:
+                self._compilar(orden)
+        finally:
+            self._lock.release()
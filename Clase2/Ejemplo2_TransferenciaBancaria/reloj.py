@@ -0,0 +1,133 @@
+"""
+Reloj para el camino caliente de las solicitudes
+Ventanas de mantenimiento evaluadas contra un reloj monotónico y fechas ISO
+con la parte hasta los segundos cacheada
+"""
+import math
+import time
+from datetime import datetime, time as hora, timedelta, tzinfo
+from typing import Iterator, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python 3.8
+    try:
+        from backports.zoneinfo import ZoneInfo
+    except ImportError:
+        ZoneInfo = None
+
+
+class VentanaMantenimiento(NamedTuple):
+    """
+    Intervalo diario [inicio, fin) en la hora local de `zona` (nombre IANA,
+    o la del sistema si es None). Si fin < inicio cruza la medianoche; si
+    son iguales la ventana está vacía.
+    """
+    inicio: hora
+    fin: hora
+    zona: Optional[str] = None
+
+
+def zona_horaria(nombre: Optional[str]) -> Optional[tzinfo]:
+    """tzinfo de una zona IANA (None: hora local); lanza ValueError si no existe"""
+    if nombre is None:
+        return None
+    if ZoneInfo is None:
+        raise ValueError("Las zonas horarias requieren Python 3.9+ o backports.zoneinfo")
+    try:
+        return ZoneInfo(nombre)
+    except (KeyError, ValueError):
+        # ZoneInfoNotFoundError es un KeyError
+        raise ValueError(f"Zona horaria desconocida: {nombre}") from None
+
+
+def _intervalos(ventana: VentanaMantenimiento, ahora: float) -> Iterator[Tuple[float, float]]:
+    """Ocurrencias de la ventana (epoch) de ayer, hoy y mañana en su zona"""
+    if ventana.inicio == ventana.fin:
+        return
+    zona = zona_horaria(ventana.zona)
+    hoy = datetime.fromtimestamp(ahora, zona).date()
+    for dias in (-1, 0, 1):
+        dia = hoy + timedelta(days=dias)
+        dia_fin = dia + timedelta(days=1) if ventana.fin < ventana.inicio else dia
+        # Sin zona, timestamp() interpreta la fecha en hora local
+        yield (datetime.combine(dia, ventana.inicio, tzinfo=zona).timestamp(),
+               datetime.combine(dia_fin, ventana.fin, tzinfo=zona).timestamp())
+
+
+class RelojMantenimiento:
+    """
+    Indica si ahora cae en alguna ventana de mantenimiento sin construir
+    fechas por solicitud.
+
+    Al consultar por primera vez un conjunto de ventanas se calcula el estado
+    y el instante de la próxima transición (inicio o fin de alguna ventana),
+    que se traduce a reloj monotónico: hasta ese instante cada consulta
+    compara dos enteros. Se recalcula también si cambian las ventanas (otra
+    tupla, por ejemplo tras recargar la configuración) y al menos cada
+    `resincronizar` segundos, por si se ajusta la hora del sistema.
+    """
+
+    def __init__(self, resincronizar: float = 60.0, reloj=time.time, monotonico=time.monotonic_ns):
+        self.resincronizar = resincronizar
+        self._reloj = reloj
+        self._monotonico = monotonico
+        # (ventanas, vence en ns monotónicos, ventana activa o None); se reemplaza entera
+        self._estado: tuple = (None, 0, None)
+
+    def en_mantenimiento(self, ventanas: Sequence[VentanaMantenimiento]) -> bool:
+        estado = self._estado
+        if estado[0] is not ventanas or self._monotonico() >= estado[1]:
+            estado = self._recalcular(ventanas)
+        return estado[2] is not None
+
+    def ventana_activa(self, ventanas: Sequence[VentanaMantenimiento]) -> Optional[VentanaMantenimiento]:
+        estado = self._estado
+        if estado[0] is not ventanas or self._monotonico() >= estado[1]:
+            estado = self._recalcular(ventanas)
+        return estado[2]
+
+    def _recalcular(self, ventanas: Sequence[VentanaMantenimiento]) -> tuple:
+        ahora = self._reloj()
+        base = self._monotonico()
+        activa = None
+        proxima = ahora + self.resincronizar
+        for ventana in ventanas:
+            for inicio, fin in _intervalos(ventana, ahora):
+                if activa is None and inicio <= ahora < fin:
+                    activa = ventana
+                for borde in (inicio, fin):
+                    if ahora < borde < proxima:
+                        proxima = borde
+        estado = (ventanas, base + math.ceil((proxima - ahora) * 1e9), activa)
+        self._estado = estado
+        return estado
+
+
+# (segundo epoch, isoformat de ese segundo); una tupla para reemplazarla de una vez
+_ultimo_segundo: Tuple[int, str] = (0, datetime.fromtimestamp(0).isoformat())
+
+
+def formatear_fecha(ts: float) -> str:
+    """
+    Igual a datetime.fromtimestamp(ts).isoformat() (hora local). La parte
+    hasta los segundos se reutiliza mientras no cambie el segundo: las
+    fechas consecutivas del historial suelen compartirlo.
+    """
+    global _ultimo_segundo
+    segundo = int(ts)
+    # Mismo redondeo a microsegundos (half-even) que datetime.fromtimestamp
+    us = round((ts - segundo) * 1e6)
+    if not 0 < us < 1_000_000:
+        # Segundo exacto, acarreo al segundo siguiente o fecha anterior a 1970
+        return datetime.fromtimestamp(ts).isoformat()
+    cache = _ultimo_segundo
+    if cache[0] != segundo:
+        cache = (segundo, datetime.fromtimestamp(segundo).isoformat())
+        _ultimo_segundo = cache
+    return f"{cache[1]}.{us:06d}"
+
+
+def ahora_iso() -> str:
+    """Fecha y hora local actual en ISO 8601 (como datetime.now().isoformat())"""
+    return formatear_fecha(time.time())
@@ -0,0 +1,35 @@
+"""
+Serialización JSON rápida para las respuestas de la API
+Usa orjson si está instalado y json de la biblioteca estándar si no; en ambos
+casos el resultado es UTF-8 compacto
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps_estandar(datos: Any) -> bytes:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+# Solo tipos nativos (dict, list, str, int, float, bool, None): quien llama
+# arma los datos ya listos para JSON
+dumps = orjson.dumps if orjson is not None else _dumps_estandar
+
+
+class RespuestaJSON(JSONResponse):
+    """
+    JSONResponse que serializa con `dumps`. Un endpoint que la retorna evita
+    el paso de FastAPI por `response_model` (validar de nuevo el modelo y
+    convertirlo con jsonable_encoder): el `response_model` queda solo para la
+    documentación OpenAPI.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
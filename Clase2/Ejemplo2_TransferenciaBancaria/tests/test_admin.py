@@ -0,0 +1,44 @@
+"""
+Los endpoints de administración (sembrar cuentas, instantáneas) solo existen
+con ADMIN_HABILITADO=1. Se prueba la app en un proceso aparte, con la
+configuración por defecto, sin depender del servidor bajo prueba.
+"""
+import json
+import os
+import subprocess
+import sys
+
+DIRECTORIO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SCRIPT = """
+import json
+from fastapi.testclient import TestClient
+import main
+
+cliente = TestClient(main.app)
+autorizado = {"Authorization": "Bearer admin"}
+rutas = ["/api/admin/cuentas/sembrar", "/api/admin/instantaneas/prueba", "/api/admin/instantaneas/prueba/restaurar"]
+semilla = {"cuentas": [{"numero": "55555556", "saldo": 1000}]}
+codigos = {ruta: cliente.post(ruta, json=semilla, headers=autorizado).status_code for ruta in rutas}
+existe = cliente.get("/api/cuentas/55555556").status_code
+main.ADMIN_HABILITADO = True
+habilitado = cliente.post(rutas[0], json=semilla, headers=autorizado).status_code
+sin_token = cliente.post(rutas[0], json=semilla).status_code
+print(json.dumps({"codigos": codigos, "existe": existe, "habilitado": habilitado, "sin_token": sin_token}))
+"""
+
+
+def test_admin_deshabilitado_por_defecto(tmp_path):
+    entorno = {clave: valor for clave, valor in os.environ.items()
+               if clave not in ("ADMIN_HABILITADO", "AUTH_SECRETO", "LIBRO_MAYOR")}
+    entorno.update(ALMACEN_CUENTAS="memoria", INSTANTANEAS_DIR=str(tmp_path))
+    proceso = subprocess.run([sys.executable, "-c", _SCRIPT], cwd=DIRECTORIO, env=entorno,
+                             capture_output=True, text=True, timeout=60)
+    assert proceso.returncode == 0, proceso.stderr
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    # Con la configuración por defecto no existen, aunque venga Authorization
+    assert set(resultado["codigos"].values()) == {404}
+    assert resultado["existe"] == 404
+    assert resultado["habilitado"] == 200
+    assert resultado["sin_token"] == 401
@@ -0,0 +1,179 @@
+import threading
+
+import pytest
+
+from almacenamiento import AlmacenMemoria, AlmacenSQLite
+from bloqueos import GestorBloqueos
+from motor_transferencias import Cuenta, Rechazo
+
+
+PERIODOS = [(738000, 24300)]
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def almacen(request, tmp_path):
+    PERIODOS[:] = [(738000, 24300)]
+    periodos = lambda: PERIODOS[0]  # noqa: E731
+    if request.param == "memoria":
+        almacen = AlmacenMemoria(GestorBloqueos(), 50000, 5000000, periodos)
+    else:
+        almacen = AlmacenSQLite(str(tmp_path / "cuentas.db"), 50000, 5000000, periodos=periodos)
+    almacen.sembrar([
+        Cuenta("12345678", saldo=100000),
+        Cuenta("87654321", saldo=50000),
+        Cuenta("99999999", saldo=10000, estado="BLOQUEADA"),
+    ])
+    yield almacen
+    almacen.cerrar()
+
+
+def test_obtener_y_sembrar_no_sobrescribe(almacen):
+    almacen.sembrar([Cuenta("12345678", saldo=1)])
+    assert len(almacen) == 3
+    assert almacen.obtener("12345678").saldo == 100000
+    assert almacen.obtener("99999999").estado == "BLOQUEADA"
+    assert almacen.obtener("00000000") is None
+
+
+def test_transferir_y_rechazar(almacen):
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+    resultado = almacen.transferir(origen, destino, 1000)
+    assert resultado.aprobada and resultado.valor == 99000
+    assert almacen.obtener("87654321").saldo == 51000
+    assert almacen.obtener("12345678").transferido_hoy == 1000
+
+    resultado = almacen.transferir(origen, destino, 49500)
+    assert resultado.rechazo is Rechazo.LIMITE_DIARIO
+    assert almacen.obtener("12345678").saldo == 99000
+
+
+def test_resetear(almacen):
+    almacen.transferir(almacen.obtener("12345678"), almacen.obtener("87654321"), 500)
+    cuenta = almacen.resetear("12345678", saldo=100000)
+    assert (cuenta.saldo, cuenta.transferido_hoy, cuenta.transferido_mes) == (100000, 0, 0)
+    assert almacen.resetear("00000000", saldo=1) is None
+
+
+def test_limite_diario_bajo_concurrencia(almacen):
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+
+    def worker():
+        for _ in range(50):
+            almacen.transferir(origen, destino, 300)
+
+    hilos = [threading.Thread(target=worker) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    cuenta = almacen.obtener("12345678")
+    assert cuenta.transferido_hoy <= 50000
+    assert cuenta.saldo + almacen.obtener("87654321").saldo == 150000
+
+
+def test_intentar_transferir(almacen):
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+    resultado = almacen.intentar_transferir(origen, destino, 1000)
+    if almacen.bloqueante:
+        # SQLite siempre hace I/O: nunca aplica sin esperar
+        assert resultado is None and almacen.obtener("12345678").saldo == 100000
+    else:
+        assert resultado.aprobada and almacen.obtener("12345678").saldo == 99000
+
+
+def test_sqlite_es_durable(tmp_path):
+    ruta = str(tmp_path / "cuentas.db")
+    almacen = AlmacenSQLite(ruta, 50000, 5000000)
+    almacen.sembrar([Cuenta("12345678", saldo=100), Cuenta("87654321", saldo=0)])
+    almacen.transferir(almacen.obtener("12345678"), almacen.obtener("87654321"), 40)
+    almacen.cerrar()
+
+    reabierto = AlmacenSQLite(ruta, 50000, 5000000)
+    assert reabierto.obtener("87654321").saldo == 40
+    reabierto.cerrar()
+
+
+def test_transferir_lote(almacen):
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+    operaciones = [(origen, destino, 30000), (origen, destino, 30000)]
+
+    resultados = almacen.transferir_lote(operaciones, atomico=True)
+    assert [r.rechazo for r in resultados] == [Rechazo.LOTE_ABORTADO, Rechazo.LIMITE_DIARIO]
+    assert almacen.obtener("12345678").saldo == 100000
+
+    resultados = almacen.transferir_lote(operaciones, atomico=False)
+    assert [r.aprobada for r in resultados] == [True, False]
+    assert almacen.obtener("87654321").saldo == 80000
+
+
+def test_cuentas_eliminadas_despues_de_validarlas(almacen):
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+    # El destino desaparece (restauración) con la transferencia ya validada: no se debita
+    almacen.reemplazar([Cuenta("12345678", saldo=100000)])
+    assert almacen.transferir(origen, destino, 1000).rechazo is Rechazo.DESTINO_INEXISTENTE
+    resultados = almacen.transferir_lote([(origen, destino, 10), (origen, destino, 20)], atomico=True)
+    assert [r.rechazo for r in resultados] == [Rechazo.DESTINO_INEXISTENTE, Rechazo.LOTE_ABORTADO]
+    assert almacen.obtener("12345678").saldo == 100000
+
+    almacen.reemplazar([Cuenta("87654321", saldo=0)])
+    assert almacen.transferir(origen, destino, 1000).rechazo is Rechazo.ORIGEN_INEXISTENTE
+    assert almacen.obtener("87654321").saldo == 0 and len(almacen) == 1
+
+    # Vuelve a existir: se opera sobre el registro actual, no sobre el leído antes
+    almacen.reemplazar([Cuenta("12345678", saldo=500), Cuenta("87654321", saldo=0)])
+    assert almacen.transferir(origen, destino, 200).valor == 300
+    assert almacen.obtener("87654321").saldo == 200
+
+
+def test_acumulados_se_renuevan_al_cambiar_de_dia(almacen):
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+    assert almacen.transferir(origen, destino, 50000).aprobada
+    assert almacen.transferir(origen, destino, 1).rechazo is Rechazo.LIMITE_DIARIO
+
+    PERIODOS[0] = (738001, 24300)
+    assert almacen.obtener("12345678").como_dict(PERIODOS[0])["transferido_hoy"] == 0
+    assert almacen.transferir(origen, destino, 20000).aprobada
+    cuenta = almacen.obtener("12345678")
+    assert (cuenta.transferido_hoy, cuenta.transferido_mes) == (20000, 70000)
+
+
+def test_version_aumenta_con_cada_cambio(almacen):
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+    versiones = (origen.version, destino.version)
+    almacen.transferir(origen, destino, 100)
+    assert almacen.obtener("12345678").version > versiones[0]
+    assert almacen.obtener("87654321").version > versiones[1]
+
+    version = almacen.obtener("12345678").version
+    almacen.transferir(origen, destino, 10**9)  # rechazada: no cambia
+    assert almacen.obtener("12345678").version == version
+    almacen.resetear("12345678", saldo=100000)
+    assert almacen.obtener("12345678").version > version
+
+
+def test_obtener_varias(almacen):
+    cuentas = almacen.obtener_varias(["12345678", "00000000", "99999999"])
+    assert sorted(cuentas) == ["12345678", "99999999"]
+    assert cuentas["99999999"].estado == "BLOQUEADA"
+
+
+@pytest.mark.parametrize("tipo", ["memoria", "sqlite"])
+def test_limites_por_cuenta_origen(tipo, tmp_path):
+    limites = {"12345678": (500, 5000000)}
+
+    def por_cuenta(numero):
+        return limites.get(numero, (50000, 5000000))
+
+    if tipo == "memoria":
+        almacen = AlmacenMemoria(GestorBloqueos(), 50000, 5000000, lambda: PERIODOS[0], limites=por_cuenta)
+    else:
+        almacen = AlmacenSQLite(str(tmp_path / "cuentas.db"), 50000, 5000000,
+                                periodos=lambda: PERIODOS[0], limites=por_cuenta)
+    almacen.sembrar([Cuenta("12345678", saldo=100000), Cuenta("87654321", saldo=100000)])
+    a, b = almacen.obtener("12345678"), almacen.obtener("87654321")
+    assert almacen.transferir(a, b, 1000).rechazo is Rechazo.LIMITE_DIARIO
+    assert almacen.transferir(b, a, 1000).aprobada
+    # Los límites se leen en cada operación: un cambio aplica de inmediato
+    limites["12345678"] = (5000, 5000000)
+    assert almacen.transferir(almacen.obtener("12345678"), b, 1000).aprobada
+    almacen.cerrar()
@@ -0,0 +1,75 @@
+import pytest
+
+import autenticacion
+from autenticacion import TokenInvalido, VerificadorTokens, firmar, verificar_firma
+
+SECRETO = "secreto-de-prueba"
+
+
+class RelojFalso:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def test_verificar_firma_y_vigencia():
+    token = firmar({"sub": "cliente-1", "exp": 2000}, SECRETO)
+    assert verificar_firma(token, SECRETO.encode(), 1000.0) == {"sub": "cliente-1", "exp": 2000}
+    encabezado, cuerpo, firma = token.split(".")
+    adulterado = firmar({"sub": "cliente-2", "exp": 2000}, SECRETO).split(".")[1]
+    for invalido in (token + "x", f"{encabezado}.{adulterado}.{firma}", "a.b", "a.b.c!", firmar({}, "otro")):
+        with pytest.raises(TokenInvalido):
+            verificar_firma(invalido, SECRETO.encode(), 1000.0)
+    with pytest.raises(TokenInvalido, match="vencido"):
+        verificar_firma(token, SECRETO.encode(), 2000.0)
+    with pytest.raises(TokenInvalido) as e:
+        verificar_firma(firmar({"nbf": 1500}, SECRETO), SECRETO.encode(), 1000.0)
+    assert not e.value.cacheable
+
+
+def test_cache_de_validos_hasta_su_vencimiento(monkeypatch):
+    reloj = RelojFalso()
+    observados = []
+    verificador = VerificadorTokens(SECRETO, ttl_maximo=300, observar=lambda *r: observados.append(r), reloj=reloj)
+    llamadas = []
+    original = autenticacion.verificar_firma
+    monkeypatch.setattr(autenticacion, "verificar_firma", lambda *a: llamadas.append(a) or original(*a))
+
+    token = firmar({"sub": "cliente-1", "exp": 1100}, SECRETO)
+    for _ in range(3):
+        assert verificador.verificar(token)["sub"] == "cliente-1"
+    assert len(llamadas) == 1
+    assert observados == [("fallo", "valido"), ("acierto", "valido"), ("acierto", "valido")]
+    # Vence con el token (antes que ttl_maximo), sin servir un token vencido desde la cache
+    reloj.t = 1100.0
+    with pytest.raises(TokenInvalido):
+        verificador.verificar(token)
+    assert len(llamadas) == 2
+
+
+def test_cache_negativa_y_lru_separadas():
+    reloj = RelojFalso()
+    observados = []
+    verificador = VerificadorTokens(SECRETO, max_entradas=2, ttl_negativo=60,
+                                    observar=lambda *r: observados.append(r), reloj=reloj)
+    valido = firmar({"sub": "cliente-1"}, SECRETO)
+    verificador.verificar(valido)
+    for i in range(5):
+        with pytest.raises(TokenInvalido):
+            verificador.verificar(firmar({"sub": i}, "otro"))
+    # Los inválidos no desplazan al válido
+    assert len(verificador) == 3
+    verificador.verificar(valido)
+    assert observados[-1] == ("acierto", "valido")
+    invalido = firmar({"sub": 4}, "otro")
+    with pytest.raises(TokenInvalido, match="firma"):
+        verificador.verificar(invalido)
+    assert observados[-1] == ("acierto", "invalido")
+    reloj.t += 61
+    with pytest.raises(TokenInvalido):
+        verificador.verificar(invalido)
+    assert observados[-1] == ("fallo", "invalido")
+    with pytest.raises(ValueError):
+        VerificadorTokens("")
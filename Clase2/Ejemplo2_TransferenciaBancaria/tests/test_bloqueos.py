@@ -0,0 +1,95 @@
+import threading
+import time
+
+from bloqueos import GestorBloqueos
+
+
+def test_particion_estable():
+    gestor = GestorBloqueos(particiones=64)
+    assert gestor.particion("12345678") == gestor.particion("12345678")
+    assert 0 <= gestor.particion("87654321") < 64
+
+
+def test_cuentas_disjuntas_no_se_bloquean():
+    gestor = GestorBloqueos(particiones=1024)
+    a, b = "00000001", "00000002"
+    c, d = "00000003", "00000004"
+    assert not {gestor.particion(a), gestor.particion(b)} & {gestor.particion(c), gestor.particion(d)}
+    adquirido = threading.Event()
+
+    def otro_par():
+        with gestor.adquirir(c, d):
+            adquirido.set()
+
+    with gestor.adquirir(a, b):
+        t = threading.Thread(target=otro_par)
+        t.start()
+        assert adquirido.wait(timeout=2), "Un par disjunto quedó bloqueado"
+        t.join()
+
+
+def test_orden_inverso_sin_deadlock():
+    gestor = GestorBloqueos(particiones=16)
+    contador = {"n": 0}
+
+    def worker(origen, destino):
+        for _ in range(2000):
+            with gestor.adquirir(origen, destino):
+                contador["n"] += 1
+
+    t1 = threading.Thread(target=worker, args=("12345678", "87654321"))
+    t2 = threading.Thread(target=worker, args=("87654321", "12345678"))
+    t1.start()
+    t2.start()
+    t1.join(timeout=10)
+    t2.join(timeout=10)
+    assert not t1.is_alive() and not t2.is_alive(), "Deadlock detectado"
+    assert contador["n"] == 4000
+
+
+def test_misma_particion_no_se_adquiere_dos_veces():
+    gestor = GestorBloqueos(particiones=1)
+    with gestor.adquirir("12345678", "87654321"):
+        pass
+
+
+def test_intentar_no_espera_ni_retiene_locks():
+    gestor = GestorBloqueos(particiones=1024)
+    a, b = "00000001", "00000002"
+    with gestor.intentar(a, b) as adquiridos:
+        assert adquiridos
+
+    retenido, liberar = threading.Event(), threading.Event()
+
+    def retener():
+        with gestor.adquirir(b):
+            retenido.set()
+            liberar.wait(timeout=5)
+
+    t = threading.Thread(target=retener)
+    t.start()
+    retenido.wait(timeout=2)
+    with gestor.intentar(a, b) as adquiridos:
+        assert not adquiridos
+    # El lock de `a` se liberó al fallar el intento
+    with gestor.intentar(a) as adquiridos:
+        assert adquiridos
+    liberar.set()
+    t.join()
+    with gestor.intentar(a, b) as adquiridos:
+        assert adquiridos
+
+
+def test_intentar_observa_la_espera_desde_el_primer_intento():
+    esperas = []
+    gestor = GestorBloqueos(particiones=16, observar_espera=esperas.append)
+    with gestor.adquirir("00000001"):
+        esperas.clear()
+        with gestor.intentar("00000001", desde=time.perf_counter()) as adquiridos:
+            assert not adquiridos
+        # Un intento fallido no observa nada; el que adquiere cubre todos los intentos
+        assert esperas == []
+    desde = time.perf_counter() - 0.5
+    with gestor.intentar("00000001", desde=desde) as adquiridos:
+        assert adquiridos
+    assert len(esperas) == 1 and esperas[0] >= 0.5
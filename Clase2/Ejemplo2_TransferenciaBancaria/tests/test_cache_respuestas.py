@@ -0,0 +1,20 @@
+from cache_respuestas import CacheRespuestas
+
+
+def test_entrada_valida_solo_con_el_mismo_etag():
+    cache = CacheRespuestas()
+    cache.guardar("12345678", '"1-738000"', b'{"saldo":1}')
+    assert cache.obtener("12345678", '"1-738000"') == b'{"saldo":1}'
+    assert cache.obtener("12345678", '"2-738000"') is None
+    assert (cache.aciertos, cache.fallos) == (1, 1)
+
+
+def test_lru_acotada():
+    cache = CacheRespuestas(max_entradas=2)
+    cache.guardar("a", "1", b"a")
+    cache.guardar("b", "1", b"b")
+    cache.obtener("a", "1")  # "b" pasa a ser la menos usada
+    cache.guardar("c", "1", b"c")
+    assert len(cache) == 2
+    assert cache.obtener("b", "1") is None
+    assert cache.obtener("a", "1") == b"a"
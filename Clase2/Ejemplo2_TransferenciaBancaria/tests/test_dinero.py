@@ -0,0 +1,54 @@
+import random
+from decimal import Decimal
+
+import pytest
+
+from bloqueos import GestorBloqueos
+from dinero import a_centavos, a_unidades, formatear
+from motor_transferencias import Cuenta, MotorTransferencias
+
+
+def test_a_centavos_es_exacto():
+    assert a_centavos(0.1) == 10
+    assert a_centavos(0.29) == 29  # 0.29 * 100 en float da 28.999999999999996
+    assert a_centavos(1000.5) == 100050
+    assert a_centavos("12.30") == 1230
+    assert a_centavos(50000) == 5000000
+    assert a_centavos(Decimal("0.07")) == 7
+
+
+@pytest.mark.parametrize("valor", [0.001, 10.005, "1.234", float("nan"), float("inf"), "abc", True])
+def test_a_centavos_rechaza(valor):
+    with pytest.raises(ValueError):
+        a_centavos(valor)
+
+
+def test_unidades_y_formato():
+    assert a_unidades(10) == 0.1
+    assert a_unidades(9999999) == 99999.99
+    assert formatear(123456789) == "1,234,567.89"
+    assert formatear(5) == "0.05"
+    assert formatear(-150) == "-1.50"
+
+
+def test_sin_deriva_tras_un_millon_de_transferencias():
+    rng = random.Random(20240501)
+    cuentas = [Cuenta(f"{i:08d}", saldo=a_centavos("1000000.00")) for i in range(16)]
+    total_inicial = sum(c.saldo for c in cuentas)
+    referencia = [Decimal("1000000.00")] * len(cuentas)
+    debitado = [Decimal(0)] * len(cuentas)
+    motor = MotorTransferencias(GestorBloqueos(), 10**15, 10**15, periodos=lambda: (1, 1))
+
+    for _ in range(10**6):
+        o = rng.randrange(len(cuentas))
+        d = (o + rng.randrange(1, len(cuentas))) % len(cuentas)
+        centavos = rng.randrange(1, 100_000)
+        if motor.validar_y_aplicar(cuentas[o], cuentas[d], centavos).aprobada:
+            monto = Decimal(centavos).scaleb(-2)
+            referencia[o] -= monto
+            referencia[d] += monto
+            debitado[o] += monto
+
+    assert sum(c.saldo for c in cuentas) == total_inicial
+    assert [formatear(c.saldo) for c in cuentas] == [f"{r:,.2f}" for r in referencia]
+    assert [formatear(c.transferido_hoy) for c in cuentas] == [f"{r:,.2f}" for r in debitado]
@@ -0,0 +1,65 @@
+import asyncio
+import threading
+
+import pytest
+
+from eventos import BusEventos, LimiteSuscriptores
+
+
+def test_fan_out_solo_a_la_cuenta_suscrita():
+    async def escenario():
+        bus = BusEventos()
+        a1, a2, b = bus.suscribir("A"), bus.suscribir("A"), bus.suscribir("B")
+        bus.publicar("A", 1)
+        bus.publicar("C", 2)  # sin suscriptores
+        return await a1.siguiente(), await a2.siguiente(), b.cola.qsize()
+
+    assert asyncio.run(escenario()) == (1, 1, 0)
+
+
+def test_consumidor_lento_descartado():
+    async def escenario():
+        bus = BusEventos(max_cola=3)
+        lenta = bus.suscribir("A")
+        for evento in range(5):
+            bus.publicar("A", evento)
+        await asyncio.sleep(0)  # deja correr las entregas agendadas
+        return await lenta.siguiente(), lenta.descartada, bus.descartadas, len(bus)
+
+    assert asyncio.run(escenario()) == (None, True, 1, 0)
+
+
+def test_cancelar_deja_de_entregar():
+    async def escenario():
+        bus = BusEventos()
+        suscripcion = bus.suscribir("A")
+        bus.cancelar(suscripcion)
+        bus.cancelar(suscripcion)  # idempotente
+        bus.publicar("A", 1)
+        await asyncio.sleep(0)
+        return suscripcion.cola.qsize(), len(bus)
+
+    assert asyncio.run(escenario()) == (0, 0)
+
+
+def test_limite_de_suscriptores():
+    async def escenario():
+        bus = BusEventos(max_suscriptores=1)
+        bus.suscribir("A")
+        with pytest.raises(LimiteSuscriptores):
+            bus.suscribir("B")
+
+    asyncio.run(escenario())
+
+
+def test_publicar_desde_otro_thread():
+    async def escenario():
+        bus = BusEventos()
+        suscripcion = bus.suscribir("A")
+        hilo = threading.Thread(target=lambda: [bus.publicar("A", i) for i in range(10)])
+        hilo.start()
+        recibidos = [await asyncio.wait_for(suscripcion.siguiente(), 5) for _ in range(10)]
+        hilo.join()
+        return recibidos
+
+    assert asyncio.run(escenario()) == list(range(10))
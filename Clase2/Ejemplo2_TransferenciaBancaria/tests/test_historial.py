@@ -0,0 +1,92 @@
+import json
+
+from historial import HistorialTransferencias
+
+
+def _historial(**kwargs):
+    h = HistorialTransferencias(**kwargs)
+    for i in range(10):
+        h.registrar("12345678" if i % 2 == 0 else "87654321", "87654322", 100 + i)
+    return h
+
+
+def test_ids_monotonicos():
+    h = _historial()
+    assert [r.id for r in h.consultar()] == list(range(1, 11))
+
+
+def test_cursor_y_filtro_por_origen():
+    h = _historial()
+    ids = [r.id for r in h.consultar(cursor=4, origen="12345678")]
+    assert ids == [5, 7, 9]
+
+
+def test_filtro_por_destino_y_status():
+    h = _historial()
+    h.registrar("12345678", "99999999", 5, status="REJECTED")
+    assert [r.id for r in h.consultar(destino="99999999")] == [11]
+    assert list(h.consultar(destino="99999999", status="COMPLETED")) == []
+
+
+def test_filtro_por_rango_de_fechas():
+    h = _historial()
+    marcas = [r.ts for r in h.consultar()]
+    en_rango = list(h.consultar(desde=marcas[2], hasta=marcas[5]))
+    assert all(marcas[2] <= r.ts <= marcas[5] for r in en_rango)
+    assert len(en_rango) >= 4
+
+
+def test_cuenta_sin_movimientos():
+    assert list(_historial().consultar(origen="00000000")) == []
+
+
+def test_retencion_expulsa_y_mantiene_ids(tmp_path):
+    archivo = tmp_path / "historial.ndjson"
+    h = _historial(retencion=4, archivo=str(archivo))
+    assert len(h) == 4
+    assert (h.primer_id, h.ultimo_id) == (7, 10)
+    assert [r.id for r in h.consultar()] == [7, 8, 9, 10]
+    assert h.obtener(3) is None
+
+    nuevo = h.registrar("12345678", "87654322", 1)
+    assert nuevo.id == 11
+
+    h.cerrar()
+    volcados = [json.loads(l) for l in archivo.read_text(encoding="utf-8").splitlines()]
+    assert [v["id"] for v in volcados] == list(range(1, 8))
+
+
+def test_indices_se_recortan_con_la_retencion():
+    h = HistorialTransferencias(retencion=100)
+    for i in range(1000):
+        h.registrar(f"{i:08d}", "87654322", 1)
+    assert len(h._por_origen) == 100
+    assert [r.id for r in h.consultar(destino="87654322", cursor=950)] == list(range(951, 1001))
+
+
+def test_registrar_varias_asigna_ids_consecutivos():
+    h = _historial()
+    registros = h.registrar_varias([("12345678", "87654321", 1), ("87654321", "12345678", 2)])
+    assert [r.id for r in registros] == [11, 12]
+    assert [r.id for r in h.consultar(origen="87654321", destino="12345678")] == [12]
+
+
+def test_movimientos_por_rango_de_fechas():
+    h = HistorialTransferencias(retencion=6)
+    for i in range(10):
+        h._agregar("12345678" if i % 2 == 0 else "87654321", "87654322" if i % 2 == 0 else "12345678",
+                   100, 1000.0 + i, "COMPLETED")
+    # Retenidos: ids 5-10; 12345678 es origen en los pares y destino en los impares
+    assert [r.id for r in h.movimientos("12345678")] == [5, 6, 7, 8, 9, 10]
+    assert [r.id for r in h.movimientos("12345678", desde=1005.0, hasta=1007.0)] == [6, 7, 8]
+    assert [r.id for r in h.movimientos("12345678", desde=1005.5, cursor=7)] == [8, 9, 10]
+    assert [r.id for r in h.movimientos("87654322", hasta=1006.0)] == [5, 7]
+    assert list(h.movimientos("00000000")) == []
+
+
+def test_fechas_no_retroceden():
+    h = HistorialTransferencias()
+    h._agregar("12345678", "87654321", 100, 2000.0, "COMPLETED")
+    registro = h._agregar("12345678", "87654321", 100, 1990.0, "COMPLETED")
+    assert registro.ts == 2000.0
+    assert [r.id for r in h.consultar(origen="12345678", desde=1995.0)] == [1, 2]
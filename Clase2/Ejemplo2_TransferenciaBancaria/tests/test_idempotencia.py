@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from conexiones_sqlite import PoolConexionesSQLite
+from idempotencia import CacheIdempotencia, CacheIdempotenciaSQLite, ConflictoIdempotencia
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_repite_resultado_sin_reejecutar():
+    cache = CacheIdempotencia()
+    llamadas = []
+
+    async def escenario():
+        r1 = await cache.ejecutar("k1", "h", lambda: llamadas.append(1) or "ok")
+        r2 = await cache.ejecutar("k1", "h", lambda: llamadas.append(1) or "otro")
+        return r1, r2
+
+    assert asyncio.run(escenario()) == (("ok", False), ("ok", True))
+    assert len(llamadas) == 1
+
+
+def test_huella_distinta_es_conflicto():
+    cache = CacheIdempotencia()
+
+    async def escenario():
+        await cache.ejecutar("k1", "h1", lambda: "ok")
+        await cache.ejecutar("k1", "h2", lambda: "ok")
+
+    with pytest.raises(ConflictoIdempotencia):
+        asyncio.run(escenario())
+
+
+def test_duplicados_en_vuelo_se_agrupan():
+    cache = CacheIdempotencia()
+    ejecuciones = []
+
+    async def lenta():
+        ejecuciones.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def escenario():
+        return await asyncio.gather(*(cache.ejecutar("k1", "h", lenta) for _ in range(5)))
+
+    resultados = asyncio.run(escenario())
+    assert len(ejecuciones) == 1
+    assert sorted(repetido for _, repetido in resultados) == [False, True, True, True, True]
+
+
+def test_errores_repetidos_se_distinguen_del_original():
+    cache = CacheIdempotencia(error_repetido=lambda exc: KeyError(str(exc)))
+
+    def falla():
+        raise ValueError("saldo")
+
+    async def escenario():
+        with pytest.raises(ValueError, match="saldo"):
+            await cache.ejecutar("k1", "h", falla)
+        with pytest.raises(KeyError, match="saldo"):
+            await cache.ejecutar("k1", "h", lambda: "no se ejecuta")
+
+    asyncio.run(escenario())
+
+
+def test_errores_transitorios_liberan_la_clave():
+    cache = CacheIdempotencia(cachear_error=lambda exc: not isinstance(exc, TimeoutError))
+
+    def falla():
+        raise TimeoutError()
+
+    async def escenario():
+        with pytest.raises(TimeoutError):
+            await cache.ejecutar("k1", "h", falla)
+        return await cache.ejecutar("k1", "h", lambda: "ok")
+
+    assert asyncio.run(escenario()) == ("ok", False)
+
+
+def test_ttl_y_tope_de_entradas():
+    reloj = RelojFalso()
+    cache = CacheIdempotencia(max_entradas=3, ttl_segundos=10, reloj=reloj)
+
+    async def escenario():
+        for i in range(5):
+            await cache.ejecutar(f"k{i}", "h", lambda: i)
+        assert len(cache) == 3
+        reloj.t = 11
+        return await cache.ejecutar("k4", "h", lambda: "nuevo")
+
+    assert asyncio.run(escenario()) == ("nuevo", False)
+
+
+def test_sqlite_compartida_entre_workers(tmp_path):
+    # Dos pools sobre el mismo archivo, como dos workers
+    ruta = str(tmp_path / "compartido.db")
+    workers = [CacheIdempotenciaSQLite(PoolConexionesSQLite(ruta)) for _ in range(2)]
+    ejecuciones = []
+
+    async def lenta():
+        ejecuciones.append(1)
+        await asyncio.sleep(0.05)
+        return {"id": 1, "monto": 10.5}
+
+    async def escenario():
+        return await asyncio.gather(*(workers[i % 2].ejecutar("k1", "h", lenta) for i in range(4)))
+
+    resultados = asyncio.run(escenario())
+    assert len(ejecuciones) == 1
+    assert all(r == {"id": 1, "monto": 10.5} for r, _ in resultados)
+    assert sorted(repetido for _, repetido in resultados) == [False, True, True, True]
+    with pytest.raises(ConflictoIdempotencia):
+        asyncio.run(workers[1].ejecutar("k1", "otra", lenta))
+    assert len(workers[0]) == 1
+
+
+def test_sqlite_errores_y_plazo_vencido(tmp_path):
+    reloj = RelojFalso()
+    cache = CacheIdempotenciaSQLite(
+        PoolConexionesSQLite(str(tmp_path / "c.db")), ttl_segundos=10, plazo_segundos=5, reloj=reloj,
+        cachear_error=lambda exc: isinstance(exc, ValueError),
+        error_a_datos=lambda exc: {"mensaje": str(exc)}, error_desde_datos=lambda datos: ValueError(datos["mensaje"])
+    )
+
+    def falla(exc):
+        def funcion():
+            raise exc
+        return funcion
+
+    async def escenario():
+        # Definitivo: se repite sin ejecutar; transitorio: libera la clave
+        with pytest.raises(ValueError, match="saldo"):
+            await cache.ejecutar("k1", "h", falla(ValueError("saldo")))
+        with pytest.raises(ValueError, match="saldo"):
+            await cache.ejecutar("k1", "h", lambda: "no se ejecuta")
+        with pytest.raises(TimeoutError):
+            await cache.ejecutar("k2", "h", falla(TimeoutError()))
+        assert await cache.ejecutar("k2", "h", lambda: "ok") == ("ok", False)
+        # Un worker que murió con la clave en curso: al vencer el plazo otro la toma
+        cache._reclamar("k3", "h")
+        reloj.t += 6
+        return await cache.ejecutar("k3", "h", lambda: "retomada")
+
+    assert asyncio.run(escenario()) == ("retomada", False)
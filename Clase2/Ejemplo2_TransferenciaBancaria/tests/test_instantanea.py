@@ -0,0 +1,119 @@
+import pytest
+
+import instantanea
+from almacenamiento import AlmacenMemoria, AlmacenSQLite
+from bloqueos import GestorBloqueos
+from historial import HistorialTransferencias, RegistroTransferencia
+from limitador_tasa import LimitadorTasa, LimitadorTasaSQLite
+from motor_transferencias import Cuenta
+
+
+class RelojFalso:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def _estado(almacen, limitador):
+    almacen.sembrar([Cuenta("12345678", 100_000_00), Cuenta("87654321", 50_000_00),
+                     Cuenta("99999999", 0, estado="BLOQUEADA")])
+    historial = HistorialTransferencias(retencion=100)
+    for _ in range(3):
+        almacen.transferir(almacen.obtener("12345678"), almacen.obtener("87654321"), 10_00)
+        historial.registrar("12345678", "87654321", 10_00)
+        limitador.permitir("12345678")
+    return historial
+
+
+def test_serializar_ida_y_vuelta():
+    original = instantanea.Instantanea(
+        [Cuenta("12345678", 123_45, "ACTIVA", 1, 2, 738000, 24300, 7), Cuenta("cta-ñ-01", 0, "BLOQUEADA")],
+        42, [RegistroTransferencia(41, "12345678", "cta-ñ-01", 5_00, 1700000000.25, "COMPLETED")],
+        {"12345678": [0.5, 3.0]}, 1700000001.0
+    )
+    copia = instantanea.deserializar(instantanea.serializar(original))
+    assert [(c.numero, c.saldo, c.estado, c.transferido_hoy, c.transferido_mes, c.periodo_dia, c.periodo_mes,
+             c.version) for c in copia.cuentas] == [("12345678", 123_45, "ACTIVA", 1, 2, 738000, 24300, 7),
+                                                    ("cta-ñ-01", 0, "BLOQUEADA", 0, 0, 0, 0, 0)]
+    assert copia.ultimo_id == 42 and copia.creada == 1700000001.0
+    assert [r.como_dict() for r in copia.registros] == [r.como_dict() for r in original.registros]
+    assert copia.marcas == {"12345678": [0.5, 3.0]}
+
+
+def test_datos_invalidos():
+    datos = instantanea.serializar(instantanea.Instantanea([Cuenta("12345678", 1)], 0, [], {}, 0.0))
+    for invalidos in (b"", b"XXXX" + datos[4:], datos[:-1], datos[:-1] + bytes([datos[-1] ^ 1])):
+        with pytest.raises(ValueError):
+            instantanea.deserializar(invalidos)
+
+
+def test_guardar_es_atomico(tmp_path):
+    ruta = str(tmp_path / "estado.tbin")
+    estado = instantanea.Instantanea([Cuenta("12345678", 1)], 0, [], {}, 0.0)
+    assert instantanea.guardar(estado, ruta) == len(instantanea.serializar(estado))
+    instantanea.guardar(estado._replace(cuentas=[]), ruta)
+    assert instantanea.cargar(ruta).cuentas == []
+    assert [p.name for p in tmp_path.iterdir()] == ["estado.tbin"]
+
+
+def test_restaurar_en_memoria():
+    reloj = RelojFalso()
+    almacen = AlmacenMemoria(GestorBloqueos(), 10**9, 10**9)
+    limitador = LimitadorTasa(max_ops=5, ventana_segundos=60, reloj=reloj)
+    historial = _estado(almacen, limitador)
+    capturado = instantanea.deserializar(instantanea.serializar(instantanea.capturar(almacen, historial, limitador)))
+
+    viva = almacen.obtener("12345678")
+    version = viva.version
+    almacen.transferir(viva, almacen.obtener("87654321"), 1_000_00)
+    historial.registrar("12345678", "87654321", 1_000_00)
+    almacen.sembrar([Cuenta("11111111", 1)])
+    limitador.permitir("12345678")
+    reloj.t += 30
+
+    instantanea.restaurar(capturado, almacen, historial, limitador)
+    # La cuenta viva se actualiza en su lugar y su versión no retrocede
+    assert almacen.obtener("12345678") is viva and viva.saldo == 100_000_00 - 30_00
+    assert viva.version > version + 1
+    assert almacen.obtener("11111111") is None and len(almacen) == 3
+    assert historial.ultimo_id == 3 and [r.id for r in historial.consultar(origen="12345678")] == [1, 2, 3]
+    # Las marcas conservan su antigüedad: quedan 2 operaciones de 5
+    assert limitador.permitir("12345678") and limitador.permitir("12345678")
+    assert not limitador.permitir("12345678")
+
+
+def test_restaurar_sqlite_en_una_transaccion(tmp_path):
+    reloj = RelojFalso()
+    almacen = AlmacenSQLite(str(tmp_path / "cuentas.db"), 10**9, 10**9)
+    limitador = LimitadorTasaSQLite(almacen.pool, max_ops=5, ventana_segundos=60, reloj=reloj)
+    historial = _estado(almacen, limitador)
+    capturado = instantanea.capturar(almacen, historial, limitador)
+    assert capturado.marcas == {"12345678": [0.0, 0.0, 0.0]}
+
+    almacen.sembrar([Cuenta("11111111", 1)])
+    limitador.limpiar()
+
+    def fallar():
+        raise ValueError("falla")
+    with pytest.raises(ValueError):
+        almacen.reemplazar(capturado.cuentas, fallar)
+    assert almacen.obtener("11111111") is not None
+
+    instantanea.restaurar(capturado, almacen, historial, limitador)
+    assert almacen.obtener("11111111") is None
+    assert almacen.obtener("12345678").saldo == 100_000_00 - 30_00
+    assert limitador.exportar() == {"12345678": [0.0, 0.0, 0.0]}
+    almacen.cerrar()
+
+
+def test_historial_restaurado_respeta_retencion():
+    historial = HistorialTransferencias(retencion=4)
+    registros = [RegistroTransferencia(i, "12345678", "87654321", i, 1.0, "COMPLETED")
+                 for i in range(1, 8)]
+    historial.restaurar(9, registros)
+    assert historial.ultimo_id == 9 and [r.id for r in historial.consultar()] == [6, 7]
+    assert historial.registrar("12345678", "87654321", 1).id == 10
+    with pytest.raises(ValueError):
+        historial.restaurar(3, registros)
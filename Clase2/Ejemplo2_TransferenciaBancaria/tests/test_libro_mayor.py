@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from almacenamiento import AlmacenMemoria, AlmacenSQLite
+from bloqueos import GestorBloqueos
+from historial import HistorialTransferencias
+from libro_mayor import LibroMayor
+from motor_transferencias import Cuenta, Rechazo
+
+
+PERIODOS = (738000, 24300)
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def almacen(request, tmp_path):
+    if request.param == "memoria":
+        almacen = AlmacenMemoria(GestorBloqueos(), 50000, 5000000, lambda: PERIODOS)
+    else:
+        almacen = AlmacenSQLite(str(tmp_path / "cuentas.db"), 50000, 5000000, periodos=lambda: PERIODOS)
+    almacen.sembrar([Cuenta("12345678", saldo=100000), Cuenta("87654321", saldo=100)])
+    yield almacen
+    almacen.cerrar()
+
+
+def test_agrupa_y_responde_a_cada_solicitud(almacen):
+    historial = HistorialTransferencias()
+    lotes = []
+
+    async def escenario():
+        libro = LibroMayor(almacen, historial, max_lote=8, espera_maxima=0.01, observar_lote=lotes.append)
+        origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+        resultados = await asyncio.gather(
+            *(libro.transferir(origen, destino, 100) for _ in range(10)),
+            libro.transferir(destino, origen, 10**6)  # saldo insuficiente
+        )
+        await libro.cerrar()
+        return resultados
+
+    resultados = asyncio.run(escenario())
+    assert sum(lotes) == 11 and len(lotes) < 11 and max(lotes) <= 8
+    aprobadas = resultados[:10]
+    assert [resultado.valor for resultado, _ in aprobadas] == [100000 - 100 * i for i in range(1, 11)]
+    assert [registro.id for _, registro in aprobadas] == list(range(1, 11))
+    rechazo, registro = resultados[10]
+    assert rechazo.rechazo is Rechazo.SALDO_INSUFICIENTE and registro is None
+    assert len(historial) == 10
+    assert almacen.obtener("87654321").saldo == 1100
+
+
+def test_cerrar_aplica_lo_encolado_y_rechaza_nuevas(almacen):
+    async def escenario():
+        libro = LibroMayor(almacen, HistorialTransferencias(), espera_maxima=0.05)
+        origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+        pendiente = asyncio.ensure_future(libro.transferir(origen, destino, 100))
+        await asyncio.sleep(0)
+        await libro.cerrar()
+        with pytest.raises(RuntimeError):
+            await libro.transferir(origen, destino, 100)
+        return await pendiente
+
+    resultado, registro = asyncio.run(escenario())
+    assert resultado.aprobada and registro.id == 1
+
+
+def test_error_del_almacen_llega_a_cada_solicitud():
+    class AlmacenRoto(AlmacenMemoria):
+        def transferir_lote(self, operaciones, atomico=False):
+            raise OSError("disco lleno")
+
+    almacen = AlmacenRoto(GestorBloqueos(), 50000, 5000000)
+    origen, destino = Cuenta("12345678", saldo=1000), Cuenta("87654321", saldo=0)
+
+    async def escenario():
+        libro = LibroMayor(almacen, HistorialTransferencias())
+        resultados = await asyncio.gather(*(libro.transferir(origen, destino, 1) for _ in range(3)),
+                                          return_exceptions=True)
+        await libro.cerrar()
+        return resultados
+
+    assert all(isinstance(r, OSError) for r in asyncio.run(escenario()))
+
+
+def test_error_del_historial_no_falla_transferencias_aplicadas(almacen, caplog):
+    class HistorialRoto(HistorialTransferencias):
+        def registrar_varias(self, transferencias, status="COMPLETED"):
+            raise OSError("volcado: disco lleno")
+
+    async def escenario():
+        libro = LibroMayor(almacen, HistorialRoto())
+        origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+        resultados = await asyncio.gather(libro.transferir(origen, destino, 100),
+                                          libro.transferir(destino, origen, 10**6))
+        await libro.cerrar()
+        return libro, resultados
+
+    libro, ((aprobada, registro), (rechazada, _)) = asyncio.run(escenario())
+    # El dinero se movió: se informa aprobada, sin registro, y el libro queda degradado
+    assert aprobada.aprobada and registro is None
+    assert rechazada.rechazo is Rechazo.SALDO_INSUFICIENTE
+    assert almacen.obtener("87654321").saldo == 200
+    assert libro.degradado and libro.sin_registro == 1
+    assert "sin registro" in caplog.text
@@ -0,0 +1,64 @@
+from conexiones_sqlite import PoolConexionesSQLite
+from limitador_tasa import LimitadorTasa, LimitadorTasaSQLite
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_rechaza_al_superar_max_ops_en_ventana():
+    reloj = RelojFalso()
+    limitador = LimitadorTasa(max_ops=3, ventana_segundos=60, reloj=reloj)
+    assert all(limitador.permitir("12345678") for _ in range(3))
+    assert not limitador.permitir("12345678")
+    # Otra cuenta no se ve afectada
+    assert limitador.permitir("87654321")
+
+
+def test_permitir_varias_admite_solo_el_cupo(tmp_path):
+    reloj = RelojFalso()
+    limitadores = [
+        LimitadorTasa(max_ops=3, ventana_segundos=60, reloj=reloj),
+        LimitadorTasaSQLite(PoolConexionesSQLite(str(tmp_path / "r.db")), max_ops=3, ventana_segundos=60, reloj=reloj),
+    ]
+    for limitador in limitadores:
+        assert limitador.permitir("12345678")
+        assert limitador.permitir_varias("12345678", 5000) == 2
+        assert limitador.permitir_varias("12345678", 1) == 0
+        assert not limitador.permitir("12345678")
+        assert limitador.permitir_varias("87654321", 2) == 2
+
+
+def test_ventana_deslizante_libera_cupo():
+    reloj = RelojFalso()
+    limitador = LimitadorTasa(max_ops=2, ventana_segundos=60, reloj=reloj)
+    assert limitador.permitir("12345678")
+    reloj.t += 30
+    assert limitador.permitir("12345678")
+    assert not limitador.permitir("12345678")
+    reloj.t += 30  # la primera marca sale de la ventana
+    assert limitador.permitir("12345678")
+    assert not limitador.permitir("12345678")
+
+
+def test_expulsa_cuentas_inactivas():
+    reloj = RelojFalso()
+    limitador = LimitadorTasa(max_ops=10, ventana_segundos=60, reloj=reloj)
+    for i in range(100):
+        limitador.permitir(f"{i:08d}")
+    assert len(limitador) == 100
+    reloj.t += 61
+    for i in range(100):
+        limitador.permitir("12345678")
+    assert len(limitador) == 1
+
+
+def test_tope_de_cuentas():
+    limitador = LimitadorTasa(max_cuentas=50)
+    for i in range(1000):
+        limitador.permitir(f"{i:08d}")
+    assert len(limitador) == 50
@@ -0,0 +1,58 @@
+import threading
+
+from bloqueos import GestorBloqueos
+from metricas import Histograma, RegistroMetricas
+
+
+def test_contador_fragmentado_suma_todos_los_threads():
+    registro = RegistroMetricas()
+    contador = registro.contador("ops_total", "Operaciones").etiquetar()
+
+    def worker():
+        for _ in range(10000):
+            contador.inc()
+
+    hilos = [threading.Thread(target=worker) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert contador.valor == 80000
+
+
+def test_gauge_inc_y_dec_en_threads_distintos():
+    gauge = RegistroMetricas().gauge("en_curso", "En curso").etiquetar()
+    gauge.inc()
+    hilo = threading.Thread(target=gauge.dec)
+    hilo.start()
+    hilo.join()
+    assert gauge.valor == 0
+
+
+def test_histograma_acumula_buckets():
+    histograma = Histograma(limites=(0.1, 1.0))
+    for valor in (0.05, 0.1, 0.5, 3.0):
+        histograma.observar(valor)
+    acumulados, suma, total = histograma.resumen()
+    assert acumulados == [2, 3, 4]  # le=0.1, le=1.0, le=+Inf
+    assert (suma, total) == (3.65, 4)
+
+
+def test_exposicion_formato_prometheus():
+    registro = RegistroMetricas()
+    registro.contador("rechazos_total", "Rechazos", ("motivo",)).etiquetar('otp "x"').inc(2)
+    registro.histograma("latencia_segundos", "Latencia", ("paso",), limites=(0.5,)).etiquetar("motor").observar(0.2)
+    texto = registro.exponer()
+    assert "# TYPE rechazos_total counter" in texto
+    assert 'rechazos_total{motivo="otp \\"x\\""} 2' in texto
+    assert 'latencia_segundos_bucket{paso="motor",le="0.5"} 1' in texto
+    assert 'latencia_segundos_bucket{paso="motor",le="+Inf"} 1' in texto
+    assert 'latencia_segundos_count{paso="motor"} 1' in texto
+
+
+def test_espera_de_locks_observada():
+    esperas = []
+    gestor = GestorBloqueos(observar_espera=esperas.append)
+    with gestor.adquirir("12345678", "87654321"):
+        pass
+    assert len(esperas) == 1 and esperas[0] >= 0
@@ -0,0 +1,109 @@
+import threading
+
+from bloqueos import GestorBloqueos
+from motor_transferencias import Cuenta, MotorTransferencias, Rechazo
+
+
+PERIODOS = (738000, 24300)
+
+
+def _motor(limite_diario=50000, limite_mensual=5000000, periodos=lambda: PERIODOS):
+    return MotorTransferencias(GestorBloqueos(), limite_diario, limite_mensual, periodos)
+
+
+def test_aplica_debito_y_credito():
+    origen, destino = Cuenta("12345678", saldo=100000), Cuenta("87654321", saldo=0)
+    resultado = _motor().validar_y_aplicar(origen, destino, 1000)
+    assert resultado.aprobada
+    assert resultado.valor == 99000
+    assert (origen.saldo, origen.transferido_hoy, origen.transferido_mes) == (99000, 1000, 1000)
+    assert destino.saldo == 1000
+
+
+def test_codigos_de_rechazo():
+    motor = _motor(limite_diario=500, limite_mensual=800)
+    destino = Cuenta("87654321", saldo=0)
+
+    resultado = motor.validar_y_aplicar(Cuenta("12345678", saldo=10), destino, 100)
+    assert resultado.rechazo is Rechazo.SALDO_INSUFICIENTE and resultado.valor == 10
+
+    origen = Cuenta("12345678", saldo=10000, transferido_hoy=450, periodo_dia=PERIODOS[0])
+    resultado = motor.validar_y_aplicar(origen, destino, 100)
+    assert resultado.rechazo is Rechazo.LIMITE_DIARIO and resultado.valor == 450
+
+    origen = Cuenta("12345678", saldo=10000, transferido_mes=750, periodo_mes=PERIODOS[1])
+    resultado = motor.validar_y_aplicar(origen, destino, 100)
+    assert resultado.rechazo is Rechazo.LIMITE_MENSUAL and resultado.valor == 750
+
+    # Un rechazo no modifica ninguna cuenta
+    assert origen.saldo == 10000 and destino.saldo == 0
+
+
+def test_limite_diario_no_se_excede_bajo_concurrencia():
+    motor = _motor(limite_diario=50000)
+    origen = Cuenta("12345678", saldo=10**9)
+    destinos = [Cuenta(f"8765432{i}", saldo=0) for i in range(8)]
+    barrera = threading.Barrier(len(destinos))
+
+    def worker(destino):
+        barrera.wait()
+        for _ in range(500):
+            motor.validar_y_aplicar(origen, destino, 30)
+
+    hilos = [threading.Thread(target=worker, args=(d,)) for d in destinos]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert origen.transferido_hoy <= 50000
+    assert origen.transferido_hoy == sum(d.saldo for d in destinos)
+
+
+def test_lote_todo_o_nada_revierte():
+    motor = _motor(limite_diario=1000)
+    origen = Cuenta("12345678", saldo=10000)
+    destinos = [Cuenta("87654321", saldo=0), Cuenta("87654322", saldo=0)]
+    operaciones = [(origen, destinos[0], 600), (origen, destinos[1], 300), (origen, destinos[0], 200)]
+
+    resultados = motor.validar_y_aplicar_lote(operaciones, atomico=True)
+    assert [r.rechazo for r in resultados] == [Rechazo.LOTE_ABORTADO, Rechazo.LOTE_ABORTADO, Rechazo.LIMITE_DIARIO]
+    assert (origen.saldo, origen.transferido_hoy) == (10000, 0)
+    assert [d.saldo for d in destinos] == [0, 0]
+    # La reversión deja una versión nueva: los valores intermedios pudieron leerse
+    assert origen.version > 0
+
+    resultados = motor.validar_y_aplicar_lote(operaciones, atomico=False)
+    assert [r.aprobada for r in resultados] == [True, True, False]
+    assert origen.transferido_hoy == 900
+
+
+def test_acumulados_se_renuevan_al_cambiar_de_dia_y_mes():
+    periodos = [PERIODOS]
+    motor = _motor(limite_diario=1000, limite_mensual=1500, periodos=lambda: periodos[0])
+    origen, destino = Cuenta("12345678", saldo=10000), Cuenta("87654321", saldo=0)
+
+    assert motor.validar_y_aplicar(origen, destino, 1000).aprobada
+    assert motor.validar_y_aplicar(origen, destino, 1).rechazo is Rechazo.LIMITE_DIARIO
+
+    # Día siguiente, mismo mes: se libera el diario pero no el mensual
+    periodos[0] = (PERIODOS[0] + 1, PERIODOS[1])
+    assert origen.como_dict(periodos[0])["transferido_hoy"] == 0
+    assert motor.validar_y_aplicar(origen, destino, 500).aprobada
+    assert motor.validar_y_aplicar(origen, destino, 1).rechazo is Rechazo.LIMITE_MENSUAL
+    assert (origen.transferido_hoy, origen.transferido_mes) == (500, 1500)
+
+    # Mes siguiente: ambos acumulados vuelven a cero
+    periodos[0] = (PERIODOS[0] + 31, PERIODOS[1] + 1)
+    assert motor.validar_y_aplicar(origen, destino, 700).aprobada
+    assert (origen.transferido_hoy, origen.transferido_mes) == (700, 700)
+
+
+def test_intentar_aplicar_sin_esperar_locks():
+    motor = _motor()
+    origen, destino = Cuenta("12345678", saldo=100000), Cuenta("87654321", saldo=0)
+    assert motor.intentar_aplicar(origen, destino, 1000).valor == 99000
+
+    with motor.bloqueos.adquirir(destino.numero):
+        assert motor.intentar_aplicar(origen, destino, 1000) is None
+    assert origen.saldo == 99000 and destino.saldo == 1000
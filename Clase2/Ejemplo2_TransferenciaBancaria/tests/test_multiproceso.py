@@ -0,0 +1,54 @@
+"""
+Los límites deben respetarse entre procesos cuando el estado vive en SQLite
+(modo multi-worker). Cada proceso simula un worker de uvicorn con su propio
+almacén, pool de conexiones y rate limiter sobre el mismo archivo.
+"""
+import multiprocessing
+
+from almacenamiento import AlmacenSQLite
+from limitador_tasa import LimitadorTasaSQLite
+from motor_transferencias import Cuenta
+
+WORKERS = 4
+INTENTOS_POR_WORKER = 10
+
+
+def _worker(ruta, barrera, resultados):
+    almacen = AlmacenSQLite(ruta, 50000, 5000000)
+    limitador = LimitadorTasaSQLite(almacen.pool, max_ops=10, ventana_segundos=60)
+    origen, destino = almacen.obtener("12345678"), almacen.obtener("87654321")
+    barrera.wait()
+    aprobadas = permitidas = 0
+    for _ in range(INTENTOS_POR_WORKER):
+        if almacen.transferir(origen, destino, 3000).aprobada:
+            aprobadas += 1
+        if limitador.permitir("12345678"):
+            permitidas += 1
+    almacen.cerrar()
+    resultados.put((aprobadas, permitidas))
+
+
+def test_limites_compartidos_entre_workers(tmp_path):
+    ruta = str(tmp_path / "compartido.db")
+    almacen = AlmacenSQLite(ruta, 50000, 5000000)
+    almacen.sembrar([Cuenta("12345678", saldo=10**6), Cuenta("87654321", saldo=0)])
+
+    ctx = multiprocessing.get_context("spawn")
+    barrera = ctx.Barrier(WORKERS)
+    resultados = ctx.Queue()
+    procesos = [ctx.Process(target=_worker, args=(ruta, barrera, resultados)) for _ in range(WORKERS)]
+    for p in procesos:
+        p.start()
+    totales = [resultados.get(timeout=60) for _ in procesos]
+    for p in procesos:
+        p.join(timeout=60)
+
+    # 40 intentos de $3,000 contra un límite diario de $50,000: solo caben 16
+    assert sum(a for a, _ in totales) == 16
+    origen = almacen.obtener("12345678")
+    assert origen.transferido_hoy == 48000
+    assert almacen.obtener("87654321").saldo == 48000
+
+    # 40 intentos contra 10 operaciones por minuto: solo pasan 10 en total
+    assert sum(p for _, p in totales) == 10
+    almacen.cerrar()
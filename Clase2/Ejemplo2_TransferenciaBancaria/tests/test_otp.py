@@ -0,0 +1,104 @@
+import pytest
+
+from otp import OTPBloqueado, ServicioOTP
+
+
+class RelojFalso:
+    def __init__(self, t=1000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+def test_codigo_de_un_solo_uso_ligado_a_la_transferencia():
+    servicio = ServicioOTP(reloj=RelojFalso())
+    codigo = servicio.emitir("12345678", "87654321", 2_000_000_00)
+    assert len(codigo) == 6 and codigo.isdigit()
+    assert not servicio.verificar("12345678", "87654321", 2_000_000_01, codigo)
+    assert not servicio.verificar("12345678", "87654322", 2_000_000_00, codigo)
+    # Verificar sin consumir (regla) y luego consumir (al aprobar)
+    assert servicio.verificar("12345678", "87654321", 2_000_000_00, codigo)
+    assert servicio.verificar("12345678", "87654321", 2_000_000_00, codigo, consumir=True)
+    assert not servicio.verificar("12345678", "87654321", 2_000_000_00, codigo)
+    assert not servicio.verificar("12345678", "87654321", 2_000_000_00, None)
+
+
+def test_vencimiento_sin_recorrer_los_vigentes():
+    reloj = RelojFalso()
+    servicio = ServicioOTP(ttl_segundos=60, reloj=reloj)
+    viejo = servicio.emitir("12345678", "87654321", 100)
+    reloj.t += 30
+    nuevos = [servicio.emitir(f"{i:08d}", "87654321", 100) for i in range(3)]
+    reloj.t += 31
+    assert not servicio.verificar("12345678", "87654321", 100, viejo)
+    assert len(servicio) == 3
+    assert servicio.verificar("00000001", "87654321", 100, nuevos[1])
+    # Reemplazar un desafío invalida el código anterior
+    reemplazado = servicio.emitir("00000002", "87654321", 100)
+    assert servicio.verificar("00000002", "87654321", 100, reemplazado)
+    assert reemplazado == nuevos[2] or not servicio.verificar("00000002", "87654321", 100, nuevos[2])
+
+
+def test_bloqueo_tras_intentos_fallidos():
+    reloj = RelojFalso()
+    servicio = ServicioOTP(max_intentos=3, ventana_intentos=60, bloqueo_segundos=120, reloj=reloj)
+    codigo = servicio.emitir("12345678", "87654321", 100)
+    incorrecto = "000000" if codigo != "000000" else "111111"
+    for _ in range(2):
+        assert not servicio.verificar("12345678", "87654321", 100, incorrecto)
+    # Un acierto reinicia los fallos
+    assert servicio.verificar("12345678", "87654321", 100, codigo)
+    for _ in range(3):
+        assert not servicio.verificar("12345678", "87654321", 100, incorrecto)
+    assert servicio.bloqueo_restante("12345678") == 120
+    # Bloqueada: ni el código correcto ni un desafío nuevo
+    assert not servicio.verificar("12345678", "87654321", 100, codigo)
+    with pytest.raises(OTPBloqueado):
+        servicio.emitir("12345678", "87654321", 100)
+    assert servicio.emitir("87654321", "12345678", 100)
+    reloj.t += 121
+    assert servicio.bloqueo_restante("12345678") == 0
+    assert servicio.verificar("12345678", "87654321", 100, servicio.emitir("12345678", "87654321", 100))
+
+
+def test_codigo_estatico_solo_si_se_configura():
+    assert not ServicioOTP().verificar("12345678", "87654321", 100, "123456")
+    servicio = ServicioOTP(estatico="123456")
+    assert servicio.verificar("12345678", "87654321", 100, "123456", consumir=True)
+    assert servicio.verificar("12345678", "87654321", 100, "123456")
+    assert not servicio.verificar("12345678", "87654321", 100, "ñ23456")
+
+
+def test_tope_de_desafios_descarta_el_que_vence_primero():
+    servicio = ServicioOTP(max_desafios=2, reloj=RelojFalso())
+    primero = servicio.emitir("00000001", "87654321", 100)
+    servicio.emitir("00000002", "87654321", 100)
+    servicio.emitir("00000003", "87654321", 100)
+    assert len(servicio) == 2
+    assert not servicio.verificar("00000001", "87654321", 100, primero)
+
+
+def test_reserva_devuelta_si_la_transferencia_no_se_aplica():
+    reloj = RelojFalso()
+    servicio = ServicioOTP(ttl_segundos=60, reloj=reloj)
+    codigo = servicio.emitir("12345678", "87654321", 100)
+    reserva = servicio.reservar("12345678", "87654321", 100, codigo)
+    assert reserva is not None
+    # Reservado: ninguna otra solicitud puede usarlo mientras tanto
+    assert servicio.reservar("12345678", "87654321", 100, codigo) is None
+    servicio.devolver(reserva)
+    # Devuelto con su vencimiento original
+    reloj.t += 59
+    assert servicio.verificar("12345678", "87654321", 100, codigo)
+    reloj.t += 1
+    assert not servicio.verificar("12345678", "87654321", 100, codigo)
+
+    # No pisa un desafío emitido mientras estaba reservado
+    codigo = servicio.emitir("12345678", "87654321", 100)
+    reserva = servicio.reservar("12345678", "87654321", 100, codigo)
+    nuevo = servicio.emitir("12345678", "87654321", 100)
+    servicio.devolver(reserva)
+    assert servicio.verificar("12345678", "87654321", 100, nuevo)
+    assert nuevo == codigo or not servicio.verificar("12345678", "87654321", 100, codigo)
+    servicio.devolver(None)
@@ -0,0 +1,121 @@
+import json
+import os
+from datetime import time
+
+import pytest
+
+from reglas import ConfiguracionReglas, ConjuntoReglas, FuenteConfiguracion, Nivel, Regla
+from reloj import VentanaMantenimiento
+
+
+BASE = ConfiguracionReglas(
+    {"estandar": Nivel("estandar", 5000000, 500000000, 100000000)}, "estandar", {},
+    [VentanaMantenimiento(time(1, 0), time(3, 0))]
+)
+NIVEL = BASE.nivel("12345678")
+
+
+class RelojFalso:
+    def __init__(self):
+        self.t = 1000.0
+
+    def __call__(self):
+        return self.t
+
+
+def test_combinar_agrega_niveles_y_cuentas():
+    configuracion = BASE.combinar({
+        "niveles": {"premium": {"limite_diario": 200000}},
+        "cuentas": {"87654321": "premium"},
+        "mantenimiento": {"inicio": "02:30"}
+    })
+    premium = configuracion.nivel("87654321")
+    # Lo que el nivel nuevo no define lo toma del nivel por defecto
+    assert premium == Nivel("premium", 20000000, 500000000, 100000000)
+    assert configuracion.nivel("12345678").nombre == "estandar"
+    assert configuracion.ventanas == (VentanaMantenimiento(time(2, 30), time(3, 0)),)
+    # Una lista reemplaza todas las ventanas
+    configuracion = BASE.combinar({"mantenimiento": [
+        {"inicio": "01:00", "fin": "03:00"}, {"inicio": "23:30", "fin": "00:15", "zona": "UTC"}
+    ]})
+    assert configuracion.ventanas[1] == VentanaMantenimiento(time(23, 30), time(0, 15), "UTC")
+    with pytest.raises(ValueError):
+        BASE.combinar({"cuentas": {"12345678": "oro"}})
+    with pytest.raises(ValueError):
+        BASE.combinar({"niveles": {"premium": {"limite_diario": 1.234}}})
+    with pytest.raises(ValueError):
+        BASE.combinar({"mantenimiento": [{"inicio": "01:00"}]})
+    with pytest.raises(ValueError):
+        BASE.combinar({"mantenimiento": {"zona": "Marte/Olympus_Mons"}})
+
+
+def test_recarga_en_caliente(tmp_path):
+    archivo = tmp_path / "reglas.json"
+    archivo.write_text(json.dumps({"niveles": {"estandar": {"limite_diario": 100}}}))
+    reloj = RelojFalso()
+    fuente = FuenteConfiguracion(BASE, str(archivo), intervalo=1.0, reloj=reloj)
+    assert fuente.actual().nivel("12345678").limite_diario == 10000
+
+    archivo.write_text(json.dumps({"niveles": {"estandar": {"limite_diario": 200}}}))
+    os.utime(archivo, ns=(0, 10**18))
+    # Antes del intervalo no se revisa el archivo
+    assert fuente.actual().nivel("12345678").limite_diario == 10000
+    reloj.t += 1
+    assert fuente.actual().nivel("12345678").limite_diario == 20000
+
+    # Un archivo inválido conserva la configuración anterior
+    archivo.write_text("{no es json")
+    os.utime(archivo, ns=(0, 2 * 10**18))
+    reloj.t += 1
+    assert fuente.actual().nivel("12345678").limite_diario == 20000
+    assert fuente.error is not None
+
+
+def test_archivo_invalido_al_iniciar(tmp_path):
+    archivo = tmp_path / "reglas.json"
+    archivo.write_text(json.dumps({"nivel_por_defecto": "oro"}))
+    with pytest.raises(ValueError):
+        FuenteConfiguracion(BASE, str(archivo))
+
+
+def test_cuentas_se_buscan_solo_si_una_regla_las_pide():
+    buscadas = []
+
+    def obtener(numero):
+        buscadas.append(numero)
+        return numero
+
+    reglas = ConjuntoReglas([
+        Regla("misma_cuenta", 400, "misma", "origen == destino"),
+        Regla("destino_inexistente", 404, "destino", "cuenta_destino is None", costo=10),
+    ], reordenar_cada=0)
+    regla, _, _ = reglas.validar("12345678", "12345678", 100, None, NIVEL, obtener)
+    assert regla.motivo == "misma_cuenta"
+    assert buscadas == []
+
+    assert reglas.validar("12345678", "87654321", 100, None, NIVEL, obtener) == (None, "12345678", "87654321")
+    assert buscadas == ["87654321", "12345678"]
+
+
+def test_nombres_desconocidos():
+    with pytest.raises(ValueError):
+        ConjuntoReglas([Regla("otp", 401, "otp", "otp != OTP_VALIDO")])
+
+
+def test_reordena_por_rechazos_observados():
+    cuentas = {"12345678": "origen"}
+    reglas = ConjuntoReglas([
+        Regla("otp", 401, lambda nivel, **_: f"OTP requerido > {nivel.monto_requiere_otp}",
+              "monto > nivel.monto_requiere_otp and otp != OTP_VALIDO"),
+        Regla("destino_inexistente", 404, "Cuenta destino no encontrada", "cuenta_destino is None", costo=2),
+    ], {"OTP_VALIDO": "123456"}, reordenar_cada=100)
+    assert reglas.orden == ["otp", "destino_inexistente"]
+    for _ in range(100):
+        reglas.validar("12345678", "87654321", 100, None, NIVEL, cuentas.get)
+    # destino_inexistente rechaza todo y otp nada: pasa primero pese a costar más
+    assert reglas.orden == ["destino_inexistente", "otp"]
+    # El orden no cambia qué se aprueba ni el detalle de un rechazo único
+    cuentas["87654321"] = "destino"
+    regla, _, _ = reglas.validar("12345678", "87654321", 200000000, None, NIVEL, cuentas.get)
+    assert (regla.motivo, regla.detalle_para(nivel=NIVEL)) == ("otp", "OTP requerido > 100000000")
+    assert reglas.validar("12345678", "87654321", 200000000, "123456", NIVEL, cuentas.get)[0] is None
@@ -0,0 +1,100 @@
+import random
+from datetime import datetime, time, timezone
+
+import pytest
+
+from reloj import RelojMantenimiento, VentanaMantenimiento, formatear_fecha, zona_horaria
+
+try:
+    zona_horaria("UTC")
+except ValueError:
+    pytest.skip("Sin base de zonas horarias", allow_module_level=True)
+
+
+class Relojes:
+    """Reloj de pared y monotónico falsos que avanzan juntos; cuenta las lecturas de pared"""
+
+    def __init__(self, inicio: datetime):
+        self.pared = inicio.timestamp()
+        self.mono = 10**12
+        self.lecturas = 0
+
+    def avanzar(self, segundos: float):
+        self.pared += segundos
+        self.mono += int(segundos * 1e9)
+
+    def reloj(self):
+        self.lecturas += 1
+        return self.pared
+
+    def monotonico(self):
+        return self.mono
+
+
+def _reloj(inicio: datetime):
+    relojes = Relojes(inicio)
+    return relojes, RelojMantenimiento(resincronizar=86400, reloj=relojes.reloj, monotonico=relojes.monotonico)
+
+
+def test_transiciones_sin_recalcular_entre_ellas():
+    relojes, reloj = _reloj(datetime(2026, 1, 5, 0, 30, tzinfo=timezone.utc))
+    ventanas = (VentanaMantenimiento(time(1, 0), time(3, 0), "UTC"),)
+    assert not reloj.en_mantenimiento(ventanas)
+    relojes.avanzar(29 * 60)
+    assert not reloj.en_mantenimiento(ventanas)
+    assert relojes.lecturas == 1  # Hasta la transición solo se compara el reloj monotónico
+    relojes.avanzar(60)
+    assert reloj.en_mantenimiento(ventanas)
+    relojes.avanzar(2 * 3600 - 1)
+    assert reloj.en_mantenimiento(ventanas)
+    relojes.avanzar(1)
+    assert not reloj.en_mantenimiento(ventanas)
+    assert relojes.lecturas == 3
+
+
+def test_resincroniza_con_el_reloj_de_pared():
+    relojes = Relojes(datetime(2026, 1, 5, 0, 30, tzinfo=timezone.utc))
+    reloj = RelojMantenimiento(resincronizar=60, reloj=relojes.reloj, monotonico=relojes.monotonico)
+    ventanas = (VentanaMantenimiento(time(1, 0), time(3, 0), "UTC"),)
+    assert not reloj.en_mantenimiento(ventanas)
+    # Se adelanta la hora del sistema sin que avance el monotónico (ajuste NTP)
+    relojes.pared += 3600
+    assert not reloj.en_mantenimiento(ventanas)
+    relojes.mono += 60 * 10**9
+    assert reloj.en_mantenimiento(ventanas)
+
+
+def test_varias_ventanas_y_medianoche():
+    relojes, reloj = _reloj(datetime(2026, 1, 5, 0, 30, tzinfo=timezone.utc))
+    nocturna = VentanaMantenimiento(time(23, 0), time(1, 0), "UTC")
+    tarde = VentanaMantenimiento(time(14, 0), time(14, 30), "UTC")
+    ventanas = (tarde, nocturna)
+    assert reloj.ventana_activa(ventanas) == nocturna
+    relojes.avanzar(13.5 * 3600)  # 14:00
+    assert reloj.ventana_activa(ventanas) == tarde
+    relojes.avanzar(1800)
+    assert reloj.ventana_activa(ventanas) is None
+    # Ventana vacía (inicio == fin): nunca activa
+    assert not reloj.en_mantenimiento((VentanaMantenimiento(time(0, 0), time(0, 0), "UTC"),))
+
+
+def test_zona_horaria_y_cambio_de_ventanas():
+    # 01:30 en Santiago (UTC-3 en enero) son las 04:30 UTC
+    relojes, reloj = _reloj(datetime(2026, 1, 5, 4, 30, tzinfo=timezone.utc))
+    utc = (VentanaMantenimiento(time(1, 0), time(3, 0), "UTC"),)
+    try:
+        santiago = (VentanaMantenimiento(time(1, 0), time(3, 0), "America/Santiago"),)
+        zona_horaria("America/Santiago")
+    except ValueError:
+        pytest.skip("Sin America/Santiago en la base de zonas horarias")
+    assert not reloj.en_mantenimiento(utc)
+    # Otra tupla de ventanas (configuración recargada) se evalúa de inmediato
+    assert reloj.en_mantenimiento(santiago)
+
+
+def test_formatear_fecha_igual_a_isoformat():
+    aleatorio = random.Random(7)
+    marcas = [1767225600.0, 1767225600.9999996, 1767225600.0000004, 0.5]
+    marcas += [aleatorio.uniform(0, 2e9) for _ in range(2000)]
+    for ts in marcas:
+        assert formatear_fecha(ts) == datetime.fromtimestamp(ts).isoformat(), ts
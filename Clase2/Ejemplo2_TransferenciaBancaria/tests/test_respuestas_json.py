@@ -0,0 +1,22 @@
+import json
+
+import respuestas_json
+from respuestas_json import RespuestaJSON
+
+
+DATOS = {"id": 1, "origen": "12345678", "monto": 0.01, "detalle": "Límite diario", "saldo_restante": None,
+         "lista": [1.5, True, 10**12]}
+
+
+def test_dumps_compacto_y_utf8():
+    for dumps in (respuestas_json.dumps, respuestas_json._dumps_estandar):
+        cuerpo = dumps(DATOS)
+        assert json.loads(cuerpo) == DATOS
+        assert "Límite".encode() in cuerpo and b", " not in cuerpo
+
+
+def test_respuesta_json():
+    respuesta = RespuestaJSON(DATOS, headers={"Idempotent-Replayed": "true"})
+    assert respuesta.media_type == "application/json"
+    assert json.loads(respuesta.body) == DATOS
+    assert respuesta.headers["Idempotent-Replayed"] == "true"
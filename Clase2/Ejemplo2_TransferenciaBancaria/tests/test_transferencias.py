@@ -1,6 +1,8 @@
+import json
 import os
 import threading
 import time
+import uuid
 import requests
 import pytest
 
@@ -207,3 +209,278 @@ def test_15_sin_autenticacion_token_expirado():
     # no token provided
     resp = _make_transfer(SRC_ACCOUNT, DST_ACCOUNT, 100, token=None)
     assert resp.status_code in (401, 403), "Se esperaba 401/403 para request sin token"
+
+
+def test_16_historial_paginado_por_cursor():
+    _skip_if_no_endpoint()
+    requests.post(f"{BASE_URL}/api/cuentas/{SRC_ACCOUNT}/reset", timeout=5)
+    for _ in range(3):
+        _make_transfer(SRC_ACCOUNT, DST_ACCOUNT_B, 10, token=AUTH_TOKEN)
+
+    url = f"{BASE_URL}/api/transferencias/historial"
+    r = requests.get(url, params={"origen": SRC_ACCOUNT, "limite": 1}, timeout=5)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert len(j["transferencias"]) <= 1
+    if j["siguiente_cursor"] is not None:
+        r2 = requests.get(url, params={"origen": SRC_ACCOUNT, "limite": 1, "cursor": j["siguiente_cursor"]}, timeout=5)
+        siguiente = r2.json()["transferencias"]
+        assert siguiente and siguiente[0]["id"] > j["siguiente_cursor"]
+    assert all(t["origen"] == SRC_ACCOUNT for t in j["transferencias"])
+
+
+def test_17_historial_streaming_ndjson():
+    _skip_if_no_endpoint()
+    r = requests.get(f"{BASE_URL}/api/transferencias/historial",
+                     params={"formato": "ndjson", "destino": DST_ACCOUNT_B}, timeout=10)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lineas = [json.loads(l) for l in r.text.splitlines() if l]
+    assert all(t["destino"] == DST_ACCOUNT_B for t in lineas)
+    ids = [t["id"] for t in lineas]
+    assert ids == sorted(ids)
+
+
+def test_18_lote_mejor_esfuerzo_y_todo_o_nada():
+    _skip_if_no_endpoint()
+    url = f"{BASE_URL}/api/transferencias/lote"
+    items = [
+        {"origen": DST_ACCOUNT, "destino": DST_ACCOUNT_B, "monto": 10},
+        {"origen": DST_ACCOUNT, "destino": "00000000", "monto": 10},
+        {"origen": DST_ACCOUNT, "destino": DST_ACCOUNT, "monto": 10},
+    ]
+    r = requests.post(url, json={"transferencias": items, "modo": "mejor_esfuerzo"},
+                      headers=_headers(AUTH_TOKEN), timeout=10)
+    assert r.status_code == 200, r.text
+    codigos = [x["status_code"] for x in r.json()["resultados"]]
+    assert codigos[1:] == [404, 400]
+    assert codigos[0] in (200, 402, 403, 429)
+
+    saldo_antes = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT_B}", timeout=5).json()["saldo"]
+    r = requests.post(url, json={"transferencias": items, "modo": "todo_o_nada"},
+                      headers=_headers(AUTH_TOKEN), timeout=10)
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert j["exitosas"] == 0
+    assert j["resultados"][0]["status_code"] in (409, 429)
+    saldo_despues = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT_B}", timeout=5).json()["saldo"]
+    assert saldo_despues == saldo_antes
+
+
+def test_18b_lote_cuenta_cada_transferencia_en_el_rate_limit():
+    _skip_if_no_endpoint()
+    # Cuenta inexistente: las que entran en el cupo llegan a la validación (404)
+    items = [{"origen": "00000003", "destino": DST_ACCOUNT, "monto": 1}] * 50
+    r = requests.post(f"{BASE_URL}/api/transferencias/lote", json={"transferencias": items},
+                      headers=_headers(AUTH_TOKEN), timeout=10)
+    assert r.status_code == 200, r.text
+    codigos = [x["status_code"] for x in r.json()["resultados"]]
+    assert codigos[0] == 404 and codigos[-1] == 429
+    assert codigos == sorted(codigos)
+
+
+def test_19_lote_sin_autenticacion():
+    _skip_if_no_endpoint()
+    items = [{"origen": DST_ACCOUNT, "destino": DST_ACCOUNT_B, "monto": 10}]
+    r = requests.post(f"{BASE_URL}/api/transferencias/lote", json={"transferencias": items},
+                      headers=_headers(None), timeout=10)
+    assert r.status_code == 401
+
+
+def test_20_idempotency_key_evita_doble_debito():
+    _skip_if_no_endpoint()
+    requests.post(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT_B}/reset", timeout=5)
+    headers = _headers(AUTH_TOKEN)
+    headers["Idempotency-Key"] = str(uuid.uuid4())
+    payload = {"origen": DST_ACCOUNT_B, "destino": DST_ACCOUNT, "monto": 25}
+
+    r1 = requests.post(URL, json=payload, headers=headers, timeout=10)
+    r2 = requests.post(URL, json=payload, headers=headers, timeout=10)
+    assert r1.status_code == r2.status_code
+    assert r1.json() == r2.json()
+    if r1.status_code == 200:
+        assert r2.headers.get("Idempotent-Replayed") == "true"
+        saldo = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT_B}", timeout=5).json()["saldo"]
+        assert saldo == 100000 - 25
+
+    payload["monto"] = 26
+    r3 = requests.post(URL, json=payload, headers=headers, timeout=10)
+    assert r3.status_code == 422
+
+    # La misma clave de otro cliente (otro token) es una solicitud distinta
+    otro = {**_headers(f"{AUTH_TOKEN or 'test'}-otro"), "Idempotency-Key": headers["Idempotency-Key"]}
+    r4 = requests.post(URL, json=payload, headers=otro, timeout=10)
+    assert r4.status_code != 422 and r4.headers.get("Idempotent-Replayed") is None
+
+    # Un rechazo definitivo también se repite marcado, no como un rechazo nuevo
+    rechazada = {**headers, "Idempotency-Key": str(uuid.uuid4())}
+    payload = {"origen": "00000000", "destino": DST_ACCOUNT, "monto": 25}
+    r5 = requests.post(URL, json=payload, headers=rechazada, timeout=10)
+    r6 = requests.post(URL, json=payload, headers=rechazada, timeout=10)
+    assert r5.status_code == r6.status_code == 404
+    assert r5.headers.get("Idempotent-Replayed") is None
+    assert r6.headers.get("Idempotent-Replayed") == "true" and r6.json() == r5.json()
+
+
+def test_21_metricas_prometheus():
+    _skip_if_no_endpoint()
+    _make_transfer(SRC_ACCOUNT, DST_ACCOUNT, 1, token=None)  # rechazo por autenticación
+    r = requests.get(f"{BASE_URL}/metrics", timeout=5)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    texto = r.text
+    assert "# TYPE http_solicitudes_duracion_segundos histogram" in texto
+    assert 'transferencias_rechazos_total{motivo="no_autorizado"}' in texto
+    assert 'ruta="/api/transferencias",metodo="POST",codigo="401"' in texto
+    assert "http_solicitudes_en_curso" in texto
+
+
+def test_22_etag_y_consulta_de_varias_cuentas():
+    _skip_if_no_endpoint()
+    url_cuenta = f"{BASE_URL}/api/cuentas/{DST_ACCOUNT}"
+    r1 = requests.get(url_cuenta, timeout=5)
+    assert r1.status_code == 200 and r1.headers.get("ETag")
+    r2 = requests.get(url_cuenta, headers={"If-None-Match": r1.headers["ETag"]}, timeout=5)
+    assert r2.status_code == 304 and not r2.content
+
+    r = requests.get(f"{BASE_URL}/api/cuentas", params={"numeros": f"{SRC_ACCOUNT},{DST_ACCOUNT},00000000"}, timeout=5)
+    assert r.status_code == 200
+    j = r.json()
+    assert [c["numero"] for c in j["cuentas"]] == [SRC_ACCOUNT, DST_ACCOUNT]
+    assert j["no_encontradas"] == ["00000000"]
+    r_post = requests.post(f"{BASE_URL}/api/cuentas/consulta",
+                           json={"numeros": [SRC_ACCOUNT, DST_ACCOUNT, "00000000"]},
+                           headers={"If-None-Match": r.headers["ETag"]}, timeout=5)
+    assert r_post.status_code == 304
+
+    # Un cambio en la cuenta invalida su ETag
+    requests.post(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT}/reset", timeout=5)
+    r3 = requests.get(url_cuenta, headers={"If-None-Match": r1.headers["ETag"]}, timeout=5)
+    assert r3.status_code == 200 and r3.headers["ETag"] != r1.headers["ETag"]
+
+
+def test_23_stream_de_eventos_de_cuenta():
+    _skip_if_no_endpoint()
+    r = requests.get(f"{BASE_URL}/api/cuentas/00000000/eventos", timeout=5)
+    assert r.status_code == 404
+
+    resp = _make_transfer(DST_ACCOUNT_B, DST_ACCOUNT, 1.25, token=AUTH_TOKEN or "test")
+    if resp.status_code != 200:
+        pytest.skip(f"No se pudo crear la transferencia: {resp.status_code}")
+    transferencia_id = resp.json()["id"]
+
+    # Reanudación con Last-Event-ID: el movimiento se reenvía desde el historial
+    with requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT}/eventos", stream=True, timeout=5,
+                      headers={"Last-Event-ID": str(transferencia_id - 1)}) as stream:
+        assert stream.status_code == 200
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        lineas = []
+        for linea in stream.iter_lines(decode_unicode=True):
+            if not linea:
+                break
+            lineas.append(linea)
+    assert lineas[0] == f"id: {transferencia_id}"
+    assert lineas[1] == "event: movimiento"
+    datos = json.loads(lineas[2][len("data: "):])
+    assert datos["tipo"] == "credito" and datos["monto"] == 1.25 and datos["origen"] == DST_ACCOUNT_B
+
+
+def test_24_instantanea_y_sembrado_masivo():
+    _skip_if_no_endpoint()
+    headers = _headers(AUTH_TOKEN or "test")
+    r = requests.post(f"{BASE_URL}/api/admin/cuentas/sembrar", timeout=30, headers=headers,
+                      json={"rango": {"desde": 81_000_000, "cantidad": 5000, "saldo": 1000}})
+    if r.status_code == 404:
+        pytest.skip("Endpoints de administración no disponibles")
+    assert r.status_code == 200 and r.json()["solicitadas"] == 5000
+    assert requests.post(f"{BASE_URL}/api/admin/cuentas/sembrar", json={"cuentas": []}, timeout=5).status_code == 401
+    # Saldos fuera de un entero de 64 bits en centavos: se rechazan al validar
+    for semilla in ({"cuentas": [{"numero": "55555555", "saldo": 1e20}]},
+                    {"rango": {"desde": 55_555_555, "cantidad": 1, "saldo": 1e20}}):
+        r = requests.post(f"{BASE_URL}/api/admin/cuentas/sembrar", json=semilla, headers=headers, timeout=5)
+        assert r.status_code == 422
+    assert requests.get(f"{BASE_URL}/api/cuentas/55555555", timeout=5).status_code == 404
+
+    r = requests.post(f"{BASE_URL}/api/admin/instantaneas/test_24", headers=headers, timeout=30)
+    assert r.status_code == 200 and r.json()["cuentas"] >= 5000
+    saldo = requests.get(f"{BASE_URL}/api/cuentas/81000000", timeout=5).json()["saldo"]
+    resp = _make_transfer("81000000", "81004999", 10, token=AUTH_TOKEN or "test")
+    assert resp.status_code == 200
+
+    r = requests.post(f"{BASE_URL}/api/admin/instantaneas/test_24/restaurar", headers=headers, timeout=30)
+    assert r.status_code == 200
+    assert requests.get(f"{BASE_URL}/api/cuentas/81000000", timeout=5).json()["saldo"] == saldo
+    r = requests.post(f"{BASE_URL}/api/admin/instantaneas/no_existe/restaurar", headers=headers, timeout=5)
+    assert r.status_code == 404
+
+
+def test_25_movimientos_de_cuenta_por_rango_de_fechas():
+    _skip_if_no_endpoint()
+    r = requests.get(f"{BASE_URL}/api/cuentas/00000000/movimientos", timeout=5)
+    if r.status_code == 405:
+        pytest.skip("Endpoint de movimientos no disponible")
+    assert r.status_code == 404
+
+    desde = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(time.time() - 1))
+    resp = _make_transfer(DST_ACCOUNT_B, DST_ACCOUNT, 1.5, token=AUTH_TOKEN or "test")
+    if resp.status_code != 200:
+        pytest.skip(f"No se pudo crear la transferencia: {resp.status_code}")
+    transferencia_id = resp.json()["id"]
+
+    r = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT}/movimientos", params={"desde": desde}, timeout=5)
+    assert r.status_code == 200
+    movimientos = {m["id"]: m for m in r.json()["movimientos"]}
+    assert movimientos[transferencia_id]["tipo"] == "credito"
+    r = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT_B}/movimientos",
+                     params={"desde": desde, "cursor": transferencia_id - 1, "limite": 1}, timeout=5)
+    assert r.json()["movimientos"][0]["tipo"] == "debito"
+    r = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT}/movimientos", params={"hasta": "2000-01-01T00:00:00"},
+                     timeout=5)
+    assert r.json() == {"cuenta": DST_ACCOUNT, "movimientos": [], "siguiente_cursor": None}
+
+
+def test_26_velocidad_de_cuenta():
+    _skip_if_no_endpoint()
+    r = requests.get(f"{BASE_URL}/api/cuentas/00000000/velocidad", timeout=5)
+    if r.status_code == 405:
+        pytest.skip("Endpoint de velocidad no disponible")
+    assert r.status_code == 404
+
+    antes = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT_B}/velocidad", timeout=5).json()
+    resp = _make_transfer(DST_ACCOUNT_B, DST_ACCOUNT, 2.5, token=AUTH_TOKEN or "test")
+    if resp.status_code != 200:
+        pytest.skip(f"No se pudo crear la transferencia: {resp.status_code}")
+    despues = requests.get(f"{BASE_URL}/api/cuentas/{DST_ACCOUNT_B}/velocidad", timeout=5).json()
+    assert despues["cantidad_24h"] == antes["cantidad_24h"] + 1
+    assert despues["monto_24h"] == pytest.approx(antes["monto_24h"] + 2.5)
+    assert despues["destinos_24h"] >= 1
+
+
+def test_27_desafio_otp_de_un_solo_uso():
+    _skip_if_no_endpoint()
+    otp_url = f"{URL}/otp"
+    cuerpo = {"origen": DST_ACCOUNT_B, "destino": DST_ACCOUNT, "monto": 1500000}
+    r = requests.post(otp_url, json=cuerpo, timeout=5)
+    if r.status_code in (404, 405):
+        pytest.skip("Endpoint de desafíos OTP no disponible")
+    assert r.status_code == 401
+    r = requests.post(otp_url, json={**cuerpo, "origen": "00000000"}, headers=_headers(AUTH_TOKEN or "test"),
+                      timeout=5)
+    assert r.status_code == 404
+
+    r = requests.post(otp_url, json=cuerpo, headers=_headers(AUTH_TOKEN or "test"), timeout=5)
+    assert r.status_code == 201 and r.json()["expira"]
+    codigo = r.json().get("codigo")
+    if codigo is None:
+        pytest.skip("El código solo se incluye en la respuesta con OTP_CODIGO_EN_RESPUESTA=1")
+    # El OTP pasa y el rechazo es por límite o saldo: el código no se gasta y sirve para reintentar
+    for _ in range(2):
+        resp = _make_transfer(DST_ACCOUNT_B, DST_ACCOUNT, 1500000, token=AUTH_TOKEN or "test", otp=codigo)
+        if resp.status_code == 429:
+            pytest.skip("Rate limit alcanzado")
+        assert resp.status_code in (402, 403), resp.text
+    # Emitir de nuevo invalida el código anterior
+    r = requests.post(otp_url, json=cuerpo, headers=_headers(AUTH_TOKEN or "test"), timeout=5)
+    assert r.status_code == 201
+    resp = _make_transfer(DST_ACCOUNT_B, DST_ACCOUNT, 1500000, token=AUTH_TOKEN or "test", otp=codigo)
+    assert resp.status_code in (401, 429) or r.json()["codigo"] == codigo
@@ -0,0 +1,56 @@
+import pytest
+
+from velocidad import AgregadosVelocidad, Decision, EvaluadorUmbrales, Velocidad, cargar_evaluador
+
+
+def test_ventanas_deslizantes():
+    agregados = AgregadosVelocidad()
+    agregados.registrar("12345678", "87654321", 100, ts=1000.0)
+    agregados.registrar("12345678", "87654322", 50, ts=1030.0)
+    v = agregados.consultar("12345678", ahora=1031.0)
+    assert (v.cantidad_1m, v.monto_1m, v.destinos_1m) == (2, 150, 2)
+    # La primera sale de la ventana de 1 minuto (cubetas de 5 s) pero no de la hora
+    v = agregados.consultar("12345678", ahora=1065.0)
+    assert (v.cantidad_1m, v.monto_1m, v.destinos_1m) == (1, 50, 1)
+    assert (v.cantidad_1h, v.monto_1h, v.destinos_1h) == (2, 150, 2)
+    v = agregados.consultar("12345678", ahora=1000.0 + 86400 * 2)
+    assert v == Velocidad(0, 0, 0, 0, 0, 0, 0, 0, 0)
+    # Tras vaciar el anillo completo vuelve a acumular
+    agregados.registrar("12345678", "87654321", 7, ts=1000.0 + 86400 * 2)
+    assert agregados.consultar("12345678", ahora=1000.0 + 86400 * 2).monto_24h == 7
+
+
+def test_consulta_con_transferencia_candidata():
+    agregados = AgregadosVelocidad()
+    agregados.registrar("12345678", "87654321", 100, ts=1000.0)
+    v = agregados.consultar("12345678", "87654321", 10, ahora=1001.0)
+    assert (v.cantidad_1m, v.monto_1m, v.destinos_1m) == (2, 110, 1)
+    v = agregados.consultar("12345678", "87654322", 10, ahora=1001.0)
+    assert v.destinos_1m == 2
+    assert agregados.consultar("00000000", "87654321", 10, ahora=1001.0).cantidad_24h == 1
+
+
+def test_memoria_acotada():
+    agregados = AgregadosVelocidad(max_cuentas=2, max_destinos=3)
+    for i in range(5):
+        agregados.registrar("12345678", f"{i:08d}", 1, ts=1000.0 + i)
+    assert agregados.consultar("12345678", ahora=1010.0).destinos_1m == 3
+    agregados.registrar("87654321", "12345678", 1, ts=1000.0)
+    agregados.registrar("87654322", "12345678", 1, ts=1000.0)
+    assert len(agregados) == 2 and agregados.consultar("12345678", ahora=1010.0).cantidad_1m == 0
+
+
+def test_evaluador_umbrales():
+    evaluar = EvaluadorUmbrales({"cantidad_1m": 10, "destinos_1h": 5})
+    velocidad = Velocidad(3, 0, 3, 0, 3, 0, 1, 4, 4)
+    assert evaluar("12345678", "87654321", 100, velocidad) == Decision("marcar", 0.8, "destinos_1h")
+    assert evaluar("12345678", "87654321", 100, velocidad._replace(cantidad_1m=10)).accion == "rechazar"
+    assert evaluar("12345678", "87654321", 100, velocidad._replace(destinos_1h=1)).accion == "aprobar"
+    with pytest.raises(ValueError):
+        EvaluadorUmbrales({"saldo": 1})
+
+
+def test_cargar_evaluador():
+    assert cargar_evaluador("velocidad:EvaluadorUmbrales") is EvaluadorUmbrales
+    with pytest.raises(ValueError):
+        cargar_evaluador("velocidad")
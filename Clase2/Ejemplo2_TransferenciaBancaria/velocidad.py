@@ -0,0 +1,216 @@
+"""
+Agregados de velocidad por cuenta para el control de fraude
+Cantidad y suma de transferencias salientes en 1 min / 1 h / 24 h y destinos
+distintos, actualizados al registrar cada transferencia, y el evaluador
+(reemplazable) que decide si una nueva se aprueba, se marca o se rechaza
+"""
+import importlib
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional
+
+from dinero import Centavos
+
+# (duración de la ventana en segundos, cubetas del anillo)
+VENTANAS = ((60, 12), (3600, 12), (86400, 24))
+# Por ventana: (índice, ancho de cubeta, cubetas, posición del anillo en `cubetas`)
+_ANILLOS = tuple((i, ventana // n, n, 2 * sum(m for _, m in VENTANAS[:i])) for i, (ventana, n) in enumerate(VENTANAS))
+# Anillo vacío de cada ventana, para vaciar uno completo con una asignación
+_VACIOS = [array("q", bytes(8 * 2 * n)) for _, n in VENTANAS]
+
+
+class Velocidad(NamedTuple):
+    """Actividad saliente de una cuenta por ventana (montos en centavos)"""
+    cantidad_1m: int
+    monto_1m: Centavos
+    cantidad_1h: int
+    monto_1h: Centavos
+    cantidad_24h: int
+    monto_24h: Centavos
+    destinos_1m: int
+    destinos_1h: int
+    destinos_24h: int
+
+
+class _Agregados:
+    """
+    Estado de una cuenta. Por cada ventana, un anillo de cubetas
+    [cantidad, monto] dentro de `cubetas`, la última cubeta absoluta
+    escrita y los totales del anillo: agregar y leer no recorren el anillo
+    salvo las cubetas que vencieron desde la última vez.
+    """
+    __slots__ = ("cubetas", "ultimas", "totales", "destinos")
+
+    def __init__(self, cubeta_inicial):
+        self.cubetas = array("q", bytes(8 * 2 * sum(n for _, n in VENTANAS)))
+        self.ultimas = array("q", cubeta_inicial)
+        self.totales = array("q", bytes(8 * 2 * len(VENTANAS)))
+        # destino -> última fecha, en orden de uso (acotado a max_destinos); las
+        # fechas no retroceden, así el orden de uso es también orden de fecha
+        self.destinos: Dict[str, float] = {}
+
+
+class AgregadosVelocidad:
+    """
+    Agregados incrementales por cuenta origen en anillos de cubetas.
+
+    - Cada ventana se divide en cubetas de ancho fijo (5 s, 5 min y 1 h):
+      una transferencia suma en la cubeta de su fecha y las cubetas se
+      vacían a medida que vencen. La ventana es exacta al ancho de una cubeta.
+    - Los destinos distintos se cuentan sobre los `max_destinos` usados más
+      recientemente; con más, el conteo se satura en ese valor.
+    - La memoria es fija por cuenta y las cuentas se expulsan por último uso
+      al superar `max_cuentas`.
+    """
+
+    def __init__(self, max_cuentas: int = 1_000_000, max_destinos: int = 32, reloj=time.time):
+        self.max_cuentas = max_cuentas
+        self.max_destinos = max_destinos
+        self._reloj = reloj
+        self._cuentas: "OrderedDict[str, _Agregados]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def registrar(self, origen: str, destino: str, monto: Centavos, ts: Optional[float] = None):
+        """Suma una transferencia aplicada a los agregados de `origen`"""
+        ts = self._reloj() if ts is None else ts
+        with self._lock:
+            agregados = self._cuentas.get(origen)
+            if agregados is None:
+                agregados = self._cuentas[origen] = _Agregados(int(ts // ancho) for _, ancho, _, _ in _ANILLOS)
+                if len(self._cuentas) > self.max_cuentas:
+                    self._cuentas.popitem(last=False)
+            else:
+                self._cuentas.move_to_end(origen)
+            cubetas, totales = agregados.cubetas, agregados.totales
+            for i, ancho, n, base in _ANILLOS:
+                cubeta = int(ts // ancho)
+                if self._avanzar(agregados, i, base, n, cubeta):
+                    posicion = base + 2 * (cubeta % n)
+                    cubetas[posicion] += 1
+                    cubetas[posicion + 1] += monto
+                    totales[2 * i] += 1
+                    totales[2 * i + 1] += monto
+            destinos = agregados.destinos
+            if destinos:
+                ts = max(ts, destinos[next(reversed(destinos))])
+            if destinos.pop(destino, None) is None and len(destinos) >= self.max_destinos:
+                del destinos[next(iter(destinos))]
+            destinos[destino] = ts
+
+    @staticmethod
+    def _avanzar(agregados: _Agregados, i: int, base: int, n: int, cubeta: int) -> bool:
+        """
+        Vacía las cubetas del anillo `i` vencidas hasta `cubeta`; False si
+        `cubeta` ya salió de la ventana (transferencia registrada tarde).
+        """
+        ultima = agregados.ultimas[i]
+        if cubeta <= ultima:
+            return cubeta > ultima - n
+        cubetas, totales = agregados.cubetas, agregados.totales
+        agregados.ultimas[i] = cubeta
+        if cubeta - ultima >= n:
+            # Venció el anillo completo (cuenta inactiva por una ventana)
+            cubetas[base:base + 2 * n] = _VACIOS[i]
+            totales[2 * i] = totales[2 * i + 1] = 0
+            return True
+        for absoluta in range(ultima + 1, cubeta + 1):
+            posicion = base + 2 * (absoluta % n)
+            totales[2 * i] -= cubetas[posicion]
+            totales[2 * i + 1] -= cubetas[posicion + 1]
+            cubetas[posicion] = cubetas[posicion + 1] = 0
+        return True
+
+    def consultar(self, cuenta: str, destino: Optional[str] = None, monto: Centavos = 0,
+                  ahora: Optional[float] = None) -> Velocidad:
+        """
+        Agregados de `cuenta` a `ahora`. Con `destino` incluyen además esa
+        transferencia candidata (una más, `monto` más y su destino), que es
+        lo que evalúa el control de fraude antes de aplicarla.
+        """
+        ahora = self._reloj() if ahora is None else ahora
+        totales = [0] * (2 * len(VENTANAS))
+        distintos = [0] * len(VENTANAS)
+        with self._lock:
+            agregados = self._cuentas.get(cuenta)
+            if agregados is not None:
+                for i, ancho, n, base in _ANILLOS:
+                    self._avanzar(agregados, i, base, n, int(ahora // ancho))
+                totales = list(agregados.totales)
+                # Fechas ordenadas: los destinos de cada ventana son un sufijo
+                fechas = list(agregados.destinos.values())
+                candidata = agregados.destinos.get(destino)
+                for i, (ventana, _) in enumerate(VENTANAS):
+                    limite = ahora - ventana
+                    distintos[i] = len(fechas) - bisect_right(fechas, limite)
+                    if candidata is not None and candidata > limite:
+                        distintos[i] -= 1  # se cuenta abajo, como candidata
+        if destino is not None:
+            for i in range(len(VENTANAS)):
+                totales[2 * i] += 1
+                totales[2 * i + 1] += monto
+                distintos[i] += 1
+        distintos = [min(d, self.max_destinos) for d in distintos]
+        return Velocidad(*totales, *distintos)
+
+    def __len__(self) -> int:
+        return len(self._cuentas)
+
+    def limpiar(self):
+        with self._lock:
+            self._cuentas.clear()
+
+
+# ==================== EVALUACIÓN ====================
+
+class Decision(NamedTuple):
+    """`accion`: aprobar, marcar (se aplica y se cuenta para revisión) o rechazar"""
+    accion: str
+    puntaje: float = 0.0
+    motivo: str = ""
+
+
+APROBAR = Decision("aprobar")
+
+# (origen, destino, monto en centavos, velocidad con la candidata incluida) -> Decision
+Evaluador = Callable[[str, str, Centavos, Velocidad], Decision]
+
+
+class EvaluadorUmbrales:
+    """
+    Puntaje = la mayor fracción alcanzada de algún umbral ({campo de
+    Velocidad: máximo}, montos en centavos). Desde 1 se rechaza; desde
+    `marcar`, se marca. El motivo es el campo que más pesó.
+    """
+
+    def __init__(self, umbrales: Dict[str, float], marcar: float = 0.8):
+        desconocidos = set(umbrales) - set(Velocidad._fields)
+        if desconocidos:
+            raise ValueError(f"Campos de velocidad desconocidos: {', '.join(sorted(desconocidos))}")
+        if any(limite <= 0 for limite in umbrales.values()):
+            raise ValueError("Los umbrales deben ser mayores a cero")
+        self.umbrales = umbrales
+        self.marcar = marcar
+
+    def __call__(self, origen: str, destino: str, monto: Centavos, velocidad: Velocidad) -> Decision:
+        if not self.umbrales:
+            return APROBAR
+        puntaje, campo = max((getattr(velocidad, campo) / limite, campo) for campo, limite in self.umbrales.items())
+        if puntaje >= 1:
+            return Decision("rechazar", puntaje, campo)
+        if puntaje >= self.marcar:
+            return Decision("marcar", puntaje, campo)
+        return Decision("aprobar", puntaje, campo)
+
+
+def cargar_evaluador(ruta: str) -> Evaluador:
+    """Evaluador externo como "paquete.modulo:nombre" (función u objeto invocable)"""
+    modulo, _, nombre = ruta.partition(":")
+    if not modulo or not nombre:
+        raise ValueError(f"Evaluador inválido (se espera modulo:nombre): {ruta}")
+    evaluador = getattr(importlib.import_module(modulo), nombre)
+    if not callable(evaluador):
+        raise ValueError(f"El evaluador {ruta} no es invocable")
+    return evaluador